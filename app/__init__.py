@@ -2,11 +2,15 @@
 
 from flask import Flask
 from .config import Config
-from .extensions import db, migrate, login_manager, oauth
+from .extensions import db, migrate, login_manager, mail, oauth, page_cache
 from .cli import register_cli
+from .search import include_object
+from .images import product_image
+from .static_assets import init_static_assets
+from . import sql_stats, user_cache
+from .oidc_cache import CachedOAuth2App, metadata_cache, prefetch
 
 # import modeli i blueprintów
-from .models import User
 from .auth import auth_bp
 from .admin import admin_bp
 from .blog import blog_bp
@@ -22,7 +26,10 @@ def create_app(config_class=Config) -> Flask:
 
     # --- Inicjalizacja rozszerzeń ---
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, include_object=include_object)
+    page_cache.init_app(app)
+    # poczta – wysyła ją tylko worker kolejki (flask outbox-worker)
+    mail.init_app(app)
 
     # --- Login manager ---
     login_manager.init_app(app)
@@ -31,17 +38,20 @@ def create_app(config_class=Config) -> Flask:
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        return User.query.get(int(user_id))
+        # lekki rekord z cache procesu (app/user_cache.py), nie obiekt ORM
+        return user_cache.load_user(int(user_id))
 
     # --- OAuth (Authlib) ---
     oauth.init_app(app)
-    # Rejestracja Google
+    metadata_cache.init_app(app)
+    # Rejestracja Google – discovery i JWKS przez cache (app/oidc_cache.py)
     oauth.register(
         name="google",
         client_id=app.config.get("GOOGLE_CLIENT_ID"),
         client_secret=app.config.get("GOOGLE_CLIENT_SECRET"),
-        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        server_metadata_url=app.config["GOOGLE_DISCOVERY_URL"],
         client_kwargs={"scope": "openid email profile"},
+        client_cls=CachedOAuth2App,
     )
     
     # [ZMIANA] Rejestracja Facebook (Logowanie 5.0)
@@ -57,6 +67,8 @@ def create_app(config_class=Config) -> Flask:
         userinfo_endpoint="https://graph.facebook.com/me?fields=id,name,email",
         client_kwargs={"scope": "email public_profile"},
     )
+    if app.config.get("OIDC_PREFETCH"):
+        prefetch(oauth, ["google"])
 
 
     # --- Rejestracja blueprintów ---
@@ -71,6 +83,15 @@ def create_app(config_class=Config) -> Flask:
     app.register_blueprint(shop_bp)
     app.register_blueprint(webhooks_bp, url_prefix="/webhooks")
 
+    # Pliki statyczne: ?v=<hash> + roczny cache, warianty .br/.gz
+    init_static_assets(app)
+
+    # Zdjęcia produktów z pochodnymi (makro product_picture w _images.html)
+    app.jinja_env.globals["product_image"] = product_image
+
+    # Liczba / czas zapytań SQL na żądanie, wykrywanie N+1 (opcjonalne)
+    sql_stats.init_app(app)
+
     # Dodanie kategorii:
     register_cli(app)
 
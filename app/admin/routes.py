@@ -1,10 +1,7 @@
 # app/admin/routes.py
 from __future__ import annotations  # <-- POPRAWKA: Ta linia musi być PIERWSZA
 
-import os
-import uuid
 from decimal import Decimal
-from werkzeug.utils import secure_filename
 from werkzeug.routing import BuildError
 
 from flask import (
@@ -14,14 +11,23 @@ from flask import (
     flash,
     request,
     current_app,
+    jsonify,
 )
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 
 from . import admin_bp
 # POPRAWKA: Scaliłem zduplikowane importy.
 # Teraz importujemy wszystko, czego potrzebujemy, w jednym miejscu.
 from .forms import ProductForm, SliderForm, AddSliderItemForm
-from app.extensions import db
+from app.extensions import db, page_cache
+from app.search import index_product, remove_product
+from app.counters import LOW_STOCK_THRESHOLD, dashboard_counts
+from app import moderation
+from app.pagination import keyset_paginate
+from app.sales import sales_report
+from app.storage import release_media, store_upload
+from app.shop.slider import get_active_slider, invalidate_active_slider
 from app.models import (
     Product,
     Category,
@@ -37,6 +43,9 @@ from app.models import (
 #  Helpers / security
 # =============================
 
+# domyślny rozmiar strony kolejki moderacji
+MODERATION_PER_PAGE = 50
+
 def admin_required() -> bool:
     """Prosta bramka – dopuszcza tylko adminów."""
     if not current_user.is_authenticated:
@@ -48,23 +57,21 @@ def admin_required() -> bool:
     return False
 
 
-def _product_upload_path() -> str:
-    return os.path.join(current_app.root_path, "static", "images", "products")
-
-
-def _save_image(file_storage):
-    """Zapisuje obraz i zwraca nazwę pliku lub None."""
-    if not file_storage:
-        return None
-    filename = secure_filename(file_storage.filename or "")
-    if not filename:
-        return None
-    base, ext = os.path.splitext(filename)
-    unique_name = f"{uuid.uuid4().hex}{ext.lower()}"
-    dst_dir = _product_upload_path()
-    os.makedirs(dst_dir, exist_ok=True)
-    file_storage.save(os.path.join(dst_dir, unique_name))
-    return unique_name
+def _replace_image(product: Product, file_storage) -> bool:
+    """
+    Podmienia zdjęcie produktu na nowy upload (app/storage.py – ten sam plik
+    wgrany drugi raz nie jest zapisywany ponownie). Zwraca False, gdy
+    upload nie był obrazem.
+    """
+    media = store_upload(file_storage)
+    if media is None:
+        return False
+    previous = product.media
+    product.media = media
+    product.image_filename = media.stored_filename
+    if previous is not None:
+        release_media(previous)
+    return True
 
 
 def _category_choices():
@@ -122,6 +129,24 @@ def _set_stock(product: Product, value: int) -> bool:
     return False
 
 
+def _purge_comment_pages(comment: Comment) -> None:
+    """Zaakceptowane komentarze widać na stronie produktu – czyścimy jej cache."""
+    if comment.product_id:
+        page_cache.purge(f"product:{comment.product_id}")
+
+
+def _invalidate_slider() -> None:
+    """Po zmianach slidera: nowa migawka aktywnego slidera + czyszczenie cache stron."""
+    invalidate_active_slider()
+    page_cache.purge("slider")
+
+
+def _moderation_per_page() -> int:
+    """Rozmiar strony kolejki moderacji (``?per_page=``, 10–200)."""
+    per_page = request.args.get("per_page", MODERATION_PER_PAGE, type=int)
+    return max(10, min(per_page, 200))
+
+
 def _endpoint_exists(name: str) -> bool:
     """Sprawdza, czy endpoint istnieje – żeby nie wysadzać dashboardu url_for-em."""
     try:
@@ -142,42 +167,11 @@ def dashboard():
         flash("Brak uprawnień do panelu administratora.", "danger")
         return redirect(url_for("shop.index"))
 
-    # --- PODSTAWOWE METRYKI ---
-    products_count = db.session.query(Product).count()
-    categories_count = db.session.query(Category).count()
-    comments_count = db.session.query(Comment).count()
+    # --- METRYKI: jedno zapytanie do tabeli liczników (app/counters.py) ---
+    counts = dashboard_counts()
 
-    # komentarze oczekujące
-    try:
-        comments_pending = Comment.query.filter(Comment.status != "zaakceptowany").count()
-    except Exception:
-        try:
-            comments_pending = Comment.query.filter_by(status="oczekuje").count()
-        except Exception:
-            comments_pending = 0
-
-    # blog – ilość wpisów / oczekujące
-    posts_total = 0
-    posts_pending = 0
-    try:
-        posts_total = Post.query.count()
-        posts_pending = Post.query.filter(Post.status != "zaakceptowany").count()
-    except Exception:
-        pass
-
-    # slidery – ilość + aktywny
-    try:
-        sliders_count = Slider.query.count()
-        active_slider = Slider.query.filter_by(is_active=True).first()
-    except Exception:
-        sliders_count = 0
-        active_slider = None
-
-    # raporty / zgłoszenia
-    try:
-        reports_open = Report.query.filter_by(status="open").count()
-    except Exception:
-        reports_open = 0
+    # aktywny slider – z migawki w pamięci procesu
+    active_slider = get_active_slider()
 
     reports_endpoint_exists = _endpoint_exists("admin.reports")
     themes_endpoint_exists = _endpoint_exists("admin.themes")
@@ -190,50 +184,45 @@ def dashboard():
         .all()
     )
 
-    # najnowsze komentarze
-    try:
-        latest_comments = (
-            Comment.query
-            .order_by(Comment.created_at.desc())
-            .limit(10)
-            .all()
+    # najnowsze komentarze – autor / produkt / wpis dociągnięte od razu
+    latest_comments = (
+        Comment.query
+        .options(
+            joinedload(Comment.user),
+            joinedload(Comment.product),
+            joinedload(Comment.post),
         )
-    except Exception:
-        latest_comments = []
+        .order_by(Comment.created_at.desc())
+        .limit(10)
+        .all()
+    )
 
-    # produkty z niskim stanem magazynowym (<= 3 szt.)
-    low_stock_products = []
-    low_stock_count = 0
-    try:
-        low_stock_query = Product.query.filter(Product.stock <= 3)
-        low_stock_count = low_stock_query.count()
-        low_stock_products = (
-            low_stock_query
-            .order_by(Product.stock.asc(), Product.id.asc())
-            .limit(20)
-            .all()
-        )
-    except Exception:
-        low_stock_products = []
-        low_stock_count = 0
+    # produkty z niskim stanem magazynowym
+    low_stock_products = (
+        Product.query
+        .filter(Product.stock <= LOW_STOCK_THRESHOLD)
+        .order_by(Product.stock.asc(), Product.id.asc())
+        .limit(20)
+        .all()
+    )
 
     return render_template(
         "admin/dashboard.html",
-        products_count=products_count,
-        categories_count=categories_count,
-        comments_count=comments_count,
-        comments_pending=comments_pending,
-        posts_total=posts_total,
-        posts_pending=posts_pending,
-        sliders_count=sliders_count,
+        products_count=counts["products"],
+        categories_count=counts["categories"],
+        comments_count=counts["comments"],
+        comments_pending=counts["comments_pending"],
+        posts_total=counts["posts"],
+        posts_pending=counts["posts_pending"],
+        sliders_count=counts["sliders"],
         active_slider=active_slider,
-        reports_open=reports_open,
+        reports_open=counts["reports_open"],
         reports_endpoint_exists=reports_endpoint_exists,
         themes_endpoint_exists=themes_endpoint_exists,
         latest_products=latest_products,
         latest_comments=latest_comments,
         low_stock_products=low_stock_products,
-        low_stock_count=low_stock_count,
+        low_stock_count=counts["low_stock"],
     )
 
 
@@ -248,15 +237,43 @@ def moderate_comments():
         flash("Brak uprawnień do panelu administratora.", "danger")
         return redirect(url_for("shop.index"))
 
-    comments = (
-        Comment.query.filter_by(status="oczekuje")
-        .order_by(Comment.created_at.desc())
-        .all()
+    # kolejka stronicowana kursorem; autor, produkt i wpis dociągnięte od razu
+    query = Comment.query.filter_by(status="oczekuje").options(
+        joinedload(Comment.user),
+        joinedload(Comment.product),
+        joinedload(Comment.post),
+    )
+    comments = keyset_paginate(
+        query,
+        [(Comment.created_at, True), (Comment.id, True)],
+        cursor=request.args.get("cursor", type=str),
+        per_page=_moderation_per_page(),
     )
 
     return render_template("admin/moderation.html", comments=comments)
 
 
+@admin_bp.route("/comments/bulk", methods=["POST"])
+@login_required
+def bulk_comments():
+    if not admin_required():
+        flash("Brak uprawnień do panelu administratora.", "danger")
+        return redirect(url_for("shop.index"))
+
+    action = request.form.get("action")
+    ids = request.form.getlist("ids")
+    if action not in moderation.ACTIONS or not ids:
+        flash("Zaznacz komentarze i wybierz akcję.", "warning")
+        return redirect(request.referrer or url_for("admin.moderate_comments"))
+
+    result = moderation.moderate_comments(ids, action)
+    if result.product_ids:
+        page_cache.purge(*(f"product:{pid}" for pid in result.product_ids))
+    label = "zaakceptowane" if action == "approve" else "odrzucone"
+    flash(f"Komentarze {label}: {result.changed}.", "success" if action == "approve" else "info")
+    return redirect(request.referrer or url_for("admin.moderate_comments"))
+
+
 # [ZMIANA] Dodano methods=["POST"]
 @admin_bp.route("/comments/<int:comment_id>/approve", methods=["POST"])
 @login_required
@@ -268,6 +285,7 @@ def approve_comment(comment_id: int):
     comment = Comment.query.get_or_404(comment_id)
     comment.status = "zaakceptowany"
     db.session.commit()
+    _purge_comment_pages(comment)
     flash("Komentarz został zaakceptowany.", "success")
     return redirect(request.referrer or url_for("admin.moderate_comments"))
 
@@ -283,6 +301,7 @@ def reject_comment(comment_id: int):
     comment = Comment.query.get_or_404(comment_id)
     comment.status = "odrzucony"
     db.session.commit()
+    _purge_comment_pages(comment)
     flash("Komentarz został odrzucony.", "info")
     return redirect(request.referrer or url_for("admin.moderate_comments"))
 
@@ -298,15 +317,40 @@ def moderate_posts():
         flash("Brak uprawnień do panelu administratora.", "danger")
         return redirect(url_for("shop.index"))
 
-    posts = (
-        Post.query.filter(Post.status != "zaakceptowany")
-        .order_by(Post.created_at.desc())
-        .all()
+    query = Post.query.filter(Post.status != "zaakceptowany").options(
+        joinedload(Post.author)
+    )
+    posts = keyset_paginate(
+        query,
+        [(Post.created_at, True), (Post.id, True)],
+        cursor=request.args.get("cursor", type=str),
+        per_page=_moderation_per_page(),
     )
 
     return render_template("admin/blog_posts.html", posts=posts)
 
 
+@admin_bp.route("/blog/bulk", methods=["POST"])
+@login_required
+def bulk_posts():
+    if not admin_required():
+        flash("Brak uprawnień do panelu administratora.", "danger")
+        return redirect(url_for("shop.index"))
+
+    action = request.form.get("action")
+    ids = request.form.getlist("ids")
+    if action not in moderation.ACTIONS or not ids:
+        flash("Zaznacz wpisy i wybierz akcję.", "warning")
+        return redirect(request.referrer or url_for("admin.moderate_posts"))
+
+    result = moderation.moderate_posts(ids, action)
+    if result.changed:
+        page_cache.purge("posts")
+    label = "opublikowane" if action == "approve" else "odrzucone"
+    flash(f"Wpisy {label}: {result.changed}.", "success" if action == "approve" else "info")
+    return redirect(request.referrer or url_for("admin.moderate_posts"))
+
+
 # [ZMIANA] Dodano methods=["POST"]
 @admin_bp.route("/blog/<int:post_id>/approve", methods=["POST"])
 @login_required
@@ -318,6 +362,7 @@ def approve_post(post_id: int):
     post = Post.query.get_or_404(post_id)
     post.status = "zaakceptowany"
     db.session.commit()
+    page_cache.purge("posts")
     flash("Wpis został opublikowany.", "success")
     return redirect(request.referrer or url_for("admin.moderate_posts"))
 
@@ -333,6 +378,7 @@ def reject_post(post_id: int):
     post = Post.query.get_or_404(post_id)
     post.status = "odrzucony"
     db.session.commit()
+    page_cache.purge("posts")
     flash("Wpis został oznaczony jako odrzucony.", "info")
     return redirect(request.referrer or url_for("admin.moderate_posts"))
 
@@ -360,6 +406,7 @@ def sliders():
         )
         db.session.add(slider)
         db.session.commit()
+        _invalidate_slider()
         flash("Slider został utworzony.", "success")
         return redirect(url_for("admin.sliders"))
 
@@ -380,6 +427,7 @@ def set_active_slider(slider_id: int):
     Slider.query.update({Slider.is_active: False})
     slider.is_active = True
     db.session.commit()
+    _invalidate_slider()
 
     flash(f"Aktywny slider ustawiony na \"{slider.name}\".", "success")
     return redirect(url_for("admin.sliders"))
@@ -420,6 +468,7 @@ def slider_detail(slider_id: int):
             )
             db.session.add(new_item)
             db.session.commit()
+            _invalidate_slider()
             flash("Produkt został dodany do slidera.", "success")
         
         return redirect(url_for("admin.slider_detail", slider_id=slider.id))
@@ -451,6 +500,7 @@ def remove_slider_item(item_id: int):
 
     db.session.delete(item)
     db.session.commit()
+    _invalidate_slider()
     
     flash("Produkt został usunięty ze slidera.", "success")
     # Wracamy na stronę zarządzania sliderem
@@ -467,7 +517,11 @@ def list_products():
     if not admin_required():
         flash("Brak uprawnień do panelu administratora.", "danger")
         return redirect(url_for("shop.index"))
-    products = Product.query.order_by(Product.id.desc()).all()
+    products = (
+        Product.query.options(joinedload(Product.category))
+        .order_by(Product.id.desc())
+        .all()
+    )
     return render_template("admin/products.html", products=products)
 
 
@@ -494,12 +548,14 @@ def new_product():
                 product.category_id = form.category.data
 
         image = request.files.get("image")
-        if image and image.filename:
-            filename = _save_image(image)
-            product.image_filename = filename
+        if image and image.filename and not _replace_image(product, image):
+            flash("Wgrany plik nie jest obrazem – zdjęcie nie zostało zmienione.", "warning")
 
         db.session.add(product)
+        db.session.flush()
+        index_product(product)
         db.session.commit()
+        page_cache.purge("products")
         flash("Produkt został dodany.", "success")
         return redirect(url_for("admin.list_products"))
 
@@ -558,11 +614,13 @@ def edit_product(product_id: int):
                 product.category_id = None
 
         image = request.files.get("image")
-        if image and image.filename:
-            filename = _save_image(image)
-            product.image_filename = filename
+        if image and image.filename and not _replace_image(product, image):
+            flash("Wgrany plik nie jest obrazem – zdjęcie nie zostało zmienione.", "warning")
 
+        index_product(product)
         db.session.commit()
+        page_cache.purge("products", f"product:{product.id}")
+        invalidate_active_slider()
         flash("Produkt został zaktualizowany.", "success")
         return redirect(url_for("admin.product_detail", product_id=product.id))
 
@@ -576,7 +634,54 @@ def delete_product(product_id: int):
         flash("Brak uprawnień do panelu administratora.", "danger")
         return redirect(url_for("shop.index"))
     product = Product.query.get_or_404(product_id)
+    remove_product(product.id)
+    media = product.media
     db.session.delete(product)
+    release_media(media)
     db.session.commit()
+    page_cache.purge("products", f"product:{product_id}")
+    invalidate_active_slider()
     flash("Produkt został usunięty.", "success")
-    return redirect(url_for("admin.list_products"))
\ No newline at end of file
+    return redirect(url_for("admin.list_products"))
+
+
+# =============================
+#  Analityka sprzedaży
+# =============================
+
+# dozwolone zakresy raportu (dni)
+ANALYTICS_RANGES = (7, 30, 90, 365)
+
+
+@admin_bp.route("/analytics")
+@login_required
+def analytics():
+    """Sprzedaż z agregatów dziennych (app/sales.py) – bez skanowania zamówień."""
+    if not admin_required():
+        flash("Brak uprawnień do panelu administratora.", "danger")
+        return redirect(url_for("shop.index"))
+
+    days = request.args.get("days", 30, type=int)
+    if days not in ANALYTICS_RANGES:
+        days = 30
+    report = sales_report(days)
+    return render_template(
+        "admin/analytics.html",
+        report=report,
+        days=days,
+        ranges=ANALYTICS_RANGES,
+    )
+
+
+# =============================
+#  Cache stron
+# =============================
+
+@admin_bp.route("/page-cache")
+@login_required
+def page_cache_stats():
+    """Liczniki trafień cache stron (bieżący proces) w JSON."""
+    if not admin_required():
+        flash("Brak uprawnień do panelu administratora.", "danger")
+        return redirect(url_for("shop.index"))
+    return jsonify(page_cache.stats())
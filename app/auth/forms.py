@@ -5,7 +5,7 @@ from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationE
 from flask_wtf import FlaskForm
 import re
 
-from app.models import User  # musi istnieć model User
+from .lookup import email_taken, username_taken
 
 
 USERNAME_REGEX = re.compile(r"^[A-Za-z0-9_.\-@!$%^&*+=ąćęłńóśźżĄĆĘŁŃÓŚŹŻ]{3,32}$")
@@ -45,14 +45,12 @@ class RegistrationForm(FlaskForm):
             raise ValidationError(
                 "Dozwolone litery/cyfry oraz . _ - @ ! $ % ^ & * + =, bez spacji (3–32 znaki)."
             )
-        # unikalność, jeśli kolumna istnieje
-        if hasattr(User, "username"):
-            if User.query.filter(User.username.ilike(val)).first():
-                raise ValidationError("Taka nazwa użytkownika już istnieje.")
+        # unikalność bez względu na wielkość liter (kolumna username_normalized)
+        if username_taken(val):
+            raise ValidationError("Taka nazwa użytkownika już istnieje.")
 
     def validate_email(self, field):
-        val = (field.data or "").strip().lower()
-        if User.query.filter_by(email=val).first():
+        if email_taken(field.data):
             raise ValidationError("Ten adres e-mail jest już zajęty.")
 
 
@@ -0,0 +1,81 @@
+# app/auth/lookup.py
+"""
+Wyszukiwanie kont po identyfikatorze (e-mail albo nazwa użytkownika).
+
+Porównania idą po kolumnach ``email_normalized`` / ``username_normalized``
+(``str.casefold()`` liczone w Pythonie przy zapisie, z indeksami), więc
+każde wyszukanie to jedno zapytanie po indeksie, bez ``ILIKE`` i bez
+``lower()`` bazy – w SQLite ono zmienia wielkość liter tylko w ASCII.
+"""
+from __future__ import annotations
+
+import re
+import secrets
+
+from sqlalchemy import case, or_
+
+from app.models import User, normalize_identifier
+
+USERNAME_MAX = 32
+
+# ile kolejnych sufiksów sprawdzić jednym zapytaniem
+USERNAME_CANDIDATES = 50
+
+
+def normalize(identifier: str | None) -> str:
+    return normalize_identifier(identifier)
+
+
+def find_by_identifier(identifier: str) -> User | None:
+    """
+    Konto po e-mailu albo nazwie użytkownika – jedno zapytanie.
+    Nazwa może zawierać ``@``, więc sprawdzamy oba pola; dopasowanie
+    e-maila ma pierwszeństwo.
+    """
+    ident = normalize(identifier)
+    if not ident:
+        return None
+    email_match = User.email_normalized == ident
+    return (
+        User.query.filter(or_(email_match, User.username_normalized == ident))
+        .order_by(case((email_match, 0), else_=1))
+        .first()
+    )
+
+
+def email_taken(email: str) -> bool:
+    return User.query.filter(User.email_normalized == normalize(email)).first() is not None
+
+
+def username_taken(username: str) -> bool:
+    return (
+        User.query.filter(User.username_normalized == normalize(username)).first() is not None
+    )
+
+
+def _candidates(base: str) -> list[str]:
+    out = [base[:USERNAME_MAX]]
+    for i in range(1, USERNAME_CANDIDATES):
+        suffix = str(i)
+        out.append(base[:USERNAME_MAX - len(suffix)] + suffix)
+    return out
+
+
+def free_username(name: str | None) -> str:
+    """
+    Wolna nazwa na bazie ``name`` (``ala``, ``ala1``, ``ala2``...) – wszystkie
+    kandydatki sprawdzane jednym zapytaniem ``IN`` po indeksie.
+    """
+    base = re.sub(r"[^A-Za-z0-9_.\-]", "", (name or "").replace(" ", ""))[:30] or "user"
+    candidates = _candidates(base)
+    taken = {
+        row[0]
+        for row in User.query.with_entities(User.username_normalized)
+        .filter(User.username_normalized.in_([normalize(c) for c in candidates]))
+    }
+    for candidate in candidates:
+        if normalize(candidate) not in taken:
+            return candidate
+    # wszystkie zajęte – losowy sufiks zamiast kolejnych zapytań
+    suffix = secrets.token_hex(3)
+    return base[:USERNAME_MAX - len(suffix)] + suffix
@@ -2,16 +2,16 @@
 # [POPRAWKA] Dodane importy dla 'session' i 'secrets'
 from flask import render_template, redirect, url_for, flash, request, current_app, session
 from flask_login import login_user, logout_user, current_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import or_
 import uuid
 import secrets # [POPRAWKA] Dodany import do generowania nonce
-import re # [POPRAWKA] Dodany import dla _find_or_create_oauth_user
 
 from . import auth_bp
 from .forms import RegistrationForm, LoginForm
 from app.extensions import db, oauth
 from app.models import User
+from app.passwords import HashingBusy, hash_password, verify_password
+from .lookup import find_by_identifier, free_username, normalize
 
 # ---------- Rejestracja ----------
 @auth_bp.route("/register", methods=["GET", "POST"])
@@ -27,11 +27,13 @@ def register():
         user = User(
             email=email,
         )
-        # ustaw username tylko jeśli model ma taką kolumnę
-        if hasattr(User, "username"):
-            user.username = username
+        user.username = username
 
-        user.password_hash = generate_password_hash(form.password.data)
+        try:
+            user.password_hash = hash_password(form.password.data)
+        except HashingBusy:
+            flash("Serwer jest chwilowo przeciążony. Spróbuj ponownie za moment.", "warning")
+            return render_template("auth/register.html", form=form), 503
 
         # ustaw domyślną rolę, jeśli masz (np. "user")
         if hasattr(User, "role") and not getattr(user, "role", None):
@@ -55,20 +57,28 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        ident = (form.identifier.data or "").strip()
-        q = None
-        if "@" in ident:
-            q = User.query.filter_by(email=ident.lower()).first()
-        else:
-            if hasattr(User, "username"):
-                q = User.query.filter(User.username.ilike(ident)).first()
-            if q is None:
-                q = User.query.filter(User.email.ilike(f"{ident}%")).first()
-
-        if not q or not check_password_hash(q.password_hash, form.password.data):
+        # e-mail albo nazwa użytkownika – jedno zapytanie po kolumnach
+        # email_normalized / username_normalized (casefold, app/auth/lookup.py)
+        q = find_by_identifier(form.identifier.data)
+
+        try:
+            ok, new_hash = verify_password(q.password_hash if q else None, form.password.data)
+        except HashingBusy:
+            flash("Serwer jest chwilowo przeciążony. Spróbuj ponownie za moment.", "warning")
+            return render_template("auth/login.html", form=form), 503
+        if not ok:
             flash("Nieprawidłowe dane logowania.", "danger")
             return render_template("auth/login.html", form=form), 401
 
+        if new_hash:
+            # hash sprzed zmiany PASSWORD_HASH_METHOD – zapisujemy w bieżących ustawieniach
+            q.password_hash = new_hash
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f"Nie udało się przeliczyć hasha użytkownika {q.id}: {e}")
+
         remember_me = form.remember_me.data
         login_user(q, remember=remember_me)
         
@@ -108,7 +118,7 @@ def _find_or_create_oauth_user(provider_name: str, provider_user_id: str, user_i
         
     # Zawsze sprawdzaj e-mail, jeśli jest dostępny
     if email:
-        query_filter.append(User.email == email)
+        query_filter.append(User.email_normalized == normalize(email))
         
     if not query_filter:
         # Sytuacja awaryjna - brak ID i emaila?
@@ -125,25 +135,19 @@ def _find_or_create_oauth_user(provider_name: str, provider_user_id: str, user_i
             
         user = User(email=email)
         
-        # Ustaw unikalną nazwę użytkownika (jeśli model jej wymaga)
-        if hasattr(User, "username"):
-            base = (name or email.split("@")[0]).replace(" ", "")
-            # Szybka sanitacja nazwy, usunięcie niedozwolonych znaków
-            candidate = re.sub(r"[^A-Za-z0-9_.\-]", "", base)[:30] or "user"
-            
-            i = 0
-            while User.query.filter(User.username.ilike(candidate)).first():
-                i += 1
-                suffix = str(i)
-                candidate = candidate[:(32 - len(suffix))] + suffix
-            user.username = candidate
+        # Unikalna nazwa użytkownika – kandydatki sprawdzane jednym zapytaniem
+        user.username = free_username(name or email.split("@")[0])
 
         if hasattr(User, "role") and not getattr(user, "role", None):
             user.role = "user"
             
         # Ustaw losowe hasło (konto nie będzie logowane lokalnie hasłem)
         random_pass = str(uuid.uuid4())
-        user.password_hash = generate_password_hash(random_pass)
+        try:
+            user.password_hash = hash_password(random_pass)
+        except HashingBusy:
+            flash("Serwer jest chwilowo przeciążony. Spróbuj ponownie za moment.", "warning")
+            return None
 
         # Ustaw ID providera
         if provider_name == 'google' and hasattr(User, 'google_id'):
@@ -0,0 +1,538 @@
+# app/bench.py
+"""
+Benchmarki uruchamiane z CLI (``flask bench-*``).
+
+Benchmarki bazodanowe pracują na osobnej bazie: domyślnie tymczasowy plik
+SQLite w trybie WAL, albo baza podana przez ``--database-url`` (np.
+PostgreSQL). Podana baza musi być pusta/testowa – tworzone są w niej
+tabele modeli, a wiersze benchmarku są po nim kasowane.
+"""
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, func, select, text
+from werkzeug.security import generate_password_hash
+
+from .config import Config
+from .counters import LOW_STOCK_THRESHOLD, adjust_counter
+from .extensions import db
+from .models import Category, Comment, Order, OrderItem, Post, Product, User
+from .shop.orders import OutOfStock, place_order
+
+
+@contextmanager
+def bench_app(database_url: str | None = None, pool_size: int = 5):
+    """Osobna instancja aplikacji na bazie benchmarku (tymczasowej albo podanej)."""
+    from app import create_app
+
+    tmpdir = None
+    if database_url is None:
+        tmpdir = tempfile.mkdtemp(prefix="bimberek-bench-")
+        database_url = "sqlite:///" + os.path.join(tmpdir, "bench.db")
+
+    options = {"pool_size": pool_size, "max_overflow": 0, "pool_timeout": 60}
+    if database_url.startswith("sqlite"):
+        # zapisy w SQLite i tak są szeregowane – niech wątki czekają na blokadę
+        options["connect_args"] = {"timeout": 60, "check_same_thread": False}
+
+    config = type(
+        "BenchConfig",
+        (Config,),
+        {
+            "SQLALCHEMY_DATABASE_URI": database_url,
+            "SQLALCHEMY_ENGINE_OPTIONS": options,
+            "PAGE_CACHE_ENABLED": False,
+        },
+    )
+    app = create_app(config)
+    try:
+        with app.app_context():
+            if database_url.startswith("sqlite"):
+                @event.listens_for(db.engine, "connect")
+                def _wal(dbapi_connection, _record):
+                    dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+            db.create_all()
+        yield app
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _run_threads(threads: int, jobs: int, work) -> tuple[float, list]:
+    """
+    Uruchamia ``work(i)`` dla ``jobs`` zadań w ``threads`` wątkach startujących
+    jednocześnie (bariera). Zwraca (czas w sekundach, wyniki).
+    """
+    results: list = [None] * jobs
+    next_job = iter(range(jobs))
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def runner():
+        barrier.wait()
+        while True:
+            with lock:
+                i = next(next_job, None)
+            if i is None:
+                return
+            results[i] = work(i)
+
+    pool = [threading.Thread(target=runner) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started, results
+
+
+# =========================
+# Checkout: rezerwacja stanów
+# =========================
+
+
+def _naive_order(user_id: int, product: Product, quantity: int) -> Order:
+    """Stary schemat odczyt-sprawdzenie-zapis – tylko dla porównania."""
+    if product.stock < quantity:
+        raise OutOfStock([(product.id, product.name)])
+    order = Order(user_id=user_id, status="new", shipping_address="benchmark")
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(
+        OrderItem(order_id=order.id, product_id=product.id,
+                  price_at_order=product.price, quantity=quantity)
+    )
+    product.stock = product.stock - quantity
+    return order
+
+
+def checkout_stress(database_url: str | None = None, threads: int = 16, orders: int = 400,
+                    stock: int = 100, quantity: int = 1, naive: bool = False) -> dict:
+    """
+    ``orders`` równoległych zamówień na jeden produkt z ``stock`` sztukami.
+    Zwraca przepustowość i liczbę sprzedanych ponad stan (oversell).
+    """
+    with bench_app(database_url, pool_size=threads) as app:
+        with app.app_context():
+            user = User(email=f"bench-{time.time_ns()}@bimberek.local", password_hash="-")
+            product = Product(name="Benchmark – ostatnie butelki", price=Decimal("49.99"), stock=stock)
+            db.session.add_all([user, product])
+            db.session.commit()
+            user_id, product_id = user.id, product.id
+            dialect = db.engine.dialect.name
+
+        def work(_i):
+            with app.app_context():
+                try:
+                    if naive:
+                        _naive_order(user_id, db.session.get(Product, product_id), quantity)
+                    else:
+                        place_order(user_id, "benchmark", {product_id: quantity})
+                    db.session.commit()
+                    return "ok"
+                except OutOfStock:
+                    db.session.rollback()
+                    return "out_of_stock"
+                except Exception as exc:
+                    db.session.rollback()
+                    return f"error: {type(exc).__name__}: {exc}"
+                finally:
+                    db.session.remove()
+
+        elapsed, results = _run_threads(threads, orders, work)
+
+        with app.app_context():
+            final_stock = db.session.get(Product, product_id).stock
+            sold = (
+                db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))
+                .filter(OrderItem.product_id == product_id)
+                .scalar()
+            )
+            if database_url is not None:
+                order_ids = db.session.query(Order.id).filter(Order.user_id == user_id)
+                OrderItem.query.filter(OrderItem.order_id.in_(order_ids.scalar_subquery())).delete(
+                    synchronize_session=False
+                )
+                Order.query.filter(Order.user_id == user_id).delete(synchronize_session=False)
+                # produkty dodane przez ORM (+1 w liczniku), kasowane hurtowo
+                removed = Product.query.filter(Product.id == product_id).delete(synchronize_session=False)
+                adjust_counter(db.session.connection(), "products", -removed)
+                User.query.filter(User.id == user_id).delete(synchronize_session=False)
+                db.session.commit()
+
+    errors = [r for r in results if r.startswith("error")]
+    ok = results.count("ok")
+    return {
+        "dialect": dialect,
+        "mode": "naive" if naive else "atomic",
+        "threads": threads,
+        "orders": orders,
+        "ok": ok,
+        "out_of_stock": results.count("out_of_stock"),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed": elapsed,
+        "throughput": orders / elapsed if elapsed else 0.0,
+        "initial_stock": stock,
+        "final_stock": final_stock,
+        "sold": int(sold),
+        # oversell: więcej sztuk w zamówieniach, niż było na półce;
+        # lost_updates: stan wyższy, niż wynika z przyjętych zamówień
+        "oversell": max(int(sold) - stock, 0),
+        "lost_updates": final_stock - (stock - int(sold)),
+    }
+
+
+# =========================
+# Checkout: wielkość koszyka
+# =========================
+
+
+def order_lines_benchmark(database_url: str | None = None, sizes: tuple[int, ...] = (1, 100),
+                          repeats: int = 50) -> list[dict]:
+    """
+    Składa ``repeats`` zamówień dla każdej wielkości koszyka z ``sizes``.
+    Zwraca średni czas zamówienia i liczbę wywołań bazy na zamówienie.
+    """
+    width = max(sizes)
+    with bench_app(database_url) as app:
+        with app.app_context():
+            user = User(email=f"bench-{time.time_ns()}@bimberek.local", password_hash="-")
+            products = [
+                Product(name=f"Benchmark {i}", price=Decimal("10.00") + i, stock=10**9)
+                for i in range(width)
+            ]
+            db.session.add(user)
+            db.session.add_all(products)
+            db.session.commit()
+            user_id = user.id
+            product_ids = [p.id for p in products]
+
+            calls = 0
+
+            def count(*_args):
+                nonlocal calls
+                calls += 1
+
+            event.listen(db.engine, "before_cursor_execute", count)
+            report = []
+            try:
+                for size in sizes:
+                    quantities = {pid: 1 for pid in product_ids[:size]}
+                    calls = 0
+                    started = time.perf_counter()
+                    for _ in range(repeats):
+                        place_order(user_id, "benchmark", quantities)
+                        db.session.commit()
+                    elapsed = time.perf_counter() - started
+                    report.append({
+                        "lines": size,
+                        "orders": repeats,
+                        "ms_per_order": elapsed * 1000 / repeats,
+                        "calls_per_order": calls / repeats,
+                    })
+            finally:
+                event.remove(db.engine, "before_cursor_execute", count)
+
+            if database_url is not None:
+                order_ids = db.session.query(Order.id).filter(Order.user_id == user_id)
+                OrderItem.query.filter(OrderItem.order_id.in_(order_ids.scalar_subquery())).delete(
+                    synchronize_session=False
+                )
+                Order.query.filter(Order.user_id == user_id).delete(synchronize_session=False)
+                # produkty dodane przez ORM (+1 w liczniku), kasowane hurtowo
+                removed = Product.query.filter(Product.id.in_(product_ids)).delete(synchronize_session=False)
+                adjust_counter(db.session.connection(), "products", -removed)
+                User.query.filter(User.id == user_id).delete(synchronize_session=False)
+                db.session.commit()
+    return report
+
+
+# =========================
+# Hashowanie haseł
+# =========================
+
+# kandydaci porównywani z ustawieniem z konfiguracji
+PASSWORD_METHODS = (
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+)
+
+
+def _hash_rate(method: str, seconds: float, threads: int) -> float:
+    """Hashy na sekundę przy ``threads`` wątkach liczących naraz."""
+    done = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+    deadline = 0.0
+
+    def runner(slot: int):
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            generate_password_hash("benchmark-haslo", method)
+            done[slot] += 1
+
+    pool = [threading.Thread(target=runner, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    started = time.perf_counter()
+    deadline = started + seconds
+    barrier.wait()
+    for t in pool:
+        t.join()
+    return sum(done) / (time.perf_counter() - started)
+
+
+def password_hash_benchmark(methods, seconds: float = 2.0, threads: int | None = None) -> list[dict]:
+    """Dla każdej metody: czas jednego hasha i przepustowość na rdzeń."""
+    threads = threads or os.cpu_count() or 1
+    cores = min(threads, os.cpu_count() or 1)
+    report = []
+    for method in dict.fromkeys(methods):  # bez duplikatów, w kolejności
+        single = _hash_rate(method, seconds, 1)
+        parallel = _hash_rate(method, seconds, threads) if threads > 1 else single
+        report.append({
+            "method": method,
+            "ms_per_hash": 1000 / single if single else 0.0,
+            "single": single,
+            "parallel": parallel,
+            "threads": threads,
+            "per_core": parallel / cores,
+        })
+    return report
+
+
+# =========================
+# Indeksy: plany zapytań
+# =========================
+
+# indeksy migracji e8a3c5f1d702 – zdejmowane na czas pomiaru „przed”
+HOT_PATH_INDEXES = (
+    "ix_comments_product_status_created",
+    "ix_comments_post_status_created",
+    "ix_comments_pending",
+    "ix_posts_status_created",
+    "ix_posts_unpublished",
+    "ix_products_category_id",
+    "ix_products_stock",
+    "ix_orders_user_created",
+)
+
+
+def _hot_path_queries(category_ids: list[int], product_id: int, post_id: int, user_id: int) -> dict:
+    """Zapytania sklepu i panelu w tej postaci, w jakiej wysyłają je widoki."""
+    return {
+        "sklep: produkty kategorii": select(Product.id, Product.name)
+        .where(Product.category_id.in_(category_ids))
+        .order_by(Product.id.desc())
+        .limit(13),
+        "sklep: opinie produktu": select(Comment.id, Comment.content)
+        .where(Comment.product_id == product_id, Comment.status == "zaakceptowany")
+        .order_by(Comment.created_at.desc()),
+        "blog: lista wpisów": select(Post.id, Post.title)
+        .where(Post.status == "zaakceptowany")
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(7),
+        "blog: komentarze wpisu": select(Comment.id, Comment.content)
+        .where(Comment.post_id == post_id, Comment.status == "zaakceptowany")
+        .order_by(Comment.created_at.desc()),
+        "admin: kolejka komentarzy": select(Comment.id)
+        .where(Comment.status == "oczekuje")
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(51),
+        "admin: kolejka wpisów": select(Post.id)
+        .where(Post.status != "zaakceptowany")
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(51),
+        "admin: niski stan": select(Product.id, Product.stock)
+        .where(Product.stock <= LOW_STOCK_THRESHOLD)
+        .order_by(Product.stock.asc(), Product.id.asc())
+        .limit(20),
+        "konto: zamówienia użytkownika": select(Order.id, Order.status)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc()),
+    }
+
+
+def _seed_catalog(products: int, comments: int, posts: int, orders: int, users: int) -> dict:
+    """Losowe dane o proporcjach jak w sklepie; wstawiane paczkami przez Core."""
+    rnd = random.Random(42)
+    start = datetime(2024, 1, 1)
+
+    def moment():
+        return start + timedelta(seconds=rnd.randrange(0, 2 * 365 * 86400))
+
+    def insert(model, rows):
+        for i in range(0, len(rows), 5000):
+            db.session.execute(model.__table__.insert(), rows[i:i + 5000])
+
+    # kategorie przez ORM – zdarzenia budują domknięcie drzewa
+    categories = [Category(name=f"Benchmark {i}") for i in range(20)]
+    db.session.add_all(categories)
+    db.session.flush()
+    category_ids = [c.id for c in categories]
+
+    first = {}
+    for model in (User, Product, Post, Comment, Order):
+        first[model] = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    insert(User, [
+        {"email": f"bench-{time.time_ns()}-{i}@bimberek.local", "password_hash": "-"}
+        for i in range(users)
+    ])
+    user_ids = range(first[User], first[User] + users)
+    insert(Product, [
+        {
+            "name": f"Benchmark {i}",
+            "price": Decimal("10.00"),
+            "stock": rnd.choice((0, 1, 2, 3)) if rnd.random() < 0.02 else rnd.randrange(4, 500),
+            "category_id": rnd.choice(category_ids),
+        }
+        for i in range(products)
+    ])
+    product_ids = range(first[Product], first[Product] + products)
+    insert(Post, [
+        {
+            "title": f"Benchmark {i}",
+            "content_html": "-",
+            "status": "zaakceptowany" if rnd.random() < 0.95 else "oczekuje",
+            "author_id": rnd.choice(user_ids),
+            "created_at": moment(),
+        }
+        for i in range(posts)
+    ])
+    post_ids = range(first[Post], first[Post] + posts)
+    insert(Comment, [
+        {
+            "content": "-",
+            "status": "zaakceptowany" if rnd.random() < 0.97 else rnd.choice(("oczekuje", "odrzucony")),
+            "user_id": rnd.choice(user_ids),
+            "product_id": rnd.choice(product_ids) if i % 4 else None,
+            "post_id": None if i % 4 else rnd.choice(post_ids),
+            "created_at": moment(),
+        }
+        for i in range(comments)
+    ])
+    insert(Order, [
+        {
+            "user_id": rnd.choice(user_ids),
+            "status": "opłacone",
+            "shipping_address": "benchmark",
+            "created_at": moment(),
+        }
+        for _ in range(orders)
+    ])
+    db.session.commit()
+    return {
+        "first_ids": first,
+        "category_ids": category_ids,
+        "product_id": product_ids[len(product_ids) // 2],
+        "post_id": post_ids[len(post_ids) // 2],
+        "user_id": user_ids[len(user_ids) // 2],
+    }
+
+
+def _explain(stmt) -> str:
+    """Plan zapytania (parametry wklejone jako literały)."""
+    dialect = db.engine.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    rows = db.session.execute(text(prefix + sql)).all()
+    if dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in rows)
+    return "\n".join(str(row[0]) for row in rows)
+
+
+def _time_query(stmt, repeats: int) -> float:
+    """Mediana czasu zapytania w ms."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        db.session.execute(stmt).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def index_benchmark(database_url: str | None = None, products: int = 20000,
+                    comments: int = 200000, posts: int = 5000, orders: int = 50000,
+                    users: int = 2000, repeats: int = 20) -> list[dict]:
+    """
+    Zasiewa bazę benchmarku i dla każdego zapytania z ``_hot_path_queries``
+    mierzy plan i medianę czasu bez indeksów ``HOT_PATH_INDEXES`` i z nimi.
+    """
+    with bench_app(database_url) as app:
+        with app.app_context():
+            seeded = _seed_catalog(products, comments, posts, orders, users)
+            queries = _hot_path_queries(
+                seeded["category_ids"], seeded["product_id"], seeded["post_id"], seeded["user_id"]
+            )
+            indexes = [
+                index
+                for table in db.metadata.sorted_tables
+                for index in table.indexes
+                if index.name in HOT_PATH_INDEXES
+            ]
+
+            def measure():
+                if db.engine.dialect.name in ("sqlite", "postgresql"):
+                    db.session.execute(text("ANALYZE"))
+                    db.session.commit()
+                return {
+                    name: (_explain(stmt), _time_query(stmt, repeats))
+                    for name, stmt in queries.items()
+                }
+
+            try:
+                connection = db.session.connection()
+                for index in indexes:
+                    index.drop(bind=connection, checkfirst=True)
+                db.session.commit()
+                before = measure()
+
+                connection = db.session.connection()
+                for index in indexes:
+                    index.create(bind=connection, checkfirst=True)
+                db.session.commit()
+                after = measure()
+            finally:
+                db.session.rollback()
+                connection = db.session.connection()
+                for index in indexes:
+                    index.create(bind=connection, checkfirst=True)
+                db.session.commit()
+                if database_url is not None:
+                    first = seeded["first_ids"]
+                    for model in (Comment, Order, Post, Product, User):
+                        model.query.filter(model.id >= first[model]).delete(synchronize_session=False)
+                    # kategorie przez ORM – zdarzenie sprząta domknięcie drzewa
+                    for category in Category.query.filter(Category.id.in_(seeded["category_ids"])):
+                        db.session.delete(category)
+                    db.session.commit()
+
+    return [
+        {
+            "query": name,
+            "plan_before": before[name][0],
+            "ms_before": before[name][1],
+            "plan_after": after[name][0],
+            "ms_after": after[name][1],
+        }
+        for name in queries
+    ]
@@ -3,10 +3,13 @@
 from flask import render_template, redirect, url_for, flash, request, abort, current_app
 from flask_login import login_required, current_user
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
 
 from . import blog_bp
-from app.extensions import db
+from app.comment_votes import COMMENT_SORTS, comment_order, user_votes
+from app.extensions import db, page_cache
 from app.models import Post, Comment
+from app.pagination import keyset_paginate
 from .forms import PostForm, BlogCommentForm
 
 
@@ -27,14 +30,16 @@ def is_admin(user) -> bool:
 # =====================================================
 
 @blog_bp.route("/")
+@page_cache.cached(tags=["posts"])
 def post_list():
     """
     Lista publicznych wpisów:
     - tylko status = 'zaakceptowany'
-    - paginacja
+    - paginacja kursorowa po (created_at, id); ?page=N jako fallback
     - prosty search po tytule / treści (q)
     """
-    page = request.args.get("page", 1, type=int)
+    page = request.args.get("page", type=int)
+    cursor = request.args.get("cursor", type=str)
     q = (request.args.get("q") or "").strip()
 
     try:
@@ -49,8 +54,13 @@ def post_list():
                 )
             )
 
-        query = query.order_by(Post.created_at.desc())
-        posts = query.paginate(page=page, per_page=6, error_out=False)
+        posts = keyset_paginate(
+            query,
+            [(Post.created_at, True), (Post.id, True)],
+            cursor=cursor,
+            page=page,
+            per_page=6,
+        )
     except OperationalError:
         posts = None
 
@@ -98,15 +108,25 @@ def post_detail(post_id: int):
         if not (is_admin(current_user) or current_user.id == post.author_id):
             abort(404)
 
-    # zaakceptowane komentarze
+    # zaakceptowane komentarze – ?sort=best po score (indeks, bez liczenia głosów)
+    sort = request.args.get("sort", "newest")
+    if sort not in COMMENT_SORTS:
+        sort = "newest"
     try:
         comments = (
             Comment.query.filter_by(post_id=post.id, status="zaakceptowany")
-            .order_by(Comment.created_at.desc())
+            .options(joinedload(Comment.user))
+            .order_by(*comment_order(sort))
             .all()
         )
+        my_votes = (
+            user_votes(current_user.id, [c.id for c in comments])
+            if current_user.is_authenticated
+            else {}
+        )
     except OperationalError:
         comments = []
+        my_votes = {}
 
     form = BlogCommentForm()
     if form.validate_on_submit():
@@ -156,6 +176,9 @@ def post_detail(post_id: int):
         post=post,
         comments=comments,
         form=form,
+        sort=sort,
+        comment_sorts=COMMENT_SORTS,
+        my_votes=my_votes,
         prev_post=prev_post,
         next_post=next_post,
     )
@@ -189,6 +212,8 @@ def new_post():
             )
             db.session.add(post)
             db.session.commit()
+            if status == "zaakceptowany":
+                page_cache.purge("posts")
         except Exception as e: # [ZMIANA] Łapiemy ogólny błąd, a nie tylko OperationalError
             db.session.rollback()
             # [ZMIANA] Logujemy błąd do konsoli serwera (tam gdzie uruchamiasz 'flask run')
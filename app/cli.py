@@ -1,53 +1,195 @@
 # app/cli.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import click
 from flask import current_app
-from .extensions import db
-from .models import Category
+from sqlalchemy import insert, text
+
+from .bench import (
+    PASSWORD_METHODS,
+    checkout_stress,
+    index_benchmark,
+    order_lines_benchmark,
+    password_hash_benchmark,
+)
+from .comment_votes import recompute_scores
+from .counters import adjust_counter, recompute_counters
+from .extensions import db, page_cache
+from .images import DERIVED_DIR, derived_dir, generate_derivatives, products_dir
+from .models import Category, CategoryClosure
+from .outbox import drain_batch, requeue_dead
+from .sales import rebuild_rollups
+from .search import rebuild_search_index
+from .static_assets import brotli, precompress_static
+from .webhooks.events import process_pending, replay_lines
+
+
+class _ImportReport:
+    """Wynik importu kategorii (także dla --dry-run)."""
+
+    def __init__(self):
+        self.lines = 0
+        self.existed = 0
+        self.created = 0
+        self.skipped = 0
+        self.new_per_level: dict[int, int] = {}
+        self.examples: list[str] = []
+        self.timings: dict[str, float] = {}
 
 
-def _get_or_create_category(path: list[str]) -> Category:
+def _load_category_trie() -> tuple[dict[tuple, int], dict[int, int | None]]:
     """
-    Tworzy/znajduje kategorię po ścieżce hierarchicznej, np. ["Destylaty", "Cukrówka"].
-    Zwraca obiekt najgłębszego węzła.
+    Wczytuje całe istniejące drzewo JEDNYM zapytaniem.
+    Zwraca:
+      - trie: {(parent_id, nazwa): id}
+      - parents: {id: parent_id}
     """
-    parent = None
-    for name in path:
-        name = name.strip()
-        if not name:
-            continue
-        q = Category.query.filter_by(name=name, parent=parent).first()
-        if not q:
-            q = Category(name=name, parent=parent)
-            db.session.add(q)
-            db.session.flush()  # nadaj id, zanim pójdziemy głębiej
-        parent = q
-    return parent
-
-
-def _seed_from_lines(lines: list[str]) -> tuple[int, int]:
-    created = 0
-    existed = 0
+    trie: dict[tuple, int] = {}
+    parents: dict[int, int | None] = {}
+    rows = db.session.query(Category.id, Category.name, Category.parent_id).all()
+    for cid, name, parent_id in rows:
+        trie[(parent_id, name)] = cid
+        parents[cid] = parent_id
+    return trie, parents
+
+
+def _parse_category_line(raw: str) -> list[str] | None:
+    line = raw.strip()
+    if not line or line.startswith("#"):
+        return None
+    return [p.strip() for p in line.split(">") if p.strip()]
+
+
+def _seed_from_lines(lines, dry_run: bool = False, batch_size: int = 1000) -> _ImportReport:
+    """
+    Import kategorii w jednym przebiegu:
+
+    1. istniejące drzewo -> słownik w pamięci (1 zapytanie),
+    2. strumieniowo czytamy linie i porównujemy z drzewem; brakujące węzły
+       trafiają do drzewa „nowych” (klucz = ścieżka),
+    3. nowe węzły wstawiamy poziomami, paczkami po ``batch_size``
+       (INSERT ... RETURNING), razem z wierszami ``category_closure``.
+
+    ``lines`` może być dowolnym iterowalnym (np. otwartym plikiem).
+    """
+    report = _ImportReport()
+    max_len = Category.__table__.c.name.type.length
+
+    t0 = time.perf_counter()
+    trie, parents = _load_category_trie()
+    report.timings["wczytanie drzewa"] = time.perf_counter() - t0
+
+    # nowe węzły: ścieżka (krotka nazw) -> poziom; dict zachowuje kolejność z pliku
+    new_nodes: dict[tuple[str, ...], int] = {}
+
+    t0 = time.perf_counter()
     for raw in lines:
-        line = raw.strip()
-        if not line or line.startswith("#"):
+        parts = _parse_category_line(raw)
+        if parts is None:
             continue
-        parts = [p.strip() for p in line.split(">")]
-        # sprawdź czy istnieje już dokładnie taki węzeł
-        parent = None
-        exists_all = True
-        for name in parts:
-            found = Category.query.filter_by(name=name, parent=parent).first()
-            if not found:
-                exists_all = False
+        report.lines += 1
+        if not parts or any(len(p) > max_len for p in parts):
+            report.skipped += 1
+            continue
+
+        parent_id = None
+        missing_from = None
+        for level, name in enumerate(parts):
+            cid = trie.get((parent_id, name))
+            if cid is None:
+                missing_from = level
                 break
-            parent = found
-        if exists_all:
-            existed += 1
+            parent_id = cid
+
+        if missing_from is None:
+            report.existed += 1
             continue
-        _get_or_create_category(parts)
-        created += 1
+
+        for level in range(missing_from, len(parts)):
+            path = tuple(parts[: level + 1])
+            if path not in new_nodes:
+                new_nodes[path] = level
+                report.new_per_level[level] = report.new_per_level.get(level, 0) + 1
+                if len(report.examples) < 10:
+                    report.examples.append(" > ".join(path))
+    report.timings["analiza pliku"] = time.perf_counter() - t0
+    report.created = len(new_nodes)
+
+    if dry_run or not new_nodes:
+        return report
+
+    t0 = time.perf_counter()
+    # id węzłów z nowych ścieżek (istniejące prefiksy dociągamy z trie)
+    path_ids: dict[tuple[str, ...], int] = {}
+
+    def resolve(path: tuple[str, ...]) -> int | None:
+        if not path:
+            return None
+        if path in path_ids:
+            return path_ids[path]
+        cid = trie[(resolve(path[:-1]), path[-1])]
+        path_ids[path] = cid
+        return cid
+
+    def ancestors(cid: int) -> list[int]:
+        chain = []
+        cur = parents.get(cid)
+        while cur is not None:
+            chain.append(cur)
+            cur = parents.get(cur)
+        return chain
+
+    closure = CategoryClosure.__table__
+    inserted = 0
+    for level in sorted(report.new_per_level):
+        level_paths = [path for path, lvl in new_nodes.items() if lvl == level]
+        for i in range(0, len(level_paths), batch_size):
+            batch = level_paths[i : i + batch_size]
+            params = [
+                {"name": path[-1], "parent_id": resolve(path[:-1])} for path in batch
+            ]
+            result = db.session.execute(
+                insert(Category).returning(
+                    Category.id, sort_by_parameter_order=True
+                ),
+                params,
+            )
+            closure_rows = []
+            for path, param, cid in zip(batch, params, result.scalars()):
+                trie[(param["parent_id"], path[-1])] = cid
+                parents[cid] = param["parent_id"]
+                path_ids[path] = cid
+                closure_rows.append({"ancestor_id": cid, "descendant_id": cid, "depth": 0})
+                for depth, anc in enumerate(ancestors(cid), start=1):
+                    closure_rows.append(
+                        {"ancestor_id": anc, "descendant_id": cid, "depth": depth}
+                    )
+            db.session.execute(closure.insert(), closure_rows)
+            inserted += len(batch)
+    # hurtowy INSERT omija zdarzenia ORM – licznik dashboardu poprawiamy sami
+    adjust_counter(db.session.connection(), "categories", inserted)
+    db.session.commit()
+    report.timings["zapis"] = time.perf_counter() - t0
+    return report
+
+
+def _rebuild_category_closure() -> int:
+    """Przelicza tabelę domknięcia drzewa kategorii od zera (z parent_id)."""
+    CategoryClosure.query.delete()
+    db.session.execute(text(
+        "WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS ("
+        " SELECT id, id, 0 FROM categories"
+        " UNION ALL"
+        " SELECT t.ancestor_id, c.id, t.depth + 1"
+        " FROM tree t JOIN categories c ON c.parent_id = t.descendant_id"
+        ") "
+        "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, descendant_id, depth FROM tree"
+    ))
     db.session.commit()
-    return created, existed
+    return CategoryClosure.query.count()
 
 
 def _default_category_lines() -> list[str]:
@@ -81,21 +223,47 @@ def register_cli(app):
     @app.cli.command("seed-categories")
     @click.option("--defaults", is_flag=True, help="Zasiej domyślne kategorie.")
     @click.option("--file", "file_path", type=click.Path(exists=True), help="Ścieżka do pliku z kategoriami.")
-    def seed_categories(defaults: bool, file_path: str | None):
+    @click.option("--dry-run", is_flag=True, help="Tylko raport – nic nie zapisuje.")
+    @click.option("--batch-size", default=1000, show_default=True, help="Ile węzłów w jednym INSERT.")
+    def seed_categories(defaults: bool, file_path: str | None, dry_run: bool, batch_size: int):
         """
         Wczytuje kategorie z pliku (linia = 'A > B > C') albo z zestawu domyślnego.
+        Plik jest czytany strumieniowo, nowe węzły wstawiane paczkami poziomami.
         """
         if not defaults and not file_path:
             raise click.UsageError("Użyj --defaults lub --file PATH")
 
+        started = time.perf_counter()
         if file_path:
             with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+                report = _seed_from_lines(f, dry_run=dry_run, batch_size=batch_size)
         else:
-            lines = _default_category_lines()
+            report = _seed_from_lines(
+                _default_category_lines(), dry_run=dry_run, batch_size=batch_size
+            )
+        elapsed = time.perf_counter() - started
 
-        created, existed = _seed_from_lines(lines)
-        click.echo(f"OK. Utworzone: {created}, już były: {existed}")
+        if dry_run:
+            click.echo("[dry-run] Nic nie zostało zapisane.")
+            click.echo(
+                f"Linie: {report.lines}, już były: {report.existed}, "
+                f"pominięte: {report.skipped}, nowe węzły: {report.created}"
+            )
+            for level in sorted(report.new_per_level):
+                click.echo(f"  poziom {level + 1}: {report.new_per_level[level]} nowych")
+            for example in report.examples:
+                click.echo(f"  + {example}")
+        else:
+            if report.created:
+                page_cache.purge("categories")
+            click.echo(
+                f"OK. Utworzone: {report.created}, już były: {report.existed}, "
+                f"pominięte: {report.skipped}"
+            )
+
+        for phase, seconds in report.timings.items():
+            click.echo(f"  {phase}: {seconds * 1000:.1f} ms")
+        click.echo(f"  razem: {elapsed * 1000:.1f} ms")
 
     @app.cli.command("list-categories")
     def list_categories():
@@ -113,3 +281,272 @@ def register_cli(app):
             return
         for r in sorted(roots, key=lambda c: c.name.lower()):
             dump(r)
+
+    @app.cli.command("rebuild-category-tree")
+    def rebuild_category_tree():
+        """
+        Odbudowuje tabelę domknięcia drzewa kategorii (category_closure)
+        na podstawie parent_id – np. po ręcznych zmianach w bazie.
+        """
+        rows = _rebuild_category_closure()
+        page_cache.purge("categories", "products")
+        click.echo(f"OK. Wiersze w category_closure: {rows}")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_cmd():
+        """
+        Odbudowuje od zera indeks pełnotekstowy produktów
+        (FTS5 na SQLite, tsvector/GIN na PostgreSQL).
+        """
+        indexed = rebuild_search_index()
+        click.echo(f"OK. Zaindeksowane produkty: {indexed}")
+
+    @app.cli.command("recompute-counters")
+    def recompute_counters_cmd():
+        """
+        Przelicza od zera liczniki dashboardu (tabela admin_counters),
+        np. po zmianach robionych z pominięciem ORM.
+        """
+        values = recompute_counters()
+        for name, value in values.items():
+            click.echo(f"  {name}: {value}")
+        click.echo("OK. Liczniki przeliczone.")
+
+    @app.cli.command("recompute-comment-scores")
+    def recompute_comment_scores():
+        """
+        Przelicza comments.score / votes_count z tabeli comment_votes,
+        np. po zmianach głosów robionych z pominięciem app/comment_votes.py.
+        """
+        updated = recompute_scores()
+        click.echo(f"OK. Przeliczone komentarze: {updated}")
+
+    @app.cli.command("rebuild-sales-rollups")
+    @click.option("--since", default=None, type=click.DateTime(formats=["%Y-%m-%d"]),
+                  help="Przelicz tylko od tego dnia (RRRR-MM-DD).")
+    def rebuild_sales_rollups(since):
+        """
+        Odbudowuje agregaty sprzedaży (sales_daily*) z opłaconych zamówień
+        – jedno INSERT ... SELECT ... GROUP BY na tabelę.
+        """
+        started = time.perf_counter()
+        counts = rebuild_rollups(since.date() if since else None)
+        elapsed = time.perf_counter() - started
+        click.echo(
+            f"OK. Dni: {counts['days']}, wiersze produktów: {counts['products']}, "
+            f"wiersze kategorii: {counts['categories']}, czas: {elapsed:.2f} s"
+        )
+
+    @app.cli.command("generate-image-derivatives")
+    @click.option("--force", is_flag=True, help="Generuj ponownie także istniejące pochodne.")
+    @click.option("--workers", default=None, type=int, help="Liczba procesów (domyślnie IMAGE_WORKERS).")
+    def generate_image_derivatives(force: bool, workers: int | None):
+        """
+        Generuje pochodne (thumb/card/hero, WebP + JPEG) dla wszystkich
+        zdjęć w static/images/products.
+        """
+        src_dir = products_dir()
+        out_dir = derived_dir()
+        names = sorted(
+            name for name in os.listdir(src_dir)
+            if name != DERIVED_DIR and os.path.isfile(os.path.join(src_dir, name))
+        ) if os.path.isdir(src_dir) else []
+        if not names:
+            click.echo("Brak zdjęć w static/images/products.")
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=workers or current_app.config.get("IMAGE_WORKERS", 2)) as pool:
+            futures = {
+                pool.submit(generate_derivatives, os.path.join(src_dir, name), out_dir, force): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as exc:  # uszkodzony plik nie przerywa całości
+                    failed += 1
+                    click.echo(f"  ! {futures[future]}: {exc}")
+        elapsed = time.perf_counter() - started
+        click.echo(f"OK. Zdjęcia: {done}, błędy: {failed}, czas: {elapsed:.1f} s")
+
+    @app.cli.command("precompress-static")
+    @click.option("--min-size", default=256, show_default=True, help="Pomijaj mniejsze pliki (bajty).")
+    @click.option("--force", is_flag=True, help="Kompresuj ponownie także aktualne warianty.")
+    def precompress_static_cmd(min_size: int, force: bool):
+        """
+        Zapisuje warianty .gz i .br plików tekstowych z katalogu static
+        (CSS, JS, SVG...). Uruchamiać przy każdym wdrożeniu.
+        """
+        if brotli is None:
+            click.echo("Brak pakietu Brotli – powstaną tylko warianty .gz.")
+        stats = precompress_static(app.static_folder, min_size=min_size, force=force)
+        click.echo(
+            f"OK. Pliki: {stats['files']}, zapisane warianty: {stats['written']}, "
+            f"aktualne: {stats['skipped']}, oszczędność: {stats['saved_bytes'] / 1024:.1f} KiB"
+        )
+
+    @app.cli.command("outbox-worker")
+    @click.option("--once", is_flag=True, help="Jedna paczka i koniec (np. z crona).")
+    @click.option("--batch-size", default=None, type=int, help="Domyślnie MAIL_OUTBOX_BATCH_SIZE.")
+    @click.option("--interval", default=5.0, show_default=True, help="Przerwa, gdy kolejka pusta (s).")
+    def outbox_worker(once: bool, batch_size: int | None, interval: float):
+        """
+        Wysyła maile z kolejki email_outbox paczkami (jedno połączenie SMTP
+        na paczkę), z ponawianiem i stanem "martwy" po wyczerpaniu prób.
+        """
+        while True:
+            stats = drain_batch(batch_size)
+            if any(stats.values()):
+                click.echo(
+                    f"Wysłane: {stats['sent']}, do ponowienia: {stats['retry']}, "
+                    f"martwe: {stats['dead']}"
+                )
+            if once:
+                return
+            if not stats["sent"]:
+                time.sleep(interval)
+
+    @app.cli.command("outbox-requeue")
+    @click.argument("ids", nargs=-1, type=int)
+    def outbox_requeue(ids: tuple[int, ...]):
+        """Przywraca martwe maile do kolejki (wszystkie albo podane ID)."""
+        count = requeue_dead(list(ids))
+        click.echo(f"OK. Przywrócone: {count}")
+
+    @app.cli.command("stripe-process-events")
+    @click.option("--once", is_flag=True, help="Jedna paczka i koniec.")
+    @click.option("--batch-size", default=100, show_default=True)
+    @click.option("--interval", default=2.0, show_default=True, help="Przerwa, gdy brak zdarzeń (s).")
+    def stripe_process_events(once: bool, batch_size: int, interval: float):
+        """Przetwarza zapisane zdarzenia Stripe (zmiany statusów zamówień)."""
+        while True:
+            stats = process_pending(batch_size)
+            if any(stats.values()):
+                click.echo(f"Przetworzone: {stats['processed']}, błędy: {stats['failed']}")
+            if once:
+                return
+            if not stats["processed"]:
+                time.sleep(interval)
+
+    @app.cli.command("stripe-replay-events")
+    @click.argument("file_path", type=click.Path(exists=True))
+    @click.option("--force", is_flag=True, help="Przetwórz ponownie także już przetworzone.")
+    def stripe_replay_events(file_path: str, force: bool):
+        """
+        Odtwarza zdarzenia Stripe z pliku JSONL (linia = obiekt zdarzenia),
+        bez weryfikacji podpisu – do testów.
+        """
+        with open(file_path, "r", encoding="utf-8") as f:
+            stats = replay_lines(f, force=force)
+        click.echo(
+            f"OK. Linie: {stats['lines']}, nowe: {stats['new']}, przetworzone: "
+            f"{stats['processed']}, błędy: {stats['failed']}, pominięte: {stats['skipped']}"
+        )
+
+    @app.cli.command("bench-checkout")
+    @click.option("--database-url", default=None, help="Pusta baza testowa (domyślnie tymczasowy SQLite w WAL).")
+    @click.option("--threads", default=16, show_default=True)
+    @click.option("--orders", default=400, show_default=True, help="Liczba równoległych zamówień.")
+    @click.option("--stock", default=100, show_default=True, help="Stan produktu na starcie.")
+    @click.option("--quantity", default=1, show_default=True, help="Sztuk w jednym zamówieniu.")
+    @click.option("--naive", is_flag=True, help="Dla porównania: stary odczyt-sprawdzenie-zapis.")
+    def bench_checkout(database_url: str | None, threads: int, orders: int, stock: int,
+                       quantity: int, naive: bool):
+        """
+        Wiele wątków jednocześnie składa zamówienia na ten sam produkt;
+        raport: przepustowość i sprzedaż ponad stan (oversell).
+        """
+        r = checkout_stress(database_url, threads=threads, orders=orders, stock=stock,
+                            quantity=quantity, naive=naive)
+        click.echo(
+            f"{r['dialect']} / {r['mode']}: {r['orders']} zamówień w {r['threads']} wątkach, "
+            f"{r['elapsed']:.2f} s ({r['throughput']:.0f} zam./s)"
+        )
+        click.echo(
+            f"  przyjęte: {r['ok']}, brak towaru: {r['out_of_stock']}, błędy: {r['errors']}"
+        )
+        if r["first_error"]:
+            click.echo(f"  pierwszy błąd: {r['first_error'][:200]}")
+        click.echo(
+            f"  stan: {r['initial_stock']} -> {r['final_stock']}, sprzedane: {r['sold']}, "
+            f"oversell: {r['oversell']}, zgubione aktualizacje stanu: {r['lost_updates']}"
+        )
+
+    @app.cli.command("bench-order-lines")
+    @click.option("--database-url", default=None, help="Pusta baza testowa (domyślnie tymczasowy SQLite w WAL).")
+    @click.option("--sizes", default="1,100", show_default=True, help="Wielkości koszyka (pozycje).")
+    @click.option("--repeats", default=50, show_default=True, help="Zamówień na każdą wielkość.")
+    def bench_order_lines(database_url: str | None, sizes: str, repeats: int):
+        """Porównuje składanie zamówienia z małego i dużego koszyka."""
+        parsed = tuple(int(x) for x in sizes.split(",") if x.strip())
+        for r in order_lines_benchmark(database_url, sizes=parsed, repeats=repeats):
+            click.echo(
+                f"{r['lines']:>4} poz.: {r['ms_per_order']:.2f} ms/zamówienie, "
+                f"{r['calls_per_order']:.1f} wywołań bazy/zamówienie"
+            )
+
+    @app.cli.command("bench-indexes")
+    @click.option("--database-url", default=None, help="Pusta baza testowa (domyślnie tymczasowy SQLite w WAL).")
+    @click.option("--products", default=20000, show_default=True)
+    @click.option("--comments", default=200000, show_default=True)
+    @click.option("--posts", default=5000, show_default=True)
+    @click.option("--orders", default=50000, show_default=True)
+    @click.option("--repeats", default=20, show_default=True, help="Powtórzeń zapytania (mediana).")
+    @click.option("--plans/--no-plans", default=True, show_default=True, help="Wypisuj plany EXPLAIN.")
+    def bench_indexes(database_url: str | None, products: int, comments: int, posts: int,
+                      orders: int, repeats: int, plans: bool):
+        """
+        Zasiewa dużą bazę i porównuje plany EXPLAIN oraz czasy zapytań
+        sklepu i panelu bez indeksów z migracji e8a3c5f1d702 i z nimi.
+        """
+        click.echo("Zasiewanie bazy i pomiar (to może potrwać)...")
+        report = index_benchmark(
+            database_url,
+            products=products,
+            comments=comments,
+            posts=posts,
+            orders=orders,
+            repeats=repeats,
+        )
+        for r in report:
+            speedup = r["ms_before"] / r["ms_after"] if r["ms_after"] else 0.0
+            click.echo(
+                f"{r['query']:<32} przed: {r['ms_before']:8.2f} ms   po: {r['ms_after']:8.2f} ms"
+                f"   ×{speedup:.1f}"
+            )
+            if plans:
+                for label, plan in (("przed", r["plan_before"]), ("po", r["plan_after"])):
+                    click.echo(f"    [{label}]")
+                    for line in plan.splitlines():
+                        click.echo(f"      {line}")
+
+    @app.cli.command("bench-password-hash")
+    @click.option("--method", "methods", multiple=True,
+                  help="Metoda Werkzeug (można wiele razy); domyślnie kilka typowych + bieżąca.")
+    @click.option("--seconds", default=2.0, show_default=True, help="Czas pomiaru na ustawienie.")
+    @click.option("--threads", default=None, type=int, help="Wątki naraz (domyślnie liczba rdzeni).")
+    def bench_password_hash(methods: tuple[str, ...], seconds: float, threads: int | None):
+        """
+        Mierzy hashowanie haseł dla kilku ustawień: czas jednego hasha
+        i hashe/s na rdzeń – do doboru PASSWORD_HASH_METHOD.
+        """
+        current = app.config.get("PASSWORD_HASH_METHOD", "scrypt")
+        for r in password_hash_benchmark(methods or (*PASSWORD_METHODS, current), seconds, threads):
+            mark = " (bieżąca)" if r["method"] == current else ""
+            click.echo(
+                f"{r['method']:<24} {r['ms_per_hash']:7.1f} ms/hash, "
+                f"{r['single']:6.1f}/s w 1 wątku, {r['parallel']:6.1f}/s w {r['threads']}, "
+                f"{r['per_core']:6.1f}/s na rdzeń{mark}"
+            )
+
+    @app.cli.command("page-cache-clear")
+    def page_cache_clear():
+        """
+        Czyści cache stron. Ma sens dla PAGE_CACHE_BACKEND=filesystem –
+        cache "memory" żyje w procesach serwera.
+        """
+        page_cache.clear()
+        click.echo("OK. Cache stron wyczyszczony.")
@@ -0,0 +1,120 @@
+# app/comment_votes.py
+"""
+Głosy na komentarze („pomocny” / „niepomocny”).
+
+Jeden głos użytkownika na komentarz (``uq_comment_votes_comment_user``):
+ponowny głos nadpisuje poprzedni (upsert), ``value=0`` go wycofuje.
+W tej samej transakcji ``comments.score`` (suma głosów) i
+``comments.votes_count`` są przeliczane z głosów tego jednego komentarza
+(po unikalnym indeksie to kilka wierszy).
+
+Równoległe głosy na ten sam komentarz: najpierw blokujemy jego wiersz
+(``SELECT ... FOR UPDATE``), dopiero potem upsert i przeliczenie. Bez
+blokady w READ COMMITTED (PostgreSQL) ``UPDATE`` czekający na cudzą
+blokadę policzyłby sumę z migawki sprzed cudzego commita i zgubił głos.
+SQLite szereguje zapisy sam – tam ``FOR UPDATE`` jest pomijane.
+
+Strony produktu i wpisu sortują po ``score`` bez ``GROUP BY`` po głosach
+(indeksy ``ix_comments_*_status_score``). Zmiany z pominięciem tego modułu
+naprawia ``flask recompute-comment-scores``.
+"""
+from __future__ import annotations
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import Comment, CommentVote
+
+VOTE_VALUES = (1, -1, 0)
+# sortowania listy komentarzy (?sort=)
+COMMENT_SORTS = {"newest": "Najnowsze", "best": "Najbardziej pomocne"}
+
+_comments = Comment.__table__
+_votes = CommentVote.__table__
+
+
+def _upsert(connection, comment_id: int, user_id: int, value: int) -> None:
+    key = and_(_votes.c.comment_id == comment_id, _votes.c.user_id == user_id)
+    if value == 0:
+        connection.execute(_votes.delete().where(key))
+        return
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = insert(_votes).values(comment_id=comment_id, user_id=user_id, value=value)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["comment_id", "user_id"],
+                set_={"value": stmt.excluded.value},
+            )
+        )
+        return
+    if not connection.execute(_votes.update().where(key).values(value=value)).rowcount:
+        connection.execute(
+            _votes.insert().values(comment_id=comment_id, user_id=user_id, value=value)
+        )
+
+
+def _score_values(comment_id):
+    """Kolumny ``score`` / ``votes_count`` jako podzapytania po głosach komentarza."""
+    where = _votes.c.comment_id == comment_id
+    return {
+        "score": select(func.coalesce(func.sum(_votes.c.value), 0)).where(where).scalar_subquery(),
+        "votes_count": select(func.count()).where(where).scalar_subquery(),
+    }
+
+
+def cast_vote(comment_id: int, user_id: int, value: int) -> tuple[int, int]:
+    """
+    Zapisuje głos (``1``, ``-1`` albo ``0`` = wycofanie), przelicza licznik
+    komentarza i commituje. Zwraca ``(score, votes_count)``.
+    """
+    if value not in VOTE_VALUES:
+        raise ValueError(f"Niepoprawny głos: {value!r}")
+    connection = db.session.connection()
+    # blokada wiersza komentarza – kolejne głosy na niego czekają do commita
+    connection.execute(
+        select(_comments.c.id).where(_comments.c.id == comment_id).with_for_update()
+    )
+    _upsert(connection, comment_id, user_id, value)
+    connection.execute(
+        _comments.update()
+        .where(_comments.c.id == comment_id)
+        .values(**_score_values(comment_id))
+    )
+    row = connection.execute(
+        select(_comments.c.score, _comments.c.votes_count).where(_comments.c.id == comment_id)
+    ).one()
+    db.session.commit()
+    return row.score, row.votes_count
+
+
+def comment_order(sort: str | None):
+    """``ORDER BY`` listy komentarzy: ``best`` (najlepsze) albo domyślnie najnowsze."""
+    if sort == "best":
+        return [Comment.score.desc(), Comment.id.desc()]
+    return [Comment.created_at.desc()]
+
+
+def user_votes(user_id: int, comment_ids) -> dict[int, int]:
+    """Głosy użytkownika na podanych komentarzach (jedno zapytanie) – do podświetlenia."""
+    if not comment_ids:
+        return {}
+    return dict(
+        db.session.execute(
+            select(_votes.c.comment_id, _votes.c.value).where(
+                _votes.c.user_id == user_id, _votes.c.comment_id.in_(list(comment_ids))
+            )
+        ).all()
+    )
+
+
+def recompute_scores() -> int:
+    """Przelicza ``score`` / ``votes_count`` wszystkich komentarzy i commituje."""
+    updated = db.session.execute(
+        _comments.update().values(**_score_values(_comments.c.id))
+    ).rowcount
+    db.session.commit()
+    return updated
@@ -18,6 +18,71 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # --- Cache stron dla gości (shop.index, kategorie, produkt, blog) ---
+    # PAGE_CACHE_BACKEND: "memory" (LRU w procesie) albo "filesystem"
+    # (wspólny katalog dla wielu workerów – wtedy purge działa między nimi)
+    PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "true").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+    PAGE_CACHE_BACKEND = os.environ.get("PAGE_CACHE_BACKEND", "memory")
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 512))
+    # limit rozmiaru katalogu backendu "filesystem" (bajty)
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    PAGE_CACHE_DIR = os.environ.get(
+        "PAGE_CACHE_DIR",
+        os.path.join(BASEDIR, "..", "instance", "page_cache"),
+    )
+    PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", 300))
+
+    # Migawka aktywnego slidera trzymana w pamięci procesu (sekundy).
+    # Panel admina unieważnia ją od razu w swoim procesie, pozostałe
+    # workery odświeżą ją najpóźniej po tym czasie.
+    SLIDER_SNAPSHOT_TTL = int(os.environ.get("SLIDER_SNAPSHOT_TTL", 60))
+
+    # --- Hasła (app/passwords.py) ---
+    # metoda w formacie Werkzeug: "scrypt:N:r:p" albo "pbkdf2:sha256:iteracje";
+    # po zmianie hashe przeliczają się przy najbliższym logowaniu.
+    # Koszt dobrać komendą: flask bench-password-hash
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+    # wątki liczące hashe (0 = liczba rdzeni), miejsca w kolejce i czas
+    # czekania na miejsce (s), po którym logowanie dostaje 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 0))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 32))
+    PASSWORD_HASH_WAIT = float(os.environ.get("PASSWORD_HASH_WAIT", 5))
+
+    # --- Cache użytkowników dla Flask-Login (app/user_cache.py) ---
+    # LRU w procesie; inne workery widzą zmianę roli/e-maila najpóźniej po TTL.
+    # USER_CACHE_TTL=0 wyłącza cache (User z bazy przy każdym żądaniu).
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+
+    # --- Pliki statyczne (app/static_assets.py) ---
+    # url_for('static') z ?v=<hash treści> i Cache-Control: immutable
+    STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "true").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+    STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 365 * 24 * 3600))
+
+    # --- Pochodne zdjęć produktów (app/images.py) ---
+    # liczba procesów skalujących; IMAGE_DERIVATIVES_SYNC=true liczy od razu w żądaniu
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+    IMAGE_DERIVATIVES_SYNC = os.environ.get("IMAGE_DERIVATIVES_SYNC", "false").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+
     # --- Mail (opcjonalnie, używane przy powiadomieniach o płatności) ---
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "localhost")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 25))
@@ -34,11 +99,58 @@ class Config:
         "MAIL_DEFAULT_SENDER",
         "sklep@bimberek.local",
     )
+    # kolejka email_outbox (app/outbox.py): paczka na jedno połączenie SMTP,
+    # liczba prób i odstępy (base * 2^(próba-1), najwyżej RETRY_MAX sekund)
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("MAIL_OUTBOX_BATCH_SIZE", 50))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("MAIL_OUTBOX_MAX_ATTEMPTS", 6))
+    MAIL_OUTBOX_RETRY_BASE = int(os.environ.get("MAIL_OUTBOX_RETRY_BASE", 60))
+    MAIL_OUTBOX_RETRY_MAX = int(os.environ.get("MAIL_OUTBOX_RETRY_MAX", 6 * 3600))
 
     # --- Stripe (płatności) ---
     STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
     STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
     STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+    # zdarzenia z webhooka przetwarzać zaraz po odpowiedzi w tym samym procesie;
+    # false = tylko osobny worker (flask stripe-process-events)
+    STRIPE_EVENTS_INLINE = os.environ.get("STRIPE_EVENTS_INLINE", "true").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+    STRIPE_EVENT_MAX_ATTEMPTS = int(os.environ.get("STRIPE_EVENT_MAX_ATTEMPTS", 5))
+    # klient API (app/shop/payments.py): pula połączeń i timeouty w sekundach;
+    # STRIPE_API_BASE np. http://localhost:12111 dla lokalnego stripe-mock
+    STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE")
+    STRIPE_CONNECT_TIMEOUT = float(os.environ.get("STRIPE_CONNECT_TIMEOUT", 5))
+    STRIPE_READ_TIMEOUT = float(os.environ.get("STRIPE_READ_TIMEOUT", 20))
+    STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get("STRIPE_MAX_NETWORK_RETRIES", 2))
+    STRIPE_HTTP_POOL_SIZE = int(os.environ.get("STRIPE_HTTP_POOL_SIZE", 10))
+    # czas życia sesji Checkout (min. 1800 s) i zapas, poniżej którego
+    # zapisana sesja nie jest już używana ponownie
+    STRIPE_SESSION_TTL = int(os.environ.get("STRIPE_SESSION_TTL", 3600))
+    STRIPE_SESSION_REUSE_MARGIN = int(os.environ.get("STRIPE_SESSION_REUSE_MARGIN", 300))
+
+    # --- Instrumentacja SQL (app/sql_stats.py) ---
+    # Liczba i czas zapytań na żądanie w nagłówku Server-Timing oraz
+    # ostrzeżenie w logu, gdy to samo zapytanie idzie wielokrotnie
+    # z różnymi parametrami (N+1). Domyślnie wyłączona.
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "false").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+    SQL_SERVER_TIMING = os.environ.get("SQL_SERVER_TIMING", "true").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", 5))
 
     # --- Google OAuth (Authlib) ---
     # Obsługujemy obie nazwy zmiennych, żeby zgadzało się z README:
@@ -52,6 +164,31 @@ class Config:
         os.environ.get("GOOGLE_CLIENT_SECRET")
         or os.environ.get("OAUTH_GOOGLE_CLIENT_SECRET", "")
     )
+    # dokument discovery – do testów można wskazać lokalny serwer-atrapę
+    GOOGLE_DISCOVERY_URL = os.environ.get(
+        "GOOGLE_DISCOVERY_URL",
+        "https://accounts.google.com/.well-known/openid-configuration",
+    )
+
+    # --- Cache discovery / JWKS dostawców OAuth (app/oidc_cache.py) ---
+    # Kopia na dysku jest wspólna dla workerów i przeżywa restart. TTL
+    # z Cache-Control: max-age, a bez niego OIDC_CACHE_TTL; po nieudanym
+    # odświeżeniu stara kopia zostaje na OIDC_CACHE_RETRY sekund.
+    OIDC_CACHE_DIR = os.environ.get(
+        "OIDC_CACHE_DIR",
+        os.path.join(BASEDIR, "..", "instance", "oidc_cache"),
+    )
+    OIDC_CACHE_TTL = int(os.environ.get("OIDC_CACHE_TTL", 3600))
+    OIDC_CACHE_RETRY = int(os.environ.get("OIDC_CACHE_RETRY", 60))
+    OIDC_HTTP_TIMEOUT = float(os.environ.get("OIDC_HTTP_TIMEOUT", 10))
+    # pobranie dokumentów przy starcie workera (zamiast przy pierwszym logowaniu)
+    OIDC_PREFETCH = os.environ.get("OIDC_PREFETCH", "false").lower() in (
+        "true",
+        "1",
+        "t",
+        "yes",
+        "y",
+    )
 
     # [ZMIANA] Dodane klucze dla Facebook OAuth
     FACEBOOK_CLIENT_ID = os.environ.get("FACEBOOK_CLIENT_ID", "")
@@ -0,0 +1,186 @@
+# app/counters.py
+"""
+Liczniki dla dashboardu admina.
+
+Zamiast kilkunastu ``COUNT(*)`` przy każdym wejściu na dashboard liczniki
+siedzą w tabeli ``admin_counters`` (nazwa -> wartość) i są aktualizowane
+przez zdarzenia ORM (insert / update / delete) w tej samej transakcji co
+zmiana. Dashboard czyta je jednym zapytaniem.
+
+Zmiany robione z pominięciem ORM (``Query.update()``, ``Query.delete()``,
+surowy SQL) nie przechodzą przez zdarzenia – po takich operacjach trzeba
+poprawić liczniki ręcznie (``adjust_counter``) albo przeliczyć je
+komendą ``flask recompute-counters``.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from .extensions import db
+from .models import AdminCounter, Category, Comment, Post, Product, Report, Slider
+
+# próg „niskiego stanu” magazynowego na dashboardzie
+LOW_STOCK_THRESHOLD = 3
+
+
+class _Counter(NamedTuple):
+    model: type
+    # kolumna, od której zależy, czy wiersz jest liczony (None = każdy wiersz)
+    field: str | None = None
+    # warunek w Pythonie (dla zdarzeń) i w SQL (dla przeliczenia) – muszą się zgadzać
+    matches: object = None
+    where: object = None
+
+
+COUNTERS: dict[str, _Counter] = {
+    "products": _Counter(Product),
+    "categories": _Counter(Category),
+    "comments": _Counter(Comment),
+    "comments_pending": _Counter(
+        Comment,
+        "status",
+        lambda v: v is not None and v != "zaakceptowany",
+        Comment.status != "zaakceptowany",
+    ),
+    "posts": _Counter(Post),
+    "posts_pending": _Counter(
+        Post,
+        "status",
+        lambda v: v is not None and v != "zaakceptowany",
+        Post.status != "zaakceptowany",
+    ),
+    "sliders": _Counter(Slider),
+    "reports_open": _Counter(Report, "status", lambda v: v == "open", Report.status == "open"),
+}
+
+
+def _counted(counter: _Counter, value) -> bool:
+    return counter.field is None or bool(counter.matches(value))
+
+
+# =========================
+# Aktualizacja przez zdarzenia ORM
+# =========================
+
+
+def adjust_counter(connection, name: str, delta: int) -> None:
+    """``value = value + delta`` – atomowo, bez czytania licznika."""
+    if not delta:
+        return
+    table = AdminCounter.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.name == name)
+        .values(value=table.c.value + delta)
+    )
+
+
+def _on_insert(mapper, connection, target):
+    for name, counter in COUNTERS.items():
+        if isinstance(target, counter.model) and _counted(
+            counter, counter.field and getattr(target, counter.field)
+        ):
+            adjust_counter(connection, name, 1)
+
+
+def _on_delete(mapper, connection, target):
+    for name, counter in COUNTERS.items():
+        if isinstance(target, counter.model) and _counted(
+            counter, counter.field and getattr(target, counter.field)
+        ):
+            adjust_counter(connection, name, -1)
+
+
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    for name, counter in COUNTERS.items():
+        if counter.field is None or not isinstance(target, counter.model):
+            continue
+        history = state.attrs[counter.field].history
+        if not history.has_changes():
+            continue
+        new = getattr(target, counter.field)
+        old = history.deleted[0] if history.deleted else None
+        delta = int(_counted(counter, new)) - int(_counted(counter, old))
+        adjust_counter(connection, name, delta)
+
+
+for _model in {c.model for c in COUNTERS.values()}:
+    event.listen(_model, "after_insert", _on_insert)
+    event.listen(_model, "after_delete", _on_delete)
+    if any(c.model is _model and c.field for c in COUNTERS.values()):
+        event.listen(_model, "after_update", _on_update)
+
+
+# =========================
+# Odczyt / przeliczenie
+# =========================
+
+
+def _live_counts() -> dict[str, object]:
+    """Wartości liczone od zera – kolumny do jednego SELECT-a."""
+    return {
+        name: select(func.count())
+        .select_from(counter.model)
+        .where(*([counter.where] if counter.where is not None else []))
+        .scalar_subquery()
+        for name, counter in COUNTERS.items()
+    }
+
+
+def _low_stock_count():
+    return (
+        select(func.count())
+        .select_from(Product)
+        .where(Product.stock <= LOW_STOCK_THRESHOLD)
+        .scalar_subquery()
+    )
+
+
+def dashboard_counts() -> dict[str, int]:
+    """
+    Wszystkie liczniki dashboardu jednym zapytaniem. Liczba produktów
+    z niskim stanem jest liczona na bieżąco (stan zmienia się też poza ORM).
+    Bez tabeli ``admin_counters`` (brak migracji) – liczenie na żywo,
+    nadal jednym zapytaniem.
+    """
+    c = AdminCounter.__table__.c
+    columns = [
+        func.coalesce(func.max(case((c.name == name, c.value))), 0).label(name)
+        for name in COUNTERS
+    ]
+    stmt = select(*columns, _low_stock_count().label("low_stock")).select_from(
+        AdminCounter.__table__
+    )
+    try:
+        row = db.session.execute(stmt).one()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        live = _live_counts()
+        row = db.session.execute(
+            select(
+                *[col.label(name) for name, col in live.items()],
+                _low_stock_count().label("low_stock"),
+            )
+        ).one()
+    return dict(row._mapping)
+
+
+def recompute_counters() -> dict[str, int]:
+    """Przelicza wszystkie liczniki od zera i zapisuje je w ``admin_counters``."""
+    live = _live_counts()
+    row = db.session.execute(
+        select(*[col.label(name) for name, col in live.items()])
+    ).one()
+    values = dict(row._mapping)
+
+    table = AdminCounter.__table__
+    db.session.execute(table.delete())
+    db.session.execute(
+        table.insert(), [{"name": name, "value": value} for name, value in values.items()]
+    )
+    db.session.commit()
+    return values
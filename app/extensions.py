@@ -5,8 +5,11 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from authlib.integrations.flask_client import OAuth
 
+from .page_cache import PageCache
+
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 mail = Mail()
 oauth = OAuth()
+page_cache = PageCache()
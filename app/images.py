@@ -0,0 +1,255 @@
+# app/images.py
+"""
+Pochodne zdjęć produktów (miniatury w kilku rozmiarach).
+
+Dla każdego wgranego pliku ``static/images/products/<nazwa>`` powstają
+w ``static/images/products/derived/``:
+
+    <rdzeń>-thumb.webp / .jpg   (max 160 px)
+    <rdzeń>-card.webp  / .jpg   (max 480 px)
+    <rdzeń>-hero.webp  / .jpg   (max 1600 px)
+    <rdzeń>.json                (rzeczywiste wymiary – zapisywany na końcu)
+
+Generowanie idzie w puli procesów (Pillow trzyma GIL przy kodowaniu),
+więc żądanie z panelu admina nie czeka na skalowanie. Dopóki pochodnych
+nie ma, szablony pokazują oryginał. Szablony używają makra
+``product_picture`` z ``_images.html`` (``<picture>`` + ``srcset``/``sizes``).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, url_for
+from PIL import Image, ImageOps
+
+log = logging.getLogger(__name__)
+
+# wariant -> maksymalny bok w pikselach
+VARIANTS = {
+    "thumb": 160,
+    "card": 480,
+    "hero": 1600,
+}
+
+# rozszerzenie -> (format Pillow, opcje zapisu)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+DERIVED_DIR = "derived"
+
+
+# =========================
+# Generowanie (działa też w procesie potomnym – bez kontekstu aplikacji)
+# =========================
+
+
+def _stem(filename: str) -> str:
+    return os.path.splitext(filename)[0]
+
+
+def _publish(tmp: str, path: str) -> None:
+    # mkstemp tworzy plik 0600 – serwer plików statycznych musi móc go czytać
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _save_atomic(image: Image.Image, path: str, fmt: str, options: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        image.save(tmp, fmt, **options)
+        _publish(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """JPEG nie ma przezroczystości – kładziemy obraz na białym tle."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_derivatives(src_path: str, out_dir: str, force: bool = False) -> dict:
+    """
+    Tworzy wszystkie pochodne ``src_path`` w ``out_dir`` i zwraca manifest
+    ``{wariant: [szerokość, wysokość]}``. Gdy manifest już istnieje
+    (i nie ``force``), nic nie robi.
+    """
+    stem = _stem(os.path.basename(src_path))
+    manifest_path = os.path.join(out_dir, f"{stem}.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest: dict[str, list[int]] = {}
+    with Image.open(src_path) as original:
+        source = ImageOps.exif_transpose(original)
+        for variant, max_side in VARIANTS.items():
+            resized = source.copy()
+            # thumbnail nie powiększa – mały oryginał zostaje w swoim rozmiarze
+            resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            for ext, (fmt, options) in FORMATS.items():
+                image = _flatten(resized) if fmt == "JPEG" else resized
+                if fmt == "WEBP" and image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+                _save_atomic(image, os.path.join(out_dir, f"{stem}-{variant}.{ext}"), fmt, options)
+            manifest[variant] = list(resized.size)
+
+    # manifest na końcu = komplet pochodnych jest gotowy
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    _publish(tmp, manifest_path)
+    return manifest
+
+
+# =========================
+# Pula procesów
+# =========================
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # "spawn": fork z wielowątkowego serwera WSGI potrafi zakleszczyć dziecko
+        _executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def products_dir() -> str:
+    return os.path.join(current_app.root_path, "static", "images", "products")
+
+
+def derived_dir() -> str:
+    return os.path.join(products_dir(), DERIVED_DIR)
+
+
+def _log_failure(filename: str):
+    def callback(future):
+        exc = future.exception()
+        if exc is not None:
+            log.warning("Nie udało się wygenerować pochodnych %s: %s", filename, exc)
+
+    return callback
+
+
+def schedule_derivatives(filename: str) -> None:
+    """
+    Zleca wygenerowanie pochodnych dla pliku z ``static/images/products``.
+    Przy ``IMAGE_DERIVATIVES_SYNC`` (np. testy) liczy od razu w tym procesie.
+    """
+    src = os.path.join(products_dir(), filename)
+    out_dir = derived_dir()
+    if current_app.config.get("IMAGE_DERIVATIVES_SYNC"):
+        try:
+            generate_derivatives(src, out_dir)
+        except (OSError, ValueError) as exc:
+            log.warning("Nie udało się wygenerować pochodnych %s: %s", filename, exc)
+        return
+    global _executor
+    max_workers = current_app.config.get("IMAGE_WORKERS", 2)
+    try:
+        future = _get_executor(max_workers).submit(generate_derivatives, src, out_dir)
+    except BrokenProcessPool:
+        # proces potomny padł (np. OOM) – zakładamy pulę od nowa
+        _executor = None
+        future = _get_executor(max_workers).submit(generate_derivatives, src, out_dir)
+    future.add_done_callback(_log_failure(filename))
+
+
+def remove_derivatives(directory: str, filename: str) -> None:
+    """Kasuje pochodne pliku ``filename`` z ``directory/derived``."""
+    stem = _stem(filename)
+    names = [f"{stem}.json"] + [
+        f"{stem}-{variant}.{ext}" for variant in VARIANTS for ext in FORMATS
+    ]
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, DERIVED_DIR, name))
+        except OSError:
+            pass
+    _manifests.pop(filename, None)
+
+
+# =========================
+# Szablony
+# =========================
+
+# manifesty raz znalezione nie zmieniają się (nazwy plików są unikalne)
+_manifests: dict[str, dict] = {}
+
+
+def _manifest(filename: str) -> dict | None:
+    manifest = _manifests.get(filename)
+    if manifest is not None:
+        return manifest
+    path = os.path.join(derived_dir(), f"{_stem(filename)}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _manifests[filename] = manifest
+    return manifest
+
+
+class ProductImage:
+    """Adresy oryginału i pochodnych jednego zdjęcia (dla makra w szablonie)."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.variants = _manifest(filename) or {}
+
+    @property
+    def original_url(self) -> str:
+        return url_for("static", filename=f"images/products/{self.filename}")
+
+    def url(self, variant: str, ext: str = "jpg") -> str:
+        if variant not in self.variants:
+            return self.original_url
+        return url_for(
+            "static",
+            filename=f"images/products/{DERIVED_DIR}/{_stem(self.filename)}-{variant}.{ext}",
+        )
+
+    def srcset(self, ext: str, up_to: str | None = None) -> str:
+        """``url 160w, url 480w, ...`` – warianty do ``up_to`` włącznie."""
+        parts = []
+        seen = set()
+        for variant in VARIANTS:
+            if variant not in self.variants:
+                continue
+            width = self.variants[variant][0]
+            if width not in seen:  # mały oryginał: kilka wariantów tej samej szerokości
+                seen.add(width)
+                parts.append(f"{self.url(variant, ext)} {width}w")
+            if variant == up_to:
+                break
+        return ", ".join(parts)
+
+    def size(self, variant: str) -> tuple[int, int] | None:
+        dims = self.variants.get(variant)
+        return tuple(dims) if dims else None
+
+
+def product_image(filename: str | None) -> ProductImage | None:
+    return ProductImage(filename) if filename else None
@@ -1,5 +1,7 @@
 # app/models.py
 from flask_login import UserMixin
+from sqlalchemy import event, inspect
+
 from .extensions import db
 
 
@@ -24,12 +26,23 @@ class User(db.Model, UserMixin):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    username = db.Column(db.String(32), nullable=True)
+    # username / email po casefold() w Pythonie – po nich idzie wyszukiwanie
+    # i unikalność nazwy (lower() w SQLite zmienia wielkość tylko ASCII,
+    # więc „Łukasz” i „łukasz” przeszłyby przez indeks na lower(username));
+    # uzupełniane zdarzeniem przed zapisem (niżej)
+    username_normalized = db.Column(db.String(64), nullable=True, unique=True)
+    email_normalized = db.Column(db.String(255), nullable=True, index=True)
+    # scrypt z Werkzeug ma ~162 znaki
+    password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default="user")  # user, moderator, admin
     google_id = db.Column(db.String(100), nullable=True)
     facebook_id = db.Column(db.String(100), nullable=True)
     theme_id = db.Column(db.Integer, db.ForeignKey("themes.id"), nullable=True)
     rank = db.Column(db.String(50), nullable=True)
+    # podbijana przy zmianie e-maila / roli / motywu – unieważnia cache
+    # użytkowników w procesach (app/user_cache.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
     theme = db.relationship("Theme", back_populates="users")
     orders = db.relationship("Order", back_populates="user", lazy=True)
@@ -38,6 +51,18 @@ class User(db.Model, UserMixin):
         return f"<User {self.email}>"
 
 
+def normalize_identifier(value: str | None) -> str:
+    """Postać do porównań bez względu na wielkość liter (pełny Unicode)."""
+    return (value or "").strip().casefold()
+
+
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+def _normalize_user_identifiers(mapper, connection, target):
+    target.username_normalized = normalize_identifier(target.username) or None
+    target.email_normalized = normalize_identifier(target.email) or None
+
+
 # -----------------------------
 # Katalog / kategorie / produkty
 # -----------------------------
@@ -57,6 +82,140 @@ class Category(db.Model):
     def __repr__(self):
         return f"<Category {self.name}>"
 
+    @staticmethod
+    def subtree_ids(category_id: int):
+        """SELECT z id kategorii i wszystkich jej potomków (do użycia w ``in_``)."""
+        return (
+            db.select(CategoryClosure.descendant_id)
+            .where(CategoryClosure.ancestor_id == category_id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def ancestors_of(category_id: int, include_self: bool = True) -> list["Category"]:
+        """Przodkowie od korzenia w dół (okruszki) – jedno zapytanie, bez rekurencji."""
+        q = (
+            Category.query.join(
+                CategoryClosure, CategoryClosure.ancestor_id == Category.id
+            )
+            .filter(CategoryClosure.descendant_id == category_id)
+        )
+        if not include_self:
+            q = q.filter(CategoryClosure.depth > 0)
+        return q.order_by(CategoryClosure.depth.desc()).all()
+
+    def breadcrumb(self) -> list["Category"]:
+        return Category.ancestors_of(self.id)
+
+
+class CategoryClosure(db.Model):
+    """
+    Tabela domknięcia drzewa kategorii: jeden wiersz na każdą parę
+    (przodek, potomek) razem z odległością. Węzeł jest swoim przodkiem
+    z ``depth = 0``. Utrzymywana automatycznie przez zdarzenia ORM niżej.
+    """
+    __tablename__ = "category_closure"
+    ancestor_id = db.Column(
+        db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id = db.Column(
+        db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_category_closure_descendant", "descendant_id", "depth"),
+    )
+
+    def __repr__(self):
+        return f"<CategoryClosure {self.ancestor_id}->{self.descendant_id} d={self.depth}>"
+
+
+@event.listens_for(Category, "after_insert")
+def _closure_after_insert(mapper, connection, target):
+    closure = CategoryClosure.__table__
+    connection.execute(
+        closure.insert().values(
+            ancestor_id=target.id, descendant_id=target.id, depth=0
+        )
+    )
+    if target.parent_id is not None:
+        connection.execute(
+            closure.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                db.select(
+                    closure.c.ancestor_id,
+                    db.literal(target.id),
+                    closure.c.depth + 1,
+                ).where(closure.c.descendant_id == target.parent_id),
+            )
+        )
+
+
+@event.listens_for(Category, "after_update")
+def _closure_after_update(mapper, connection, target):
+    hist = inspect(target).attrs.parent_id.history
+    if not hist.has_changes():
+        return
+
+    closure = CategoryClosure.__table__
+    subtree = db.select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+
+    # nowy rodzic z własnego poddrzewa (albo sam węzeł) zrobiłby cykl –
+    # domknięcie jeszcze opisuje stare drzewo, więc sprawdzamy je przed zmianą
+    if target.parent_id is not None and connection.execute(
+        subtree.where(closure.c.descendant_id == target.parent_id)
+    ).first() is not None:
+        raise ValueError(
+            f"Kategorii {target.id} nie można przenieść pod własnego potomka {target.parent_id}"
+        )
+
+    # odcinamy poddrzewo od dotychczasowych przodków
+    connection.execute(
+        closure.delete().where(
+            closure.c.descendant_id.in_(subtree),
+            closure.c.ancestor_id.not_in(subtree),
+        )
+    )
+    # i podpinamy pod nowego rodzica (iloczyn: przodkowie rodzica × poddrzewo)
+    if target.parent_id is not None:
+        sup = closure.alias("sup")
+        sub = closure.alias("sub")
+        connection.execute(
+            closure.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                db.select(
+                    sup.c.ancestor_id,
+                    sub.c.descendant_id,
+                    sup.c.depth + sub.c.depth + 1,
+                )
+                .select_from(sup.join(sub, db.true()))
+                .where(
+                    sup.c.descendant_id == target.parent_id,
+                    sub.c.ancestor_id == target.id,
+                ),
+            )
+        )
+
+
+@event.listens_for(Category, "before_delete")
+def _closure_before_delete(mapper, connection, target):
+    closure = CategoryClosure.__table__
+    subtree = db.select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+    # dzieci usuwanego węzła zostają osobnym poddrzewem
+    connection.execute(
+        closure.delete().where(
+            db.or_(
+                closure.c.ancestor_id == target.id,
+                closure.c.descendant_id == target.id,
+                db.and_(
+                    closure.c.descendant_id.in_(subtree),
+                    closure.c.ancestor_id.not_in(subtree),
+                ),
+            )
+        )
+    )
+
 
 class Product(db.Model):
     __tablename__ = "products"
@@ -70,10 +229,24 @@ class Product(db.Model):
     # stock już istnieje w bazie – NIE zmieniamy deklaracji:
     stock = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
+    # zdjęcie wgrane przez panel admina (app/storage.py); image_filename to
+    # nazwa pliku używana w szablonach – dla starych produktów bez Media
+    media_id = db.Column(
+        db.Integer, db.ForeignKey("media.id", ondelete="SET NULL"), nullable=True
+    )
+
     category = db.relationship("Category", back_populates="products")
+    media = db.relationship("Media")
     comments = db.relationship("Comment", back_populates="product", lazy=True)
     slider_items = db.relationship("SliderItem", back_populates="product", lazy=True)
 
+    __table_args__ = (
+        # listy kategorii (category_id IN ... ORDER BY id DESC)
+        db.Index("ix_products_category_id", "category_id", "id"),
+        # „niski stan” na dashboardzie (stock <= próg ORDER BY stock, id)
+        db.Index("ix_products_stock", "stock", "id"),
+    )
+
     def __repr__(self):
         return f"<Product {self.name}>"
 
@@ -88,6 +261,10 @@ class Media(db.Model):
     # metadane pliku
     original_filename = db.Column(db.String(255), nullable=False)
     stored_filename = db.Column(db.String(255), nullable=False)
+    # plik na dysku jest współdzielony przez wszystkie Media o tej samej treści
+    content_hash = db.Column(
+        db.String(64), db.ForeignKey("stored_files.content_hash"), nullable=True, index=True
+    )
     mime_type = db.Column(db.String(100), nullable=True)
     size_bytes = db.Column(db.Integer, nullable=True)
 
@@ -110,8 +287,25 @@ class Media(db.Model):
 
     @property
     def url_path(self) -> str:
-        # zakładamy zapis do static/images/media/<stored_filename>
-        return f"images/media/{self.stored_filename}"
+        # pliki zapisuje app/storage.py do static/images/products/<hash><ext>
+        return f"images/products/{self.stored_filename}"
+
+
+class StoredFile(db.Model):
+    """
+    Plik na dysku adresowany treścią (sha256). ``refcount`` = liczba
+    rekordów Media, które go używają; przy zejściu do zera plik jest usuwany.
+    """
+
+    __tablename__ = "stored_files"
+    content_hash = db.Column(db.String(64), primary_key=True)
+    stored_filename = db.Column(db.String(255), nullable=False, unique=True)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<StoredFile {self.stored_filename} refs={self.refcount}>"
 
 
 # -----------------------------
@@ -184,6 +378,19 @@ class Post(db.Model):
     author = db.relationship("User")
     comments = db.relationship("Comment", back_populates="post", lazy=True)
 
+    __table_args__ = (
+        # lista bloga (status = 'zaakceptowany', kursor po created_at, id)
+        db.Index("ix_posts_status_created", "status", "created_at", "id"),
+        # kolejka moderacji – częściowy, tylko wpisy nieopublikowane
+        db.Index(
+            "ix_posts_unpublished",
+            "created_at",
+            "id",
+            sqlite_where=db.text("status != 'zaakceptowany'"),
+            postgresql_where=db.text("status != 'zaakceptowany'"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Post {self.title[:20]}>"
 
@@ -201,11 +408,31 @@ class Comment(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=True)
     post_id = db.Column(db.Integer, db.ForeignKey("posts.id"), nullable=True)
 
+    # suma głosów (+1 / -1) i ich liczba – utrzymywane przez app/comment_votes.py
+    score = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    votes_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     user = db.relationship("User")
     product = db.relationship("Product", back_populates="comments")
     post = db.relationship("Post", back_populates="comments")
     votes = db.relationship("CommentVote", back_populates="comment", lazy=True)
 
+    __table_args__ = (
+        # „zaakceptowane komentarze produktu / wpisu” – najnowsze i najlepsze
+        db.Index("ix_comments_product_status_created", "product_id", "status", "created_at"),
+        db.Index("ix_comments_post_status_created", "post_id", "status", "created_at"),
+        db.Index("ix_comments_product_status_score", "product_id", "status", "score", "id"),
+        db.Index("ix_comments_post_status_score", "post_id", "status", "score", "id"),
+        # kolejka moderacji – częściowy, tylko oczekujące
+        db.Index(
+            "ix_comments_pending",
+            "created_at",
+            "id",
+            sqlite_where=db.text("status = 'oczekuje'"),
+            postgresql_where=db.text("status = 'oczekuje'"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Comment {self.id} by={self.user_id}>"
 
@@ -220,10 +447,50 @@ class CommentVote(db.Model):
     comment = db.relationship("Comment", back_populates="votes")
     user = db.relationship("User")
 
+    # jeden głos użytkownika na komentarz (cel upsertu)
+    __table_args__ = (
+        db.UniqueConstraint("comment_id", "user_id", name="uq_comment_votes_comment_user"),
+    )
+
     def __repr__(self):
         return f"<CommentVote comment={self.comment_id} user={self.user_id} value={self.value}>"
 
 
+# -----------------------------
+# Koszyk (zalogowani użytkownicy)
+# -----------------------------
+class Cart(db.Model):
+    __tablename__ = "carts"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    user = db.relationship("User")
+    items = db.relationship(
+        "CartItem",
+        back_populates="cart",
+        lazy=True,
+        cascade="all, delete-orphan",
+    )
+
+    def __repr__(self):
+        return f"<Cart {self.id} user={self.user_id}>"
+
+
+class CartItem(db.Model):
+    __tablename__ = "cart_items"
+    cart_id = db.Column(db.Integer, db.ForeignKey("carts.id", ondelete="CASCADE"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+
+    cart = db.relationship("Cart", back_populates="items")
+    product = db.relationship("Product")
+
+    def __repr__(self):
+        return f"<CartItem cart={self.cart_id} product={self.product_id} qty={self.quantity}>"
+
+
 # -----------------------------
 # Zamówienia
 # -----------------------------
@@ -234,10 +501,23 @@ class Order(db.Model):
     status = db.Column(db.String(20), default="oczekuje")  # oczekuje, opłacone, wysłane
     shipping_address = db.Column(db.String(250), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # moment przejścia w status opłacony (app/sales.py) – dzień w raportach
+    paid_at = db.Column(db.DateTime, nullable=True)
+
+    # ostatnia sesja Stripe Checkout – używana ponownie przy odświeżeniu
+    # strony płatności, dopóki nie wygaśnie (app/shop/payments.py)
+    stripe_session_id = db.Column(db.String(255), nullable=True)
+    stripe_session_url = db.Column(db.Text, nullable=True)
+    stripe_session_expires_at = db.Column(db.DateTime, nullable=True)
 
     user = db.relationship("User", back_populates="orders")
     items = db.relationship("OrderItem", back_populates="order", lazy=True)
 
+    __table_args__ = (
+        # zamówienia użytkownika od najnowszych
+        db.Index("ix_orders_user_created", "user_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Order {self.id} user={self.user_id} status={self.status}>"
 
@@ -256,6 +536,53 @@ class OrderItem(db.Model):
         return f"<OrderItem order={self.order_id} product={self.product_id}>"
 
 
+# -----------------------------
+# Raporty sprzedaży – agregaty dzienne (app/sales.py)
+# -----------------------------
+# Bez kluczy obcych: historia sprzedaży zostaje po usunięciu produktu
+# albo kategorii.
+class SalesDaily(db.Model):
+    __tablename__ = "sales_daily"
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    units = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<SalesDaily {self.day} orders={self.orders}>"
+
+
+class SalesDailyProduct(db.Model):
+    __tablename__ = "sales_daily_products"
+    __table_args__ = (
+        db.Index("ix_sales_daily_products_product", "product_id", "day"),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    units = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<SalesDailyProduct {self.day} product={self.product_id}>"
+
+
+class SalesDailyCategory(db.Model):
+    __tablename__ = "sales_daily_categories"
+    __table_args__ = (
+        db.Index("ix_sales_daily_categories_category", "category_id", "day"),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    # 0 = produkt bez kategorii
+    category_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    units = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<SalesDailyCategory {self.day} category={self.category_id}>"
+
+
 # -----------------------------
 # Zgłoszenia / moderacja
 # -----------------------------
@@ -291,3 +618,80 @@ class ModeratorMessage(db.Model):
 
     def __repr__(self):
         return f"<ModMsg report={self.report_id} sender={self.sender_id}>"
+
+
+# -----------------------------
+# Liczniki panelu admina
+# -----------------------------
+class AdminCounter(db.Model):
+    """Liczniki utrzymywane przez zdarzenia ORM (app/counters.py)."""
+
+    __tablename__ = "admin_counters"
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<AdminCounter {self.name}={self.value}>"
+
+
+# -----------------------------
+# Poczta wychodząca
+# -----------------------------
+class EmailOutbox(db.Model):
+    """
+    Kolejka maili (app/outbox.py). Wiersz powstaje w tej samej transakcji co
+    zmiana, której dotyczy; wysyła go dopiero ``flask outbox-worker``.
+    """
+
+    __tablename__ = "email_outbox"
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(255), nullable=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body_text = db.Column(db.Text, nullable=False)
+    body_html = db.Column(db.Text, nullable=True)
+
+    # oczekuje -> wysłany | martwy (po wyczerpaniu prób albo trwałym błędzie)
+    status = db.Column(db.String(20), nullable=False, default="oczekuje", server_default="oczekuje")
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} to={self.recipient} status={self.status}>"
+
+
+# -----------------------------
+# Zdarzenia Stripe
+# -----------------------------
+class StripeEvent(db.Model):
+    """
+    Zdarzenie z webhooka Stripe zapisane przed przetworzeniem
+    (app/webhooks/events.py). Unikalne ``event_id`` odrzuca powtórki.
+    """
+
+    __tablename__ = "stripe_events"
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(255), nullable=False, unique=True)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+
+    # nowe -> przetworzone | błąd
+    status = db.Column(db.String(20), nullable=False, default="nowe", server_default="nowe")
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, server_default=db.func.now())
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_stripe_events_status", "status", "id"),
+    )
+
+    def __repr__(self):
+        return f"<StripeEvent {self.event_id} {self.type} status={self.status}>"
@@ -0,0 +1,120 @@
+# app/moderation.py
+"""
+Moderacja hurtowa komentarzy i wpisów.
+
+Zamiast jednego POST-a i commita na każdy wiersz zaznaczone pozycje są
+zmieniane paczkami: na paczkę jeden ``SELECT`` (które wiersze mają inny
+status) i po jednym ``UPDATE ... WHERE id IN (...) AND status = <stary>``
+na każdy stary status, a na końcu jeden commit.
+
+Warunek na stary status jest w samym ``UPDATE``: gdy równolegle inny
+moderator zmieni ten sam wiersz, baza sprawdzi warunek jeszcze raz po
+jego commicie i wiersz pominie. Liczniki i cache liczymy tylko z wierszy
+faktycznie zmienionych (``RETURNING id``, a bez niego ``rowcount``),
+nie z ``SELECT``-a.
+
+``UPDATE`` idzie z pominięciem ORM, więc zdarzenia z ``app/counters.py``
+się nie wykonują – liczniki ``*_pending`` są poprawiane tutaj przez
+``adjust_counter``, w tej samej transakcji.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from .counters import COUNTERS, adjust_counter
+from .extensions import db
+from .models import Comment, Post
+
+# akcja z formularza -> status
+ACTIONS = {"approve": "zaakceptowany", "reject": "odrzucony"}
+# ile id w jednym ``IN (...)`` (limit parametrów SQLite to 999 w starszych wersjach)
+BATCH_SIZE = 500
+
+
+class ModerationResult(NamedTuple):
+    changed: int
+    # produkty, których strony trzeba wyczyścić z cache (tylko komentarze)
+    product_ids: set[int]
+
+
+def _parse_ids(values) -> list[int]:
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return sorted(ids)
+
+
+def _update_from(connection, table, ids, old: str, status: str, returning: bool):
+    """
+    ``UPDATE`` wierszy ``ids``, które nadal mają status ``old``. Zwraca
+    ``(liczba zmienionych, ich id)``; bez ``RETURNING`` id to ``None``.
+    """
+    stmt = (
+        table.update()
+        .where(table.c.id.in_(ids), table.c.status == old, table.c.status != status)
+        .values(status=status)
+    )
+    if returning:
+        updated = list(connection.execute(stmt.returning(table.c.id)).scalars())
+        return len(updated), updated
+    # bez RETURNING nie wiadomo, które wiersze pominięto – tylko ile zmieniono
+    return connection.execute(stmt).rowcount, None
+
+
+def _set_status(model, ids, status: str, counter_name: str, extra=()) -> tuple[int, list]:
+    table = model.__table__
+    counter = COUNTERS[counter_name]
+    connection = db.session.connection()
+    returning = connection.dialect.update_returning
+    changed = 0
+    delta = 0
+    rows = []
+
+    ids = _parse_ids(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        # kandydaci – wiersze z innym statusem, pogrupowane po starym statusie
+        found = connection.execute(
+            select(table.c.id, table.c.status, *extra)
+            .where(table.c.id.in_(batch), table.c.status != status)
+        ).all()
+        by_status: dict[str, list] = {}
+        for row in found:
+            by_status.setdefault(row.status, []).append(row)
+
+        for old, group in by_status.items():
+            count, updated = _update_from(
+                connection, table, [row.id for row in group], old, status, returning
+            )
+            changed += count
+            delta += count * (int(counter.matches(status)) - int(counter.matches(old)))
+            if updated is None:
+                # do czyszczenia cache wystarczy nadzbiór – nadmiarowy purge nic nie psuje
+                rows.extend(group)
+            else:
+                updated = set(updated)
+                rows.extend(row for row in group if row.id in updated)
+
+    adjust_counter(connection, counter_name, delta)
+    return changed, rows
+
+
+def moderate_comments(ids, action: str) -> ModerationResult:
+    """Akceptuje / odrzuca komentarze o podanych id i commituje."""
+    changed, rows = _set_status(
+        Comment, ids, ACTIONS[action], "comments_pending", (Comment.__table__.c.product_id,)
+    )
+    db.session.commit()
+    return ModerationResult(changed, {row.product_id for row in rows if row.product_id})
+
+
+def moderate_posts(ids, action: str) -> ModerationResult:
+    """Akceptuje / odrzuca wpisy o podanych id i commituje."""
+    changed, _ = _set_status(Post, ids, ACTIONS[action], "posts_pending")
+    db.session.commit()
+    return ModerationResult(changed, set())
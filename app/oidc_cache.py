@@ -0,0 +1,200 @@
+# app/oidc_cache.py
+"""
+Cache dokumentów dostawców OAuth/OpenID (discovery i JWKS).
+
+Authlib pobiera ``server_metadata_url`` i ``jwks_uri`` przy pierwszym
+logowaniu w każdym workerze i trzyma je w pamięci bez końca. Tutaj:
+
+- dokument leży w pamięci procesu i na dysku (``OIDC_CACHE_DIR``, wspólny
+  dla workerów i restartów) razem z ETag i terminem ważności
+  (``Cache-Control: max-age`` albo ``OIDC_CACHE_TTL``),
+- po terminie jest odświeżany warunkowo (``If-None-Match``; 304 tylko
+  przedłuża ważność),
+- gdy odświeżenie się nie uda, używamy starej kopii i próbujemy ponownie
+  po ``OIDC_CACHE_RETRY`` sekundach,
+- ``OIDC_PREFETCH`` pobiera dokumenty już przy starcie workera.
+
+Klient Google jest rejestrowany z ``client_cls=CachedOAuth2App``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from authlib.integrations.flask_client import FlaskOAuth2App
+
+log = logging.getLogger(__name__)
+
+
+def _max_age(response) -> int | None:
+    for part in response.headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "max-age" and value.isdigit():
+            return int(value)
+    return None
+
+
+class MetadataCache:
+    """Dokumenty JSON spod URL-i: pamięć + dysk, TTL, ETag, stara kopia przy błędzie."""
+
+    def __init__(self):
+        self.directory: str | None = None
+        self.ttl = 3600
+        self.retry = 60
+        self.timeout: tuple[float, float] = (3.0, 10.0)
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._http = requests.Session()
+
+    def init_app(self, app) -> None:
+        config = app.config
+        self.directory = config.get("OIDC_CACHE_DIR")
+        self.ttl = config.get("OIDC_CACHE_TTL", 3600)
+        self.retry = config.get("OIDC_CACHE_RETRY", 60)
+        timeout = config.get("OIDC_HTTP_TIMEOUT", 10)
+        self.timeout = (min(3.0, timeout), timeout)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    # --- dysk ---
+
+    def _path(self, url: str) -> str | None:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_disk(self, url: str) -> dict | None:
+        path = self._path(url)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def _write_disk(self, entry: dict) -> None:
+        path = self._path(entry["url"])
+        if path is None:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError as exc:
+            log.warning("Nie zapisano cache %s: %s", entry["url"], exc)
+
+    # --- odczyt ---
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def get_json(self, url: str, force: bool = False) -> dict:
+        """
+        Dokument spod ``url``. ``force`` wymusza rewalidację (np. nieznany
+        ``kid`` w JWKS) – najwyżej raz na ``OIDC_CACHE_RETRY`` sekund.
+        """
+        entry = self._entries.get(url)
+        now = time.time()
+        if entry is not None and self._usable(entry, now, force):
+            return entry["data"]
+
+        # jedno pobranie naraz na URL – reszta wątków czeka na wynik
+        with self._url_lock(url):
+            entry = self._entries.get(url)
+            if entry is None:
+                entry = self._read_disk(url)
+            now = time.time()
+            if entry is not None and self._usable(entry, now, force):
+                self._entries[url] = entry
+                return entry["data"]
+            entry = self._refresh(url, entry, now)
+            self._entries[url] = entry
+            return entry["data"]
+
+    def _usable(self, entry: dict, now: float, force: bool) -> bool:
+        if force:
+            return now - entry.get("checked_at", 0) < self.retry
+        return now < entry["expires_at"]
+
+    def _refresh(self, url: str, entry: dict | None, now: float) -> dict:
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        try:
+            response = self._http.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                data = entry["data"]
+            else:
+                response.raise_for_status()
+                data = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            if entry is None:
+                raise
+            log.warning("Odświeżenie %s nieudane (%s) – używam starej kopii", url, exc)
+            stale = dict(entry, expires_at=now + self.retry, checked_at=now)
+            return stale
+
+        max_age = _max_age(response)
+        fresh = {
+            "url": url,
+            "data": data,
+            "etag": response.headers.get("ETag") or (entry or {}).get("etag"),
+            "fetched_at": now,
+            "checked_at": now,
+            "expires_at": now + (max_age if max_age is not None else self.ttl),
+        }
+        self._write_disk(fresh)
+        return fresh
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+class CachedOAuth2App(FlaskOAuth2App):
+    """Klient Authlib, który bierze discovery i JWKS z ``metadata_cache``."""
+
+    def load_server_metadata(self):
+        if self._server_metadata_url:
+            metadata = metadata_cache.get_json(self._server_metadata_url)
+            self.server_metadata.update(metadata)
+            self.server_metadata["_loaded_at"] = time.time()
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        metadata = self.load_server_metadata()
+        uri = metadata.get("jwks_uri")
+        if not uri:
+            jwk_set = metadata.get("jwks")
+            if jwk_set:
+                return jwk_set
+            raise RuntimeError('Missing "jwks_uri" in metadata')
+        jwk_set = metadata_cache.get_json(uri, force=force)
+        self.server_metadata["jwks"] = jwk_set
+        return jwk_set
+
+
+def prefetch(oauth, names) -> None:
+    """Pobiera discovery i JWKS podanych klientów (błędy tylko logowane)."""
+    for name in names:
+        client = oauth.create_client(name)
+        if not isinstance(client, CachedOAuth2App):
+            continue
+        try:
+            client.fetch_jwk_set()
+        except Exception as exc:  # start workera nie może paść przez dostawcę
+            log.warning("Prefetch OAuth %s nieudany: %s", name, exc)
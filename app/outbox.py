@@ -0,0 +1,160 @@
+# app/outbox.py
+"""
+Kolejka maili wychodzących (tabela ``email_outbox``).
+
+Widoki (np. webhook Stripe) tylko dopisują wiadomość przez
+``enqueue_email`` – w tej samej transakcji co zmiana zamówienia, bez
+łączenia się z serwerem SMTP. Wysyłką zajmuje się osobny proces
+``flask outbox-worker``:
+
+- bierze paczkę zaległych wiadomości i wysyła je jednym połączeniem SMTP,
+- błąd chwilowy (4xx, zerwane połączenie) -> ponowna próba z wykładniczym
+  odstępem,
+- błąd trwały (5xx) albo wyczerpanie ``MAIL_OUTBOX_MAX_ATTEMPTS`` prób ->
+  status ``martwy`` (do ręcznego przejrzenia / ``flask outbox-requeue``).
+"""
+from __future__ import annotations
+
+import smtplib
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from flask_mail import Message
+
+from .extensions import db, mail
+from .models import EmailOutbox
+
+PENDING = "oczekuje"
+SENT = "wysłany"
+DEAD = "martwy"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_email(recipient: str, subject: str, body: str, html: str | None = None,
+                  sender: str | None = None) -> EmailOutbox:
+    """Dodaje mail do kolejki (bez commitu – commituje wywołujący)."""
+    item = EmailOutbox(
+        sender=sender,
+        recipient=recipient,
+        subject=subject,
+        body_text=body,
+        body_html=html,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    )
+    db.session.add(item)
+    return item
+
+
+# =========================
+# Wysyłka
+# =========================
+
+
+def _message(item: EmailOutbox) -> Message:
+    msg = Message(
+        subject=item.subject,
+        sender=item.sender or current_app.config.get("MAIL_DEFAULT_SENDER"),
+        recipients=[item.recipient],
+    )
+    msg.body = item.body_text
+    if item.body_html:
+        msg.html = item.body_html
+    return msg
+
+
+def _backoff(attempts: int) -> timedelta:
+    base = current_app.config.get("MAIL_OUTBOX_RETRY_BASE", 60)
+    cap = current_app.config.get("MAIL_OUTBOX_RETRY_MAX", 6 * 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def _failed(item: EmailOutbox, error: Exception, permanent: bool = False) -> None:
+    item.attempts += 1
+    item.last_error = f"{type(error).__name__}: {error}"[:2000]
+    max_attempts = current_app.config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 6)
+    if permanent or item.attempts >= max_attempts:
+        item.status = DEAD
+    else:
+        item.next_attempt_at = _utcnow() + _backoff(item.attempts)
+
+
+def _due_batch(batch_size: int) -> list[EmailOutbox]:
+    query = (
+        EmailOutbox.query
+        .filter(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= _utcnow())
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(batch_size)
+    )
+    if db.engine.dialect.name == "postgresql":
+        # kilka workerów naraz nie weźmie tych samych wierszy
+        query = query.with_for_update(skip_locked=True)
+    return query.all()
+
+
+def drain_batch(batch_size: int | None = None) -> dict[str, int]:
+    """
+    Wysyła jedną paczkę zaległych maili jednym połączeniem SMTP.
+    Zwraca liczniki: wysłane / ponowione / martwe.
+    """
+    batch_size = batch_size or current_app.config.get("MAIL_OUTBOX_BATCH_SIZE", 50)
+    stats = {"sent": 0, "retry": 0, "dead": 0}
+    items = _due_batch(batch_size)
+    if not items:
+        db.session.commit()
+        return stats
+
+    pending = list(items)
+    try:
+        with mail.connect() as conn:
+            while pending:
+                item = pending[0]
+                try:
+                    conn.send(_message(item))
+                except smtplib.SMTPServerDisconnected:
+                    raise
+                except smtplib.SMTPResponseException as exc:
+                    _failed(item, exc, permanent=500 <= exc.smtp_code < 600)
+                except smtplib.SMTPRecipientsRefused as exc:
+                    codes = [code for code, _ in exc.recipients.values()]
+                    _failed(item, exc, permanent=all(code >= 500 for code in codes))
+                else:
+                    item.status = SENT
+                    item.sent_at = _utcnow()
+                    item.last_error = None
+                pending.pop(0)
+    except (smtplib.SMTPException, OSError) as exc:
+        # brak połączenia / zerwane w trakcie – reszta paczki czeka na ponowienie
+        for item in pending:
+            _failed(item, exc)
+
+    for item in items:
+        if item.status == SENT:
+            stats["sent"] += 1
+        elif item.status == DEAD:
+            stats["dead"] += 1
+        else:
+            stats["retry"] += 1
+    db.session.commit()
+    return stats
+
+
+def requeue_dead(ids: list[int] | None = None) -> int:
+    """Przywraca martwe wiadomości do kolejki (wszystkie albo wskazane)."""
+    query = EmailOutbox.query.filter(EmailOutbox.status == DEAD)
+    if ids:
+        query = query.filter(EmailOutbox.id.in_(ids))
+    count = query.update(
+        {
+            EmailOutbox.status: PENDING,
+            EmailOutbox.attempts: 0,
+            EmailOutbox.next_attempt_at: _utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return count
@@ -0,0 +1,344 @@
+# app/page_cache.py
+"""
+Cache całych stron dla anonimowych odwiedzających.
+
+Widok oznaczony ``@page_cache.cached(tags=...)`` dla gościa (GET, brak
+komunikatów flash w sesji) zwraca gotowy HTML zapisany pod kluczem
+``endpoint + argumenty``. Wpisy są otagowane (np. ``product:5``,
+``products``, ``slider``), a trasy zapisu w panelu admina wołają
+``page_cache.purge(...)`` z odpowiednimi tagami.
+
+Unieważnianie działa przez wersje tagów: purge podbija wersję tagu,
+a wpis zapisany przy starszej wersji traktujemy jak brak w cache.
+
+Wpis przeterminowany albo zapisany przy starszej wersji tagu jest przy
+odczycie od razu usuwany z backendu.
+
+Backendy:
+- ``memory``     – LRU w procesie, ograniczone liczbą wpisów,
+- ``filesystem`` – pliki w katalogu (wspólne dla wielu workerów),
+  ograniczone liczbą wpisów i łącznym rozmiarem; nadmiar jest usuwany
+  co ``PRUNE_EVERY`` zapisów, najpierw wpisy przeterminowane, potem
+  najstarsze.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+
+# =========================
+# Backendy
+# =========================
+
+
+class MemoryBackend:
+    """LRU w pamięci procesu."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._tags: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def tag_version(self, tag: str) -> int:
+        return self._tags.get(tag, 0)
+
+    def bump_tag(self, tag: str) -> None:
+        with self._lock:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemBackend:
+    """
+    Wpisy jako pliki pickle w ``directory``; wersje tagów w ``directory/_tags``.
+
+    Czas modyfikacji pliku wpisu to jego termin ważności (``entry["expires"]``)
+    – przycinanie katalogu nie musi otwierać plików.
+    """
+
+    # co ile zapisów (w procesie) sprawdzamy limity katalogu
+    PRUNE_EVERY = 16
+
+    def __init__(self, directory: str, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._tags_dir = os.path.join(directory, "_tags")
+        os.makedirs(self._tags_dir, exist_ok=True)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _tag_path(self, tag: str) -> str:
+        return os.path.join(self._tags_dir, hashlib.sha1(tag.encode("utf-8")).hexdigest())
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def set(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        self._write_atomic(path, pickle.dumps(entry))
+        try:
+            os.utime(path, (entry["expires"], entry["expires"]))
+        except OSError:
+            pass
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _entry_files(self) -> list[tuple[float, int, str]]:
+        """``(termin ważności, rozmiar, ścieżka)`` wszystkich wpisów."""
+        files = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                # wpisy to nazwy sha1; pomijamy ``_tags`` i pliki tymczasowe zapisu
+                if len(item.name) != 40 or not item.is_file():
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, item.path))
+        return files
+
+    def prune(self) -> int:
+        """Usuwa wpisy przeterminowane i nadmiarowe (najbliższy termin ważności pierwszy)."""
+        now = time.time()
+        files = sorted(self._entry_files())
+        count = len(files)
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for expires, size, path in files:
+            if expires > now and count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            total -= size
+            removed += 1
+        return removed
+
+    def tag_version(self, tag: str) -> int:
+        try:
+            with open(self._tag_path(tag), "rb") as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump_tag(self, tag: str) -> None:
+        self._write_atomic(self._tag_path(tag), str(self.tag_version(tag) + 1).encode())
+
+    def clear(self) -> None:
+        for root in (self.directory, self._tags_dir):
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if os.path.isfile(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def __len__(self):
+        return len(self._entry_files())
+
+
+# =========================
+# Cache stron
+# =========================
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.ttl = 300
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("PAGE_CACHE_ENABLED", True)
+        self.ttl = app.config.get("PAGE_CACHE_TTL", 300)
+        backend = app.config.get("PAGE_CACHE_BACKEND", "memory")
+        if backend == "filesystem":
+            directory = app.config.get("PAGE_CACHE_DIR") or os.path.join(
+                app.instance_path, "page_cache"
+            )
+            self.backend = FileSystemBackend(
+                directory,
+                app.config.get("PAGE_CACHE_MAX_ENTRIES", 512),
+                app.config.get("PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+            )
+        else:
+            self.backend = MemoryBackend(app.config.get("PAGE_CACHE_MAX_ENTRIES", 512))
+        app.extensions["page_cache"] = self
+
+    # --- statystyki ---
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "entries": len(self.backend) if self.backend else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    # --- unieważnianie ---
+
+    def purge(self, *tags: str) -> None:
+        """Unieważnia wszystkie strony oznaczone którymkolwiek z ``tags``."""
+        if self.backend is None:
+            return
+        for tag in tags:
+            if tag:
+                self.backend.bump_tag(tag)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    # --- dekorator widoku ---
+
+    @staticmethod
+    def _cacheable_request() -> bool:
+        if request.method != "GET":
+            return False
+        if current_user and current_user.is_authenticated:
+            return False
+        # komunikaty flash są częścią HTML – taka strona jest jednorazowa
+        if session.get("_flashes"):
+            return False
+        return True
+
+    @staticmethod
+    def _key() -> str:
+        args = sorted(request.args.items(multi=True))
+        view_args = sorted((request.view_args or {}).items())
+        return f"{request.endpoint}|{view_args}|{args}"
+
+    def cached(self, tags):
+        """
+        Dekorator widoku. ``tags`` to lista tagów albo funkcja
+        ``(**view_args) -> lista`` (np. ``lambda product_id: [f"product:{product_id}"]``).
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or self.backend is None or not self._cacheable_request():
+                    return view(*args, **kwargs)
+
+                key = self._key()
+                entry = self.backend.get(key)
+                if entry is not None:
+                    if entry["expires"] > time.time() and all(
+                        self.backend.tag_version(tag) == version
+                        for tag, version in entry["tags"].items()
+                    ):
+                        self._count(hit=True)
+                        response = current_app.response_class(
+                            entry["body"], status=entry["status"], headers=entry["headers"]
+                        )
+                        response.headers["X-Page-Cache"] = "HIT"
+                        return response
+                    # nieaktualny – nie czekamy, aż nadpisze go render
+                    self.backend.delete(key)
+
+                self._count(hit=False)
+                page_tags = tags(**kwargs) if callable(tags) else list(tags)
+                # wersje tagów czytamy PRZED renderem – purge w trakcie renderu
+                # sprawi, że wpis od razu będzie nieaktualny
+                versions = {tag: self.backend.tag_version(tag) for tag in page_tags}
+
+                response = make_response(view(*args, **kwargs))
+                if (
+                    response.status_code == 200
+                    and not response.direct_passthrough
+                    and not session.modified
+                ):
+                    self.backend.set(
+                        key,
+                        {
+                            "body": response.get_data(),
+                            "status": response.status_code,
+                            "headers": [("Content-Type", response.headers.get("Content-Type"))],
+                            "tags": versions,
+                            "expires": time.time() + self.ttl,
+                        },
+                    )
+                response.headers["X-Page-Cache"] = "MISS"
+                return response
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,175 @@
+# app/pagination.py
+"""
+Paginacja kursorowa (keyset / seek).
+
+Zamiast ``OFFSET n`` + ``COUNT(*)`` (jak w ``Query.paginate``) kolejna strona
+jest wyznaczana warunkiem „klucz sortowania za ostatnim elementem”, np.
+``WHERE id < :ostatnie_id ORDER BY id DESC LIMIT 13``. Koszt strony nie
+zależy od tego, jak daleko jest od początku, i nie liczymy wszystkich
+wierszy.
+
+Kursor w URL-u to nieprzezroczysty token (base64 z JSON-a) zawierający
+wartości klucza brzegowego elementu i kierunek.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, and_, or_, type_coerce
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values, direction: str = "next") -> str:
+    payload = {"k": [_encode_value(v) for v in values], "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str | None, keys_count: int):
+    """Zwraca ``(wartości, kierunek)`` albo ``None`` dla pustego / błędnego tokenu."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        values = [_decode_value(v) for v in payload["k"]]
+        direction = payload.get("d", "next")
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    if len(values) != keys_count or direction not in ("next", "prev"):
+        return None
+    return values, direction
+
+
+class KeysetPage:
+    """
+    Strona wyników – odpowiednik obiektu z ``paginate()``, ale bez
+    ``total`` / ``pages``. Szablon używa ``items``, ``has_next`` / ``has_prev``
+    i ``next_cursor`` / ``prev_cursor``.
+    """
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __repr__(self):
+        return f"<KeysetPage items={len(self.items)} next={self.has_next} prev={self.has_prev}>"
+
+
+def _is_sqlite_datetime(col, dialect: str) -> bool:
+    return dialect == "sqlite" and isinstance(getattr(col, "type", None), DateTime)
+
+
+def _key_column(col, dialect: str):
+    """
+    Kolumna klucza do kursora. SQLite trzyma daty jako tekst w różnych
+    formatach: ``server_default=func.now()`` zapisuje "2025-01-01 10:00:00",
+    SQLAlchemy "2025-01-01 10:00:00.000000". Po zamianie na ``datetime``
+    nie da się odtworzyć, który to był format, więc do kursora bierzemy
+    surowy tekst – porównanie z nim jest zgodne z ``ORDER BY`` po tekście.
+    """
+    if _is_sqlite_datetime(col, dialect):
+        return type_coerce(col, String)
+    return col
+
+
+def _comparable(col, value, dialect: str):
+    if _is_sqlite_datetime(col, dialect):
+        if isinstance(value, datetime):
+            # kursor sprzed zapisu surowego tekstu – format SQLAlchemy
+            value = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        return type_coerce(col, String), value
+    return col, value
+
+
+def _after(keys, values, dialect: str):
+    """
+    Warunek „wiersz leży za kluczem ``values``” dla sortowania ``keys``.
+    Rozpisany jako OR kolejnych prefiksów, żeby działał także przy mieszanych
+    kierunkach (np. trafność rosnąco, id malejąco):
+        (a > x) OR (a = x AND b < y) ...
+    """
+    pairs = [_comparable(col, value, dialect) for (col, _), value in zip(keys, values)]
+    clauses = []
+    for i, (_, desc) in enumerate(keys):
+        eq = [pairs[j][0] == pairs[j][1] for j in range(i)]
+        col, value = pairs[i]
+        cmp = col < value if desc else col > value
+        clauses.append(and_(*eq, cmp))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, keys, cursor: str | None = None, page: int | None = None,
+                    per_page: int = 12) -> KeysetPage:
+    """
+    Paginuje zapytanie ORM po kluczu ``keys`` = ``[(kolumna, malejąco?), ...]``.
+    Ostatni element klucza musi być unikalny (np. ``id``).
+
+    ``cursor`` – token z poprzedniej strony. Gdy go brak, a podano ``page``
+    (stare linki ``?page=N``), robimy jednorazowo ``OFFSET`` – kolejne linki
+    są już kursorowe.
+    """
+    dialect = query.session.get_bind().dialect.name
+    key_cols = [_key_column(col, dialect) for col, _ in keys]
+    decoded = decode_cursor(cursor, len(keys))
+
+    backwards = False
+    q = query.add_columns(*key_cols)
+    if decoded:
+        values, direction = decoded
+        backwards = direction == "prev"
+        if backwards:
+            # idziemy wstecz: odwracamy kierunki, potem odwracamy wynik
+            rev = [(col, not desc) for col, desc in keys]
+            q = q.filter(_after(rev, values, dialect))
+            q = q.order_by(*[col.desc() if desc else col.asc() for col, desc in rev])
+        else:
+            q = q.filter(_after(keys, values, dialect))
+            q = q.order_by(*[col.desc() if desc else col.asc() for col, desc in keys])
+    else:
+        q = q.order_by(*[col.desc() if desc else col.asc() for col, desc in keys])
+        if page and page > 1:
+            q = q.offset((page - 1) * per_page)
+
+    rows = q.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    first_key = list(rows[0][1:]) if rows else None
+    last_key = list(rows[-1][1:]) if rows else None
+
+    if backwards:
+        has_prev, has_next = has_more, True
+    else:
+        has_next = has_more
+        has_prev = bool(decoded) or bool(page and page > 1)
+
+    return KeysetPage(
+        items=items,
+        per_page=per_page,
+        has_next=has_next and last_key is not None,
+        has_prev=has_prev and first_key is not None,
+        next_cursor=encode_cursor(last_key, "next") if last_key is not None else None,
+        prev_cursor=encode_cursor(first_key, "prev") if first_key is not None else None,
+    )
@@ -0,0 +1,104 @@
+# app/passwords.py
+"""
+Hashowanie haseł.
+
+- Algorytm i koszt z konfiguracji (``PASSWORD_HASH_METHOD`` w formacie
+  Werkzeug, np. ``scrypt:32768:8:1`` albo ``pbkdf2:sha256:600000``).
+- Po udanym logowaniu hash zapisany innym algorytmem/kosztem jest
+  przeliczany na bieżące ustawienia (w górę i w dół) – bez udziału
+  użytkownika.
+- Liczenie idzie w ograniczonej puli wątków (``PASSWORD_HASH_WORKERS``):
+  hashlib zwalnia GIL, więc naraz pracuje najwyżej tyle rdzeni, ile
+  wątków puli, a nadmiar logowań czeka w krótkiej kolejce
+  (``PASSWORD_HASH_QUEUE``). Gdy kolejka jest pełna, ``HashingBusy`` –
+  widok odpowiada 503 zamiast zapychać wszystkie wątki serwera.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Za dużo haseł w kolejce – spróbuj ponownie za chwilę."""
+
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+# (metoda, długość soli) -> prefiks hasha po normalizacji (np. "scrypt:32768:8:1")
+_prefixes: dict[tuple[str, int], str] = {}
+
+
+def _settings() -> tuple[str, int]:
+    config = current_app.config
+    return config.get("PASSWORD_HASH_METHOD", "scrypt"), config.get("PASSWORD_SALT_LENGTH", 16)
+
+
+def _pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                config = current_app.config
+                workers = config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 2
+                _slots = threading.BoundedSemaphore(workers + config.get("PASSWORD_HASH_QUEUE", 32))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    return _executor, _slots
+
+
+def _run(func, *args):
+    """Wykonuje ``func`` w puli; czeka na miejsce w kolejce najwyżej ``PASSWORD_HASH_WAIT`` s."""
+    executor, slots = _pool()
+    if not slots.acquire(timeout=current_app.config.get("PASSWORD_HASH_WAIT", 5)):
+        raise HashingBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+# =========================
+# API
+# =========================
+
+
+def hash_password(password: str) -> str:
+    method, salt_length = _settings()
+    return _run(generate_password_hash, password, method, salt_length)
+
+
+def _current_prefix(method: str, salt_length: int) -> str:
+    prefix = _prefixes.get((method, salt_length))
+    if prefix is None:
+        # Werkzeug uzupełnia domyślne parametry ("scrypt" -> "scrypt:32768:8:1");
+        # najtańszy sposób na tę samą normalizację to jeden hash
+        prefix = _run(generate_password_hash, "", method, 1).split("$", 1)[0]
+        _prefixes[(method, salt_length)] = prefix
+    return prefix
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Czy hash jest zapisany innym algorytmem/kosztem/solą niż w konfiguracji."""
+    method, salt_length = _settings()
+    try:
+        stored_method, salt, _ = stored_hash.split("$", 2)
+    except ValueError:
+        return True
+    return stored_method != _current_prefix(method, salt_length) or len(salt) != salt_length
+
+
+def verify_password(stored_hash: str | None, password: str) -> tuple[bool, str | None]:
+    """
+    Sprawdza hasło. Zwraca (czy poprawne, nowy hash albo None) – nowy hash,
+    gdy zapisany trzeba przeliczyć na bieżące ustawienia.
+    """
+    if not stored_hash or not _run(check_password_hash, stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash):
+        return True, hash_password(password)
+    return True, None
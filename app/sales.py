@@ -0,0 +1,297 @@
+# app/sales.py
+"""
+Raporty sprzedaży na agregatach dziennych.
+
+Tabele ``sales_daily`` / ``sales_daily_products`` / ``sales_daily_categories``
+trzymają na każdy dzień: liczbę zamówień, sztuk i przychód. Są
+aktualizowane przyrostowo przez zdarzenie ORM, gdy zamówienie przechodzi
+w status opłacony (i z powrotem, gdyby zostało wycofane) – w tej samej
+transakcji co zmiana statusu. Dniem zamówienia jest ``paid_at``.
+
+Panel analityki czyta wyłącznie agregaty (rok = 365 wierszy), nie
+``orders`` / ``order_items``.
+
+Zmiany statusów z pominięciem ORM (``Query.update()``, surowy SQL) nie
+przechodzą przez zdarzenia – agregaty odbudowuje wtedy
+``flask rebuild-sales-rollups`` (jedno ``INSERT ... SELECT ... GROUP BY``
+na tabelę, całe liczenie po stronie bazy).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import Date, and_, cast, event, func, inspect, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import (
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    SalesDaily,
+    SalesDailyCategory,
+    SalesDailyProduct,
+)
+
+# statusy, w których zamówienie liczy się jako sprzedaż
+PAID_STATUSES = frozenset({"opłacone", "paid", "wysłane"})
+
+_daily = SalesDaily.__table__
+_by_product = SalesDailyProduct.__table__
+_by_category = SalesDailyCategory.__table__
+_items = OrderItem.__table__
+_products = Product.__table__
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _is_paid(status) -> bool:
+    return status in PAID_STATUSES
+
+
+# =========================
+# Aktualizacja przyrostowa (zdarzenia ORM)
+# =========================
+
+
+def _bump(connection, table, key: dict, values: dict) -> None:
+    """``INSERT`` albo dodanie ``values`` do istniejącego wiersza o kluczu ``key``."""
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = insert(table).values(**key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + stmt.excluded[name] for name in values},
+        )
+        connection.execute(stmt)
+        return
+    updated = connection.execute(
+        table.update()
+        .where(and_(*(table.c[name] == value for name, value in key.items())))
+        .values({name: table.c[name] + value for name, value in values.items()})
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(**key, **values))
+
+
+def apply_order(connection, order_id: int, day: date, sign: int = 1) -> None:
+    """Dodaje (``sign=1``) albo odejmuje (``-1``) zamówienie z agregatów dnia."""
+    rows = connection.execute(
+        select(
+            _items.c.product_id,
+            _products.c.category_id,
+            func.sum(_items.c.quantity),
+            func.sum(_items.c.quantity * _items.c.price_at_order),
+        )
+        .select_from(_items.outerjoin(_products, _products.c.id == _items.c.product_id))
+        .where(_items.c.order_id == order_id)
+        .group_by(_items.c.product_id, _products.c.category_id)
+    ).all()
+
+    units_total = 0
+    revenue_total = Decimal("0.00")
+    categories: dict[int, list] = defaultdict(lambda: [0, Decimal("0.00")])
+    for product_id, category_id, units, revenue in rows:
+        units = int(units or 0)
+        revenue = Decimal(revenue or 0)
+        units_total += units
+        revenue_total += revenue
+        categories[category_id or 0][0] += units
+        categories[category_id or 0][1] += revenue
+        _bump(
+            connection,
+            _by_product,
+            {"day": day, "product_id": product_id},
+            {"orders": sign, "units": sign * units, "revenue": sign * revenue},
+        )
+    for category_id, (units, revenue) in categories.items():
+        _bump(
+            connection,
+            _by_category,
+            {"day": day, "category_id": category_id},
+            {"orders": sign, "units": sign * units, "revenue": sign * revenue},
+        )
+    _bump(
+        connection,
+        _daily,
+        {"day": day},
+        {"orders": sign, "units": sign * units_total, "revenue": sign * revenue_total},
+    )
+
+
+@event.listens_for(Order, "before_update")
+def _stamp_paid_at(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if history.has_changes() and _is_paid(target.status) and target.paid_at is None:
+        target.paid_at = _utcnow()
+
+
+@event.listens_for(Order, "after_update")
+def _on_order_update(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    old = history.deleted[0] if history.deleted else None
+    delta = int(_is_paid(target.status)) - int(_is_paid(old))
+    if delta and target.paid_at is not None:
+        apply_order(connection, target.id, target.paid_at.date(), delta)
+
+
+# =========================
+# Odbudowa od zera (CLI)
+# =========================
+
+
+def _day(column):
+    # SQLite nie ma typu DATE – date() daje 'RRRR-MM-DD', jak zapis kolumny Date
+    if db.engine.dialect.name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def rebuild_rollups(since: date | None = None) -> dict[str, int]:
+    """
+    Przelicza agregaty (wszystkie albo od dnia ``since``) jednym
+    ``INSERT ... SELECT ... GROUP BY`` na tabelę i commituje.
+    """
+    paid_at = func.coalesce(Order.paid_at, Order.created_at)
+    day = _day(paid_at).label("day")
+    conditions = [Order.status.in_(PAID_STATUSES)]
+    if since is not None:
+        conditions.append(paid_at >= datetime.combine(since, time.min))
+
+    for table in (_daily, _by_product, _by_category):
+        delete = table.delete()
+        if since is not None:
+            delete = delete.where(table.c.day >= since)
+        db.session.execute(delete)
+
+    units = func.coalesce(func.sum(OrderItem.quantity), 0)
+    revenue = func.coalesce(func.sum(OrderItem.quantity * OrderItem.price_at_order), 0)
+    counts = {}
+
+    daily = (
+        select(day, func.count(func.distinct(Order.id)), units, revenue)
+        .select_from(Order)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(*conditions)
+        .group_by(day)
+    )
+    counts["days"] = db.session.execute(
+        _daily.insert().from_select(["day", "orders", "units", "revenue"], daily)
+    ).rowcount
+
+    by_product = (
+        select(day, OrderItem.product_id, func.count(func.distinct(Order.id)), units, revenue)
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(*conditions)
+        .group_by(day, OrderItem.product_id)
+    )
+    counts["products"] = db.session.execute(
+        _by_product.insert().from_select(
+            ["day", "product_id", "orders", "units", "revenue"], by_product
+        )
+    ).rowcount
+
+    category_id = func.coalesce(Product.category_id, literal(0))
+    by_category = (
+        select(day, category_id, func.count(func.distinct(Order.id)), units, revenue)
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(*conditions)
+        .group_by(day, category_id)
+    )
+    counts["categories"] = db.session.execute(
+        _by_category.insert().from_select(
+            ["day", "category_id", "orders", "units", "revenue"], by_category
+        )
+    ).rowcount
+
+    db.session.commit()
+    return counts
+
+
+# =========================
+# Odczyt (panel analityki)
+# =========================
+
+
+def _top(model, key_column, start: date, limit: int) -> list[tuple[int, int, int, Decimal]]:
+    revenue = func.sum(model.revenue)
+    return (
+        db.session.query(key_column, func.sum(model.orders), func.sum(model.units), revenue)
+        .filter(model.day >= start)
+        .group_by(key_column)
+        .order_by(revenue.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def sales_report(days: int = 30, top: int = 10) -> dict:
+    """Szereg dzienny i rankingi produktów / kategorii z ostatnich ``days`` dni."""
+    end = _utcnow().date()
+    start = end - timedelta(days=days - 1)
+
+    stored = {
+        row.day: row
+        for row in SalesDaily.query.filter(SalesDaily.day >= start, SalesDaily.day <= end)
+    }
+    series = []
+    for offset in range(days):
+        current = start + timedelta(days=offset)
+        row = stored.get(current)
+        series.append({
+            "day": current,
+            "orders": row.orders if row else 0,
+            "units": row.units if row else 0,
+            "revenue": Decimal(row.revenue) if row else Decimal("0.00"),
+        })
+
+    products = _top(SalesDailyProduct, SalesDailyProduct.product_id, start, top)
+    categories = _top(SalesDailyCategory, SalesDailyCategory.category_id, start, top)
+
+    # nazwy – zapytania po kluczu głównym, tylko dla pozycji z rankingu
+    product_names = dict(
+        db.session.query(Product.id, Product.name)
+        .filter(Product.id.in_([row[0] for row in products]))
+        .all()
+    )
+    category_names = dict(
+        db.session.query(Category.id, Category.name)
+        .filter(Category.id.in_([row[0] for row in categories]))
+        .all()
+    )
+
+    def ranking(rows, names, empty_label):
+        return [
+            {
+                "id": key,
+                "name": names.get(key) or (empty_label if key == 0 else f"#{key} (usunięty)"),
+                "orders": int(orders or 0),
+                "units": int(units or 0),
+                "revenue": Decimal(revenue or 0),
+            }
+            for key, orders, units, revenue in rows
+        ]
+
+    return {
+        "start": start,
+        "end": end,
+        "series": series,
+        "orders": sum(d["orders"] for d in series),
+        "units": sum(d["units"] for d in series),
+        "revenue": sum((d["revenue"] for d in series), Decimal("0.00")),
+        "max_revenue": max((d["revenue"] for d in series), default=Decimal("0.00")),
+        "products": ranking(products, product_names, "—"),
+        "categories": ranking(categories, category_names, "Bez kategorii"),
+    }
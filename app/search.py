@@ -0,0 +1,216 @@
+# app/search.py
+"""
+Indeks pełnotekstowy produktów.
+
+- SQLite:     wirtualna tabela FTS5 ``products_fts`` (rowid = products.id),
+- PostgreSQL: tabela ``product_search`` z kolumną ``tsvector`` i indeksem GIN.
+
+Indeks jest aktualizowany przyrostowo z panelu admina
+(``index_product`` / ``remove_product``), a w całości można go
+odbudować komendą ``flask rebuild-search-index``.
+"""
+from __future__ import annotations
+
+import re
+
+from flask import current_app
+from markupsafe import Markup
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .extensions import db
+
+# wagi kolumn: trafienie w nazwie liczy się bardziej niż w opisie
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+def _plain_text(html: str | None) -> str:
+    """Opis produktu jest w HTML – do indeksu idzie czysty tekst."""
+    if not html:
+        return ""
+    return Markup(html).striptags()
+
+
+def _tokens(q: str) -> list[str]:
+    return _TOKEN_RE.findall(q or "")
+
+
+# =========================
+# Schemat
+# =========================
+
+
+def create_search_index() -> None:
+    """Tworzy strukturę indeksu (idempotentnie) dla bieżącego dialektu."""
+    if _dialect() == "postgresql":
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS product_search ("
+            " product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,"
+            " document tsvector NOT NULL)"
+        ))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_product_search_document"
+            " ON product_search USING GIN (document)"
+        ))
+    else:
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            " name, description,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+
+
+def drop_search_index() -> None:
+    if _dialect() == "postgresql":
+        db.session.execute(text("DROP TABLE IF EXISTS product_search"))
+    else:
+        db.session.execute(text("DROP TABLE IF EXISTS products_fts"))
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Filtr dla Alembic autogenerate – tabele indeksu nie mają modeli,
+    więc bez tego `flask db migrate` proponowałby ich usunięcie.
+    """
+    if type_ == "table" and name and (
+        name.startswith("products_fts") or name == "product_search"
+    ):
+        return False
+    return True
+
+
+# =========================
+# Aktualizacja przyrostowa
+# =========================
+
+
+def _write_entry(product_id: int, name: str, description: str) -> None:
+    if _dialect() == "postgresql":
+        db.session.execute(
+            text(
+                "INSERT INTO product_search (product_id, document) VALUES ("
+                " :id,"
+                " setweight(to_tsvector('simple', :name), 'A') ||"
+                " setweight(to_tsvector('simple', :description), 'D'))"
+                " ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            {"id": product_id, "name": name, "description": description},
+        )
+    else:
+        db.session.execute(
+            text("DELETE FROM products_fts WHERE rowid = :id"), {"id": product_id}
+        )
+        db.session.execute(
+            text(
+                "INSERT INTO products_fts (rowid, name, description)"
+                " VALUES (:id, :name, :description)"
+            ),
+            {"id": product_id, "name": name, "description": description},
+        )
+
+
+def index_product(product) -> None:
+    """
+    Wstawia / aktualizuje wpis produktu w indeksie (w bieżącej transakcji).
+    Produkt musi mieć już nadane id (po ``flush``).
+
+    Błąd indeksu (np. brak migracji) nie blokuje zapisu produktu –
+    operacja idzie w SAVEPOINT i kończy się ostrzeżeniem w logu.
+    """
+    if product.id is None:
+        db.session.flush()
+    try:
+        with db.session.begin_nested():
+            _write_entry(
+                product.id,
+                product.name or "",
+                _plain_text(product.description_html),
+            )
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Nie udało się zaktualizować indeksu wyszukiwania: {e}")
+
+
+def remove_product(product_id: int) -> None:
+    """Usuwa produkt z indeksu (w bieżącej transakcji)."""
+    if _dialect() == "postgresql":
+        sql = "DELETE FROM product_search WHERE product_id = :id"
+    else:
+        sql = "DELETE FROM products_fts WHERE rowid = :id"
+    try:
+        with db.session.begin_nested():
+            db.session.execute(text(sql), {"id": product_id})
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Nie udało się usunąć produktu z indeksu: {e}")
+
+
+def rebuild_search_index(batch_size: int = 500) -> int:
+    """Odbudowuje indeks od zera. Zwraca liczbę zaindeksowanych produktów."""
+    from .models import Product
+
+    drop_search_index()
+    create_search_index()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Product.id, Product.name, Product.description_html)
+            .filter(Product.id > last_id)
+            .order_by(Product.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for pid, name, description_html in rows:
+            _write_entry(pid, name or "", _plain_text(description_html))
+        indexed += len(rows)
+        last_id = rows[-1].id
+    db.session.commit()
+    return indexed
+
+
+# =========================
+# Wyszukiwanie
+# =========================
+
+
+def search_hits(q: str):
+    """
+    Zwraca podzapytanie ``(product_id, rank)`` z trafieniami dla frazy ``q``
+    albo ``None``, jeśli fraza nie zawiera żadnych słów.
+
+    ``rank`` jest znormalizowany tak, że MNIEJSZY = lepszy
+    (można sortować rosnąco niezależnie od bazy). Każde słowo działa
+    jako prefiks, więc „śliw” znajdzie „Śliwowica”.
+    """
+    tokens = _tokens(q)
+    if not tokens:
+        return None
+
+    if _dialect() == "postgresql":
+        tsquery = " & ".join(f"{t.lower()}:*" for t in tokens)
+        stmt = text(
+            "SELECT product_id, -ts_rank(document, to_tsquery('simple', :tsq)) AS rank"
+            " FROM product_search"
+            " WHERE document @@ to_tsquery('simple', :tsq)"
+        ).bindparams(tsq=tsquery)
+    else:
+        match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+        stmt = text(
+            "SELECT rowid AS product_id,"
+            f" bm25(products_fts, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank"
+            " FROM products_fts WHERE products_fts MATCH :match"
+        ).bindparams(match=match)
+
+    return stmt.columns(
+        db.column("product_id", db.Integer),
+        db.column("rank", db.Float),
+    ).subquery("search_hits")
@@ -0,0 +1,241 @@
+# app/shop/cart.py
+"""
+Koszyk sklepu.
+
+- zalogowany użytkownik: tabele ``carts`` / ``cart_items`` (koszyk przeżywa
+  wylogowanie i jest wspólny dla wszystkich urządzeń),
+- gość: minimalny słownik ``{"<product_id>": ilość}`` w sesji – bez nazw
+  i cen, więc ciasteczko zostaje małe i nie jest przepisywane przy odczycie.
+
+Przy logowaniu koszyk gościa jest scalany z koszykiem z bazy.
+Produkty do widoku koszyka / checkoutu są dociągane jednym zapytaniem ``IN``.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import NamedTuple
+
+from flask import session
+from flask_login import current_user, user_logged_in
+
+from app.extensions import db
+from app.models import Cart, CartItem, Product
+
+SESSION_KEY = "cart"
+
+
+class CartLine(NamedTuple):
+    product: Product
+    quantity: int
+    line_total: Decimal
+
+
+# =========================
+# Koszyk gościa (sesja)
+# =========================
+
+
+def _session_quantities() -> dict[int, int]:
+    """
+    Czyta koszyk z sesji. Rozumie też stare formaty
+    (``{"5": 2}`` albo ``{"5": {"quantity": 2, "name": ..., "price": ...}}``)
+    – bez zapytań do bazy i bez przepisywania ciasteczka.
+    """
+    raw = session.get(SESSION_KEY) or {}
+    if not isinstance(raw, dict):
+        return {}
+    out: dict[int, int] = {}
+    for pid_str, val in raw.items():
+        try:
+            pid = int(pid_str)
+            qty = int(val.get("quantity", 0) if isinstance(val, dict) else val)
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if qty > 0:
+            out[pid] = qty
+    return out
+
+
+def _save_session_quantities(quantities: dict[int, int]) -> None:
+    if quantities:
+        session[SESSION_KEY] = {str(pid): qty for pid, qty in quantities.items()}
+    else:
+        session.pop(SESSION_KEY, None)
+
+
+# =========================
+# Koszyk zalogowanego (baza)
+# =========================
+
+
+def _user_cart(user_id: int, create: bool = False) -> Cart | None:
+    cart = Cart.query.filter_by(user_id=user_id).first()
+    if cart is None and create:
+        cart = Cart(user_id=user_id)
+        db.session.add(cart)
+        db.session.flush()
+    return cart
+
+
+def _use_db() -> bool:
+    return bool(current_user and current_user.is_authenticated)
+
+
+# =========================
+# API używane przez widoki
+# =========================
+
+
+def get_quantities() -> dict[int, int]:
+    """``{product_id: ilość}`` – jedno zapytanie dla zalogowanego, zero dla gościa."""
+    if not _use_db():
+        return _session_quantities()
+    rows = (
+        db.session.query(CartItem.product_id, CartItem.quantity)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .filter(Cart.user_id == current_user.id, CartItem.quantity > 0)
+        .all()
+    )
+    return {pid: qty for pid, qty in rows}
+
+
+def get_lines() -> list[CartLine]:
+    """
+    Pozycje koszyka razem z produktami – zawsze jedno zapytanie,
+    niezależnie od liczby pozycji. Ceny pochodzą z bazy, nie z sesji.
+    Produkty, których już nie ma w bazie, są pomijane.
+    """
+    if _use_db():
+        rows = (
+            db.session.query(Product, CartItem.quantity)
+            .join(CartItem, CartItem.product_id == Product.id)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .filter(Cart.user_id == current_user.id, CartItem.quantity > 0)
+            .order_by(Product.name)
+            .all()
+        )
+    else:
+        quantities = _session_quantities()
+        if not quantities:
+            return []
+        products = Product.query.filter(Product.id.in_(quantities.keys())).order_by(Product.name).all()
+        rows = [(p, quantities[p.id]) for p in products]
+
+    return [
+        CartLine(product, qty, Decimal(str(product.price or 0)) * qty)
+        for product, qty in rows
+    ]
+
+
+def totals(lines: list[CartLine]) -> tuple[Decimal, int]:
+    """Łączna kwota i liczba sztuk."""
+    total = sum((line.line_total for line in lines), Decimal("0.00"))
+    count = sum(line.quantity for line in lines)
+    return total, count
+
+
+def add(product_id: int, delta: int) -> None:
+    if not _use_db():
+        quantities = _session_quantities()
+        new_qty = quantities.get(product_id, 0) + delta
+        if new_qty > 0:
+            quantities[product_id] = new_qty
+        else:
+            quantities.pop(product_id, None)
+        _save_session_quantities(quantities)
+        return
+
+    cart = _user_cart(current_user.id, create=True)
+    item = db.session.get(CartItem, (cart.id, product_id))
+    new_qty = (item.quantity if item else 0) + delta
+    if new_qty <= 0:
+        if item:
+            db.session.delete(item)
+    elif item:
+        item.quantity = new_qty
+    else:
+        db.session.add(CartItem(cart_id=cart.id, product_id=product_id, quantity=new_qty))
+    db.session.commit()
+
+
+def set_quantity(product_id: int, quantity: int) -> bool:
+    """Ustawia ilość pozycji (<= 0 usuwa). Zwraca False, jeśli pozycji nie było."""
+    if not _use_db():
+        quantities = _session_quantities()
+        if product_id not in quantities:
+            return False
+        if quantity > 0:
+            quantities[product_id] = quantity
+        else:
+            quantities.pop(product_id, None)
+        _save_session_quantities(quantities)
+        return True
+
+    item = (
+        CartItem.query.join(Cart, Cart.id == CartItem.cart_id)
+        .filter(Cart.user_id == current_user.id, CartItem.product_id == product_id)
+        .first()
+    )
+    if item is None:
+        return False
+    if quantity > 0:
+        item.quantity = quantity
+    else:
+        db.session.delete(item)
+    db.session.commit()
+    return True
+
+
+def remove(product_id: int) -> None:
+    set_quantity(product_id, 0)
+
+
+def clear() -> None:
+    if not _use_db():
+        _save_session_quantities({})
+        return
+    cart_ids = db.session.query(Cart.id).filter(Cart.user_id == current_user.id)
+    CartItem.query.filter(CartItem.cart_id.in_(cart_ids.scalar_subquery())).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+# =========================
+# Scalanie przy logowaniu
+# =========================
+
+
+def merge_session_cart(user) -> None:
+    """Przenosi koszyk gościa do koszyka użytkownika (ilości się sumują)."""
+    quantities = _session_quantities()
+    if not quantities:
+        session.pop(SESSION_KEY, None)
+        return
+
+    existing_ids = {
+        pid
+        for (pid,) in db.session.query(Product.id).filter(Product.id.in_(quantities.keys()))
+    }
+    cart = _user_cart(user.id, create=True)
+    items = {
+        item.product_id: item
+        for item in CartItem.query.filter(
+            CartItem.cart_id == cart.id,
+            CartItem.product_id.in_(quantities.keys()),
+        )
+    }
+    for pid, qty in quantities.items():
+        if pid not in existing_ids:
+            continue
+        if pid in items:
+            items[pid].quantity += qty
+        else:
+            db.session.add(CartItem(cart_id=cart.id, product_id=pid, quantity=qty))
+    db.session.commit()
+    session.pop(SESSION_KEY, None)
+
+
+@user_logged_in.connect
+def _on_user_logged_in(sender, user, **extra):
+    merge_session_cart(user)
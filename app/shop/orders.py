@@ -0,0 +1,139 @@
+# app/shop/orders.py
+"""
+Składanie zamówienia z koszyka razem z rezerwacją stanów magazynowych.
+
+Stan produktu jest zmniejszany warunkowym ``UPDATE`` – sprawdzenie
+i zmniejszenie to jedna instrukcja, więc dwóch kupujących nie sprzeda
+ostatniej butelki dwa razy (brak odczytu-modyfikacji-zapisu w Pythonie).
+Wszystkie pozycje koszyka idą jedną instrukcją z ``RETURNING``::
+
+    UPDATE products SET stock = stock - CASE id WHEN :p1 THEN :q1 ... END
+    WHERE id IN (:p1, ...) AND stock >= CASE id WHEN :p1 THEN :q1 ... END
+    RETURNING id
+
+Przed nim ``SELECT ... ORDER BY id FOR UPDATE`` blokuje wiersze w stałej
+kolejności – sam ``UPDATE ... WHERE id IN`` w PostgreSQL blokuje je
+w kolejności skanu i dwa zamówienia ze wspólnymi produktami mogłyby się
+zakleszczyć. SQLite szereguje zapisy sam – tam ``FOR UPDATE`` jest pomijane.
+
+Produkty, których nie ma w ``RETURNING``, są niedostępne – ``OutOfStock``,
+a wywołujący robi rollback całej transakcji (zamówienie, pozycje i już
+zdjęte stany). Bazy bez ``UPDATE ... RETURNING`` zdejmują stany po jednej
+pozycji, w kolejności ``product_id``.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from sqlalchemy import bindparam, case, select
+
+from app.extensions import db
+from app.models import Order, OrderItem, Product
+
+_products = Product.__table__
+_order_items = OrderItem.__table__
+
+# jedna pozycja (bazy bez UPDATE ... RETURNING)
+_RESERVE = (
+    _products.update()
+    .where(_products.c.id == bindparam("pid"), _products.c.stock >= bindparam("qty"))
+    .values(stock=_products.c.stock - bindparam("qty"))
+)
+
+
+class OutOfStock(Exception):
+    """Brak towaru dla części pozycji; ``products`` to lista (id, nazwa)."""
+
+    def __init__(self, products: list[tuple[int, str]]):
+        self.products = products
+        names = ", ".join(name for _, name in products)
+        super().__init__(f"Brak na stanie: {names}")
+
+
+def _reserve_returning(quantities: dict[int, int]) -> set[int]:
+    """Zdejmuje stany jedną instrukcją; zwraca id produktów, które się udały."""
+    ids = sorted(quantities)
+    if db.engine.dialect.name != "sqlite":
+        # blokady wierszy rosnąco po id – ta sama kolejność w każdym zamówieniu
+        db.session.execute(
+            select(_products.c.id)
+            .where(_products.c.id.in_(ids))
+            .order_by(_products.c.id)
+            .with_for_update()
+        )
+    qty = case(quantities, value=_products.c.id)
+    stmt = (
+        _products.update()
+        .where(_products.c.id.in_(ids), _products.c.stock >= qty)
+        .values(stock=_products.c.stock - qty)
+        .returning(_products.c.id)
+    )
+    return set(db.session.execute(stmt).scalars())
+
+
+def reserve_stock(quantities: dict[int, int], names: dict[int, str] | None = None) -> None:
+    """
+    Zdejmuje ze stanu ``{product_id: ilość}``. Przy braku towaru rzuca
+    ``OutOfStock`` – bez commitu i bez rollbacku (to robi wywołujący).
+    """
+    if not quantities:
+        return
+    if db.engine.dialect.update_returning:
+        reserved = _reserve_returning(quantities)
+    else:
+        reserved = {
+            pid
+            for pid in sorted(quantities)
+            if db.session.execute(_RESERVE, {"pid": pid, "qty": quantities[pid]}).rowcount
+        }
+    missing = [
+        (pid, (names or {}).get(pid, f"#{pid}")) for pid in sorted(quantities) if pid not in reserved
+    ]
+    if missing:
+        raise OutOfStock(missing)
+
+
+def place_order(user_id: int, shipping_address: str, quantities: dict[int, int]) -> Order:
+    """
+    Tworzy zamówienie z ``{product_id: ilość}`` i rezerwuje stany.
+    Nie commituje; przy ``OutOfStock`` wywołujący robi rollback.
+
+    Ceny i nazwy pochodzą z jednego zapytania ``IN`` w tej transakcji
+    (nie z koszyka), pozycje są zapisywane jednym wielowierszowym
+    ``INSERT`` – liczba zapytań nie rośnie z wielkością koszyka.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty > 0}
+    rows = (
+        db.session.query(Product.id, Product.name, Product.price)
+        .filter(Product.id.in_(quantities.keys()))
+        .all()
+    )
+    products = {pid: (name, price) for pid, name, price in rows}
+    gone = [(pid, f"#{pid}") for pid in quantities if pid not in products]
+    if gone:
+        raise OutOfStock(gone)  # produkt usunięty w międzyczasie
+
+    order = Order(
+        user_id=user_id,
+        status="new",
+        shipping_address=shipping_address,
+    )
+    db.session.add(order)
+    db.session.flush()  # mamy id
+
+    reserve_stock(quantities, {pid: name for pid, (name, _) in products.items()})
+
+    if quantities:
+        db.session.execute(
+            _order_items.insert().values([
+                {
+                    "order_id": order.id,
+                    "product_id": pid,
+                    "quantity": qty,
+                    # cena w momencie zakupu – z bazy
+                    "price_at_order": products[pid][1] or Decimal("0.00"),
+                }
+                for pid, qty in sorted(quantities.items())
+            ])
+        )
+    return order
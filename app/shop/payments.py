@@ -0,0 +1,141 @@
+# app/shop/payments.py
+"""
+Płatności Stripe Checkout.
+
+- Klient Stripe jest jeden na proces: pula połączeń HTTP (``requests.Session``)
+  z jawnymi timeoutami (``STRIPE_CONNECT_TIMEOUT`` / ``STRIPE_READ_TIMEOUT``)
+  i ponawianiem po stronie biblioteki (``STRIPE_MAX_NETWORK_RETRIES``).
+- ``STRIPE_API_BASE`` kieruje zapytania do lokalnej atrapy API
+  (np. stripe-mock) zamiast do api.stripe.com.
+- Utworzona sesja Checkout jest zapisywana na zamówieniu i używana ponownie
+  przy odświeżeniu strony, dopóki nie zbliża się jej wygaśnięcie.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+import stripe
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from app.models import Order
+
+# Stripe wymaga, by sesja żyła co najmniej 30 minut
+MIN_SESSION_TTL = 30 * 60
+
+_lock = threading.Lock()
+# (klucz, adres API, timeouty, ...) -> klient
+_clients: dict[tuple, stripe.StripeClient] = {}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# =========================
+# Klient HTTP
+# =========================
+
+
+def stripe_client() -> stripe.StripeClient:
+    """Klient Stripe z pulą połączeń (tworzony raz na proces i konfigurację)."""
+    config = current_app.config
+    key = (
+        config.get("STRIPE_SECRET_KEY") or "",
+        config.get("STRIPE_API_BASE") or None,
+        config.get("STRIPE_CONNECT_TIMEOUT", 5),
+        config.get("STRIPE_READ_TIMEOUT", 20),
+        config.get("STRIPE_MAX_NETWORK_RETRIES", 2),
+        config.get("STRIPE_HTTP_POOL_SIZE", 10),
+    )
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    api_key, api_base, connect_timeout, read_timeout, retries, pool_size = key
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    client = stripe.StripeClient(
+        api_key,
+        base_addresses={"api": api_base} if api_base else None,
+        max_network_retries=retries,
+        http_client=stripe.RequestsClient(
+            session=session,
+            timeout=(connect_timeout, read_timeout),
+        ),
+    )
+    with _lock:
+        client = _clients.setdefault(key, client)
+    return client
+
+
+# =========================
+# Sesje Checkout
+# =========================
+
+
+def reusable_session_url(order: Order) -> str | None:
+    """Adres zapisanej sesji, jeśli zostało jej dość czasu do wygaśnięcia."""
+    if not order.stripe_session_url or order.stripe_session_expires_at is None:
+        return None
+    margin = timedelta(seconds=current_app.config.get("STRIPE_SESSION_REUSE_MARGIN", 300))
+    if order.stripe_session_expires_at - margin <= _utcnow():
+        return None
+    return order.stripe_session_url
+
+
+def forget_session(order: Order, session_id: str | None = None) -> None:
+    """Zapomina zapisaną sesję (np. po ``checkout.session.expired``)."""
+    if session_id is not None and order.stripe_session_id != session_id:
+        return  # zdarzenie dotyczy starszej sesji
+    order.stripe_session_id = None
+    order.stripe_session_url = None
+    order.stripe_session_expires_at = None
+
+
+def line_items(order: Order) -> list[dict]:
+    """Pozycje do Stripe – ``order.items`` i produkty muszą być już załadowane."""
+    return [
+        {
+            "price_data": {
+                "currency": "pln",
+                "product_data": {"name": item.product.name if item.product else "Produkt"},
+                "unit_amount": int(round(item.price_at_order * 100)),
+            },
+            "quantity": item.quantity,
+        }
+        for item in order.items
+    ]
+
+
+def create_checkout_session(order: Order, items: list[dict], success_url: str,
+                            cancel_url: str) -> str:
+    """
+    Tworzy sesję Checkout i zapisuje ją na zamówieniu (bez commitu).
+    Zwraca adres strony płatności. Błędy API lecą jako ``stripe.StripeError``.
+    """
+    ttl = max(current_app.config.get("STRIPE_SESSION_TTL", 3600), MIN_SESSION_TTL)
+    expires_at = _utcnow() + timedelta(seconds=ttl)
+    session = stripe_client().v1.checkout.sessions.create(
+        {
+            "payment_method_types": ["card"],
+            "line_items": items,
+            "mode": "payment",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "client_reference_id": str(order.id),
+            # webhook (app/webhooks/events.py) znajduje zamówienie po metadata
+            "metadata": {"order_id": str(order.id)},
+            "expires_at": int(expires_at.replace(tzinfo=timezone.utc).timestamp()),
+        }
+    )
+    order.stripe_session_id = session.id
+    order.stripe_session_url = session.url
+    if getattr(session, "expires_at", None):
+        expires_at = datetime.fromtimestamp(session.expires_at, timezone.utc).replace(tzinfo=None)
+    order.stripe_session_expires_at = expires_at
+    return session.url
@@ -1,7 +1,6 @@
 # app/shop/routes.py
 from __future__ import annotations
 
-from decimal import Decimal
 import stripe
 
 from flask import (
@@ -11,143 +10,36 @@ from flask import (
     redirect,
     url_for,
     flash,
-    session,
     current_app,
+    abort,
+    jsonify,
 )
 from flask_login import login_required, current_user
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
 
-from . import shop_bp
+from . import shop_bp, cart, orders, payments, slider
 from .forms import CommentForm, CheckoutForm
-from app.extensions import db
+from app.comment_votes import COMMENT_SORTS, VOTE_VALUES, cast_vote, comment_order, user_votes
+from app.extensions import db, page_cache
+from app.pagination import keyset_paginate
+from app.search import search_hits
 from app.models import (
     Product,
     Category,
     Comment,
-    Slider,
-    SliderItem,
     Order,
     OrderItem,
 )
 
-# =========================
-# Helpers – CART
-# =========================
-
-
-def _ensure_cart_item_dict(pid: int, value) -> dict:
-    """
-    Gwarantuje format:
-      {"product_id": int, "name": str, "price": float, "quantity": int}
-    - jeżeli był stary format (liczba), migruje
-    - jeżeli był słownik ale bez kluczy, uzupełnia
-    """
-    if isinstance(value, int):
-        qty = int(value)
-        p = Product.query.get(pid)
-        return {
-            "product_id": pid,
-            "name": (p.name if p else ""),
-            "price": float(p.price or 0) if p else 0.0,
-            "quantity": max(0, qty),
-        }
-
-    if isinstance(value, dict):
-        # uzupełnij brakujące pola
-        out = dict(value)
-        out.setdefault("product_id", pid)
-        out.setdefault("name", "")
-        out.setdefault("price", 0.0)
-        out.setdefault("quantity", 0)
-        # sanity
-        try:
-            out["quantity"] = int(out["quantity"])
-        except Exception:
-            out["quantity"] = 0
-        try:
-            out["price"] = float(out["price"])
-        except Exception:
-            out["price"] = 0.0
-
-        # dociągnij nazwę i cenę z bazy jeśli puste
-        try:
-            p = Product.query.get(pid)
-        except OperationalError:
-            p = None
-
-        if p:
-            if not out["name"]:
-                out["name"] = p.name or ""
-            if out["price"] <= 0:
-                try:
-                    out["price"] = float(p.price or 0)
-                except Exception:
-                    out["price"] = 0.0
-        return out
-
-    # nieznany format -> zresetuj bezpiecznie
-    p = Product.query.get(pid)
-    return {
-        "product_id": pid,
-        "name": (p.name if p else ""),
-        "price": float(p.price or 0) if p else 0.0,
-        "quantity": 0,
-    }
-
-
-def _get_cart() -> dict[str, dict]:
-    """
-    Zwraca koszyk w nowym formacie:
-      { "product_id": {"product_id":..., "name":..., "price":..., "quantity":...}, ... }
-    """
-    raw = session.get("cart", {})
-    if not isinstance(raw, dict):
-        raw = {}
-
-    migrated: dict[str, dict] = {}
-    for pid_str, val in raw.items():
-        try:
-            pid = int(pid_str)
-        except (TypeError, ValueError):
-            continue
-        migrated[str(pid)] = _ensure_cart_item_dict(pid, val)
-
-    # zapisz z powrotem już znormalizowany koszyk
-    session["cart"] = migrated
-    session.modified = True
-    return migrated
-
-
-def _save_cart(cart: dict[str, dict]) -> None:
-    """Zapisuje koszyk w sesji."""
-    session["cart"] = cart
-    session.modified = True
-
-
-def _cart_totals(cart: dict[str, dict]) -> tuple[Decimal, int]:
-    """Liczy łączną kwotę i ilość sztuk w koszyku."""
-    total = Decimal("0.00")
-    count = 0
-    for item in cart.values():
-        try:
-            price = Decimal(str(item.get("price", 0)))
-            qty = int(item.get("quantity", 0))
-        except Exception:
-            continue
-        if qty <= 0:
-            continue
-        total += price * qty
-        count += qty
-    return total, count
-
-
 # =========================
 # Główna strona sklepu
 # =========================
 
 
 @shop_bp.route("/")
+@page_cache.cached(tags=["products", "categories", "slider"])
 def index():
     """Strona główna sklepu.
 
@@ -155,12 +47,8 @@ def index():
     - Prawa kolumna: kategorie + wyszukiwarka.
     - Poniżej: siatka produktów z paginacją i szybkim „Do koszyka”.
     """
-    # --- Slider: aktywny slider + jego elementy (relacja .items załatwia kolejność) ---
-    try:
-        active_slider = Slider.query.filter_by(is_active=True).first()
-    except OperationalError:
-        # Brak migracji / tabela nie istnieje – strona ma dalej działać
-        active_slider = None
+    # --- Slider: migawka aktywnego slidera (jedno zapytanie, cache w procesie) ---
+    active_slider = slider.get_active_slider()
 
     # --- Kategorie do prawej kolumny ---
     try:
@@ -168,37 +56,59 @@ def index():
     except OperationalError:
         categories = []
 
-    # --- Filtry: kategoria + wyszukiwarka ---
-    page = request.args.get("page", 1, type=int)
+    # --- Filtry: kategoria + wyszukiwarka + kursor strony ---
+    # ?page=N zostaje jako fallback dla starych linków
+    page = request.args.get("page", type=int)
+    cursor = request.args.get("cursor", type=str)
     q = request.args.get("q", "", type=str).strip()
     current_category_id = request.args.get("cat", type=int)
 
-    # --- Produkty: bazowe zapytanie + filtry ---
+    # --- Produkty: bazowe zapytanie + filtry, paginacja kursorowa po id ---
     products_pagination = None
     try:
         query = Product.query
 
         if current_category_id:
-            query = query.filter(Product.category_id == current_category_id)
+            # kategoria razem z podkategoriami (tabela domknięcia)
+            query = query.filter(
+                Product.category_id.in_(Category.subtree_ids(current_category_id))
+            )
+
+        keys = [(Product.id, True)]
+        hits = search_hits(q) if q else None
+        if hits is not None:
+            # wyszukiwanie po indeksie pełnotekstowym, sortowanie po trafności
+            query = query.join(hits, hits.c.product_id == Product.id)
+            keys = [(hits.c.rank, False), (Product.id, True)]
+
+        products_pagination = keyset_paginate(
+            query, keys, cursor=cursor, page=page, per_page=12
+        )
+    except (OperationalError, ProgrammingError):
+        # jeśli tabela products nie istnieje albo są problemy z migracją
+        products_pagination = None
+        db.session.rollback()
 
-        if q:
+    if products_pagination is None and q:
+        # brak indeksu (np. nie puszczona migracja) – stare wyszukiwanie ILIKE
+        try:
             like = f"%{q}%"
-            # wyszukiwanie po nazwie i opisie HTML (bezpieczne ilike)
+            query = Product.query
+            if current_category_id:
+                query = query.filter(
+                    Product.category_id.in_(Category.subtree_ids(current_category_id))
+                )
             query = query.filter(
                 or_(
                     Product.name.ilike(like),
                     Product.description_html.ilike(like),
                 )
             )
-
-        products_pagination = query.order_by(Product.id.desc()).paginate(
-            page=page,
-            per_page=12,
-            error_out=False,
-        )
-    except OperationalError:
-        # jeśli tabela products nie istnieje albo są problemy z migracją
-        products_pagination = None
+            products_pagination = keyset_paginate(
+                query, [(Product.id, True)], cursor=cursor, page=page, per_page=12
+            )
+        except OperationalError:
+            products_pagination = None
 
     return render_template(
         "shop/index.html",
@@ -216,6 +126,7 @@ def index():
 
 
 @shop_bp.route("/category/<int:category_id>/")
+@page_cache.cached(tags=["products", "categories"])
 def category_view(category_id: int):
     try:
         category = Category.query.get_or_404(category_id)
@@ -225,15 +136,23 @@ def category_view(category_id: int):
     if category is None:
         products = []
         categories = []
+        breadcrumb = []
     else:
         try:
+            # produkty z całego poddrzewa kategorii – jedno zapytanie
             products = (
-                Product.query.filter_by(category_id=category.id)
+                Product.query.filter(
+                    Product.category_id.in_(Category.subtree_ids(category.id))
+                )
                 .order_by(Product.id.desc())
                 .all()
             )
         except OperationalError:
             products = []
+        try:
+            breadcrumb = category.breadcrumb()
+        except OperationalError:
+            breadcrumb = [category]
         try:
             categories = Category.query.order_by(Category.name).all()
         except OperationalError:
@@ -242,6 +161,7 @@ def category_view(category_id: int):
     return render_template(
         "shop/category.html",
         category=category,
+        breadcrumb=breadcrumb,
         products=products,
         categories=categories,
     )
@@ -253,6 +173,7 @@ def category_view(category_id: int):
 
 
 @shop_bp.route("/product/<int:product_id>/", methods=["GET", "POST"])
+@page_cache.cached(tags=lambda product_id: [f"product:{product_id}"])
 def product_detail(product_id: int):
     try:
         product = Product.query.get_or_404(product_id)
@@ -260,11 +181,13 @@ def product_detail(product_id: int):
         flash("Produkt nie istnieje lub baza jest niedostępna.", "danger")
         return redirect(url_for("shop.index"))
 
+    if request.method == "POST" and not current_user.is_authenticated:
+        # przed walidacją: strona z cache dla gościa ma cudzy token CSRF
+        flash("Zaloguj się, aby dodać komentarz.", "warning")
+        return redirect(url_for("auth.login", next=request.url))
+
     form = CommentForm()
     if form.validate_on_submit():
-        if not current_user.is_authenticated:
-            flash("Zaloguj się, aby dodać komentarz.", "warning")
-            return redirect(url_for("auth.login", next=request.url))
         try:
             comment = Comment(
                 content=form.content.data,
@@ -279,11 +202,15 @@ def product_detail(product_id: int):
             flash("Nie udało się dodać komentarza.", "danger")
         return redirect(url_for("shop.product_detail", product_id=product.id))
 
-    # komentarze zaakceptowane
+    # komentarze zaakceptowane – ?sort=best po score (indeks, bez liczenia głosów)
+    sort = request.args.get("sort", "newest")
+    if sort not in COMMENT_SORTS:
+        sort = "newest"
     try:
         comments = (
             Comment.query.filter_by(product_id=product.id, status="zaakceptowany")
-            .order_by(Comment.created_at.desc())
+            .options(joinedload(Comment.user))
+            .order_by(*comment_order(sort))
             .all()
         )
     except OperationalError:
@@ -294,9 +221,59 @@ def product_detail(product_id: int):
         product=product,
         comments=comments,
         form=form,
+        sort=sort,
+        comment_sorts=COMMENT_SORTS,
+        my_votes=_my_votes(comments),
     )
 
 
+def _my_votes(comments) -> dict[int, int]:
+    """Głosy zalogowanego użytkownika na wyświetlanych komentarzach."""
+    if not current_user.is_authenticated or not comments:
+        return {}
+    try:
+        return user_votes(current_user.id, [c.id for c in comments])
+    except OperationalError:
+        return {}
+
+
+@shop_bp.route("/comments/<int:comment_id>/vote/", methods=["POST"])
+@login_required
+def vote_comment(comment_id: int):
+    """Głos na komentarz (produktu albo wpisu): value = 1, -1 albo 0 (wycofanie)."""
+    comment = Comment.query.get_or_404(comment_id)
+    fallback = (
+        url_for("shop.product_detail", product_id=comment.product_id)
+        if comment.product_id
+        else url_for("blog.post_detail", post_id=comment.post_id)
+    )
+    try:
+        value = int(request.form.get("value", 0))
+    except (TypeError, ValueError):
+        value = None
+
+    if comment.status != "zaakceptowany" or value not in VOTE_VALUES:
+        abort(400)
+    if comment.user_id == current_user.id:
+        flash("Nie można głosować na własny komentarz.", "warning")
+        return redirect(request.referrer or fallback)
+
+    try:
+        score, votes_count = cast_vote(comment.id, current_user.id, value)
+    except OperationalError:
+        db.session.rollback()
+        flash("Nie udało się zapisać głosu.", "danger")
+        return redirect(request.referrer or fallback)
+
+    # strona produktu w cache gości pokazuje score i kolejność ?sort=best
+    if comment.product_id:
+        page_cache.purge(f"product:{comment.product_id}")
+
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(score=score, votes_count=votes_count, value=value)
+    return redirect(request.referrer or fallback)
+
+
 
 # =========================
 # Koszyk
@@ -305,55 +282,13 @@ def product_detail(product_id: int):
 
 @shop_bp.route("/cart/")
 def cart_view():
-    cart = _get_cart()
-    _, count = _cart_totals(cart)  # Pobieramy tylko 'count' z helpera
-
-    # [ZMIANA] To jest brakująca logika
-    # Musimy przekonwertować słownik 'cart' na listę 'cart_items' oczekiwaną przez szablon.
-    cart_items = []
-    total = Decimal("0.00")
-
-    # Pobierz wszystkie ID produktów z koszyka, aby pobrać je jednym zapytaniem
-    product_ids = [int(pid) for pid in cart.keys() if cart[pid].get("quantity", 0) > 0]
-
-    if product_ids:
-        # Pobierz produkty z bazy danych
-        products_db = Product.query.filter(Product.id.in_(product_ids)).all()
-        # Zmapuj produkty po ID dla łatwego dostępu
-        products_map = {str(p.id): p for p in products_db}
-
-        for pid_str, item in cart.items():
-            if int(pid_str) not in product_ids:
-                continue  # Pomiń itemy z quantity = 0
-
-            product = products_map.get(pid_str)
-
-            if not product:
-                # Produkt jest w koszyku, ale nie ma go już w bazie? Pomiń.
-                # Można też usunąć go z koszyka
-                # cart.pop(pid_str, None)
-                continue
-
-            try:
-                # Używamy zaufanej ceny z bazy danych, a nie z sesji
-                price = product.price
-                qty = int(item["quantity"])
-                item_total = price * qty
-                cart_items.append((product, qty, item_total))
-            except Exception:
-                # Pomiń błędny wpis
-                continue
-    
-    # [ZMIANA] Ponowne obliczenie sumy na podstawie cen z bazy (bezpieczniejsze)
-    total = sum(item_total for _, _, item_total in cart_items)
-    
-    # Zapisz koszyk, gdyby jakiś produkt został usunięty (jeśli odkomentujesz cart.pop wyżej)
-    # _save_cart(cart) 
+    # pozycje + produkty jednym zapytaniem, ceny z bazy
+    lines = cart.get_lines()
+    total, count = cart.totals(lines)
 
     return render_template(
         "shop/cart.html",
-        # [ZMIANA] Przekazujemy 'cart_items' (lista) zamiast 'cart' (słownik)
-        cart_items=cart_items,
+        cart_items=lines,
         total=total,
         count=count,
     )
@@ -361,12 +296,11 @@ def cart_view():
 
 @shop_bp.route("/cart/add/<int:product_id>/", methods=["POST"])
 def add_to_cart(product_id: int):
-    cart = _get_cart()
-
-    # normalizacja product_id jako string (klucz słownika)
-    key = str(product_id)
-    item = cart.get(key, None)
-    item = _ensure_cart_item_dict(product_id, item or 0)
+    # produkt mógł zostać usunięty (stara strona) albo id jest zmyślone –
+    # taka pozycja nie może trafić do sesji ani do cart_items
+    if db.session.get(Product, product_id) is None:
+        flash("Ten produkt nie jest już dostępny.", "warning")
+        return redirect(url_for("shop.index"))
 
     # ilość z formularza (domyślnie 1)
     try:
@@ -374,9 +308,7 @@ def add_to_cart(product_id: int):
     except (TypeError, ValueError):
         qty_delta = 1
 
-    item["quantity"] = max(0, item.get("quantity", 0) + qty_delta)
-    cart[key] = item
-    _save_cart(cart)
+    cart.add(product_id, qty_delta)
 
     flash("Produkt został dodany do koszyka.", "success")
     return redirect(request.referrer or url_for("shop.cart_view"))
@@ -384,38 +316,25 @@ def add_to_cart(product_id: int):
 
 @shop_bp.route("/cart/update/<int:product_id>/", methods=["POST"])
 def update_cart_item(product_id: int):
-    cart = _get_cart()
-    key = str(product_id)
-    if key not in cart:
-        return redirect(url_for("shop.cart_view"))
-
     try:
         new_qty = int(request.form.get("quantity", 1))
     except (TypeError, ValueError):
         new_qty = 1
 
-    if new_qty <= 0:
-        cart.pop(key, None)
-    else:
-        cart[key]["quantity"] = new_qty
-
-    _save_cart(cart)
+    cart.set_quantity(product_id, new_qty)
     return redirect(url_for("shop.cart_view"))
 
 
 @shop_bp.route("/cart/remove/<int:product_id>/", methods=["POST"])
 def remove_from_cart(product_id: int):
-    cart = _get_cart()
-    key = str(product_id)
-    cart.pop(key, None)
-    _save_cart(cart)
+    cart.remove(product_id)
     flash("Produkt został usunięty z koszyka.", "info")
     return redirect(url_for("shop.cart_view"))
 
 
 @shop_bp.route("/cart/clear/", methods=["POST"])
 def clear_cart():
-    _save_cart({})
+    cart.clear()
     flash("Koszyk został wyczyszczony.", "info")
     return redirect(url_for("shop.cart_view"))
 
@@ -425,59 +344,60 @@ def clear_cart():
 # =========================
 
 
+def _purge_ordered_products(product_ids) -> None:
+    """
+    Po commicie zamówienia: strony zamówionych produktów pokazują stary
+    stan. Gdy któryś się wyprzedał, znika też z listy produktów i slidera.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    page_cache.purge(*(f"product:{pid}" for pid in product_ids))
+    sold_out = (
+        db.session.query(Product.id)
+        .filter(Product.id.in_(product_ids), Product.stock <= 0)
+        .first()
+    )
+    if sold_out is not None:
+        page_cache.purge("products", "slider")
+        slider.invalidate_active_slider()
+
+
 @shop_bp.route("/checkout/", methods=["GET", "POST"])
 @login_required
 def checkout():
-    cart = _get_cart()
-    total, count = _cart_totals(cart)
+    lines = cart.get_lines()
+    total, count = cart.totals(lines)
     if count == 0:
         flash("Twój koszyk jest pusty.", "warning")
         return redirect(url_for("shop.cart_view"))
 
     form = CheckoutForm()
     if form.validate_on_submit():
+        quantities = {line.product.id: line.quantity for line in lines}
         try:
-            order = Order(
-                user_id=current_user.id,
-                # [ZMIANA] Błąd - w modelu nie ma 'total_amount' ani 'notes'
-                # total_amount=total, 
-                status="new", # Użyj statusu 'new' lub 'oczekuje'
-                shipping_address=form.address.data,
-                # notes=form.notes.data,
-            )
-            db.session.add(order)
-            db.session.flush()  # mamy id
-
-            for item in cart.values():
-                if item.get("quantity", 0) <= 0:
-                    continue
-                
-                # [ZMIANA] Błąd - w modelu OrderItem nie ma 'product_name' ani 'unit_price'
-                # Musimy użyć 'product_id', 'quantity' i 'price_at_order'
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=item["product_id"],
-                    # product_name=item["name"], # Tego nie ma w modelu
-                    # unit_price=item["price"], # Tego nie ma w modelu
-                    price_at_order=Decimal(str(item.get("price", 0))), # Zapisz cenę w momencie zakupu
-                    quantity=item["quantity"],
-                )
-                db.session.add(order_item)
-
+            order = orders.place_order(current_user.id, form.address.data, quantities)
             db.session.commit()
-            _save_cart({})  # czyścimy koszyk
-            flash("Zamówienie zostało utworzone. Przejdź do płatności.", "success")
-            return redirect(url_for("shop.payment_start", order_id=order.id))
+        except orders.OutOfStock as e:
+            db.session.rollback()
+            names = ", ".join(name for _, name in e.products)
+            flash(f"Niewystarczający stan magazynowy: {names}. Zmień ilość w koszyku.", "warning")
+            return redirect(url_for("shop.cart_view"))
         except Exception as e: # [ZMIANA] Lepsze logowanie błędów
             current_app.logger.error(f"Błąd przy tworzeniu zamówienia: {e}")
             db.session.rollback()
             flash("Nie udało się utworzyć zamówienia. Błąd serwera.", "danger")
+        else:
+            _purge_ordered_products(quantities)
+            cart.clear()  # czyścimy koszyk
+            flash("Zamówienie zostało utworzone. Przejdź do płatności.", "success")
+            return redirect(url_for("shop.payment_start", order_id=order.id))
 
     # [ZMIANA] Błąd - szablon oczekuje 'form', 'cart', 'total', 'count'
     # Wcześniej te zmienne nie były przekazywane w gałęzi GET
     return render_template(
         "shop/checkout.html",
-        cart=cart,
+        cart_items=lines,
         total=total,
         count=count,
         form=form,
@@ -493,7 +413,12 @@ def checkout():
 @login_required
 def payment_start(order_id: int):
     try:
-        order = Order.query.get_or_404(order_id)
+        # zamówienie + pozycje + produkty jednym zapytaniem
+        order = (
+            Order.query.options(joinedload(Order.items).joinedload(OrderItem.product))
+            .filter(Order.id == order_id)
+            .first_or_404()
+        )
     except OperationalError:
         flash("Zamówienie nie istnieje.", "danger")
         return redirect(url_for("shop.index"))
@@ -507,41 +432,20 @@ def payment_start(order_id: int):
         flash("To zamówienie nie jest gotowe do płatności.", "warning")
         return redirect(url_for("shop.index"))
 
-    stripe.api_key = current_app.config.get("STRIPE_SECRET_KEY")
-
-    line_items = []
-    try:
-        for item in order.items:
-            # [ZMIANA] Potrzebujemy pobrać nazwę produktu z relacji
-            product_name = item.product.name if item.product else "Produkt"
-            
-            line_items.append(
-                {
-                    "price_data": {
-                        "currency": "pln",
-                        # [ZMIANA] Używamy pobranej nazwy
-                        "product_data": {"name": product_name}, 
-                        # [ZMIANA] Używamy 'price_at_order'
-                        "unit_amount": int(item.price_at_order * 100), 
-                    },
-                    "quantity": item.quantity,
-                }
-            )
-    except Exception as e:
-        current_app.logger.error(f"Błąd generowania linii Stripe: {e}")
-        flash("Problem z generowaniem pozycji do płatności.", "danger")
-        # [ZMIANA] Lepsze przekierowanie
-        return redirect(url_for("shop.cart_view"))
+    # odświeżenie strony – ta sama sesja Stripe, bez nowego wywołania API
+    reused_url = payments.reusable_session_url(order)
+    if reused_url:
+        return redirect(reused_url, code=303)
 
+    line_items = payments.line_items(order)
     if not line_items:
         flash("Brak produktów w zamówieniu do opłacenia.", "danger")
         return redirect(url_for("shop.cart_view"))
 
     try:
-        session_stripe = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=line_items,
-            mode="payment",
+        checkout_url = payments.create_checkout_session(
+            order,
+            line_items,
             success_url=url_for(
                 "shop.payment_success", order_id=order.id, _external=True
             ),
@@ -549,13 +453,19 @@ def payment_start(order_id: int):
                 "shop.payment_cancel", order_id=order.id, _external=True
             ),
         )
-    except Exception as e:
+        db.session.commit()
+    except stripe.StripeError as e:
         current_app.logger.error(f"Błąd tworzenia sesji Stripe: {e}")
+        db.session.rollback()
         flash("Nie udało się utworzyć sesji płatności.", "danger")
         # [ZMIANA] Lepsze przekierowanie
         return redirect(url_for("shop.cart_view"))
+    except OperationalError as e:
+        # sesja powstała, tylko nie zapisaliśmy jej – przy odświeżeniu będzie nowa
+        current_app.logger.error(f"Nie zapisano sesji Stripe zamówienia {order.id}: {e}")
+        db.session.rollback()
 
-    return redirect(session_stripe.url, code=303)
+    return redirect(checkout_url, code=303)
 
 
 @shop_bp.route("/payment/<int:order_id>/success")
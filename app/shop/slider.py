@@ -0,0 +1,128 @@
+# app/shop/slider.py
+"""
+Migawka aktywnego slidera dla strony głównej.
+
+Aktywny slider razem z elementami, produktami i mediami jest wczytywany
+jednym zapytaniem (JOIN + eager loading) i zamieniany na niemutowalne
+krotki – szablon nie dotyka już sesji ORM, więc nie ma leniwych zapytań
+``item.product`` przy renderowaniu.
+
+Migawka jest trzymana w pamięci procesu. Panel admina woła
+``invalidate_active_slider()`` po zmianach slidera i produktów; przy wielu
+workerach pozostałe procesy odświeżą ją najpóźniej po
+``SLIDER_SNAPSHOT_TTL`` sekundach.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import contains_eager, joinedload
+
+from app.extensions import db
+from app.models import Slider, SliderItem
+
+
+class SlideProduct(NamedTuple):
+    id: int
+    name: str
+    image_filename: str | None
+    description_html: str | None
+    stock: int | None
+
+
+class SlideMedia(NamedTuple):
+    id: int
+    stored_filename: str
+    alt_text: str | None
+    title: str | None
+
+
+class Slide(NamedTuple):
+    id: int
+    order_index: int
+    caption: str | None
+    product: SlideProduct | None
+    media: SlideMedia | None
+
+
+class SliderSnapshot(NamedTuple):
+    id: int
+    name: str
+    items: tuple[Slide, ...]
+
+
+_lock = threading.Lock()
+_snapshot: SliderSnapshot | None = None
+_loaded_at: float | None = None
+
+
+def _load() -> SliderSnapshot | None:
+    """Jedno zapytanie: slider + elementy (po order_index) + produkt + media."""
+    # bez .first(): LIMIT 1 uciąłby dołączone wiersze elementów
+    sliders = (
+        db.session.query(Slider)
+        .outerjoin(Slider.items)
+        .options(
+            contains_eager(Slider.items)
+            .joinedload(SliderItem.product),
+            contains_eager(Slider.items)
+            .joinedload(SliderItem.media),
+        )
+        .filter(Slider.is_active.is_(True))
+        .order_by(Slider.id, SliderItem.order_index)
+        .populate_existing()
+        .all()
+    )
+    if not sliders:
+        return None
+    slider = sliders[0]
+
+    slides = []
+    for item in slider.items:
+        p, m = item.product, item.media
+        slides.append(
+            Slide(
+                id=item.id,
+                order_index=item.order_index,
+                caption=item.caption,
+                product=SlideProduct(
+                    p.id, p.name, p.image_filename, p.description_html, p.stock
+                ) if p else None,
+                media=SlideMedia(
+                    m.id, m.stored_filename, m.alt_text, m.title
+                ) if m else None,
+            )
+        )
+    return SliderSnapshot(id=slider.id, name=slider.name, items=tuple(slides))
+
+
+def get_active_slider() -> SliderSnapshot | None:
+    """Migawka aktywnego slidera (albo None); przy braku tabel – None."""
+    global _snapshot, _loaded_at
+    ttl = current_app.config.get("SLIDER_SNAPSHOT_TTL", 60)
+    loaded_at = _loaded_at
+    if loaded_at is not None and time.monotonic() - loaded_at < ttl:
+        return _snapshot
+
+    with _lock:
+        if _loaded_at is not None and time.monotonic() - _loaded_at < ttl:
+            return _snapshot
+        try:
+            snapshot = _load()
+        except (OperationalError, ProgrammingError):
+            # brak migracji / tabela nie istnieje – strona ma dalej działać
+            db.session.rollback()
+            return None
+        _snapshot, _loaded_at = snapshot, time.monotonic()
+        return snapshot
+
+
+def invalidate_active_slider() -> None:
+    """Wymusza przebudowę migawki przy następnym żądaniu."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
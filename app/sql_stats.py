@@ -0,0 +1,202 @@
+# app/sql_stats.py
+"""
+Statystyki SQL na żądanie (opcjonalne, ``SQL_INSTRUMENTATION``).
+
+Zdarzenia silnika SQLAlchemy (``before/after_cursor_execute``) zliczają
+dla każdego żądania: liczbę zapytań, łączny czas w bazie i powtórzenia
+tego samego zapytania. Odciskiem zapytania jest jego tekst z parametrami
+wiązanymi (``... WHERE users.id = ?``) – SQLAlchemy nie wkleja wartości
+do SQL-a, więc ten sam tekst z różnymi parametrami to typowe N+1
+(leniwe ładowanie relacji w pętli szablonu).
+
+- nagłówek ``Server-Timing: db;dur=12.3;desc="SQL: 7"`` (widać go
+  w zakładce Network przeglądarki),
+- ostrzeżenie w logu, gdy to samo zapytanie poszło co najmniej
+  ``SQL_N_PLUS_ONE_THRESHOLD`` razy z różnymi parametrami,
+- ``query_budget`` / ``assert_query_budget`` do testów: limit zapytań
+  na blok kodu albo endpoint.
+
+Wyłączone nasłuchiwanie kosztuje zero – zdarzenia są rejestrowane dopiero
+przy włączonej instrumentacji albo pierwszym ``query_budget``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+# ile różnych zestawów parametrów pamiętamy na zapytanie (dalej tylko licznik)
+_MAX_PARAMS_TRACKED = 100
+
+
+class QueryStats:
+    """Zapytania jednego żądania / bloku ``query_budget``."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+        self._params: dict[str, set[str]] = {}
+
+    def record(self, statement: str, parameters, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+        seen = self._params.setdefault(statement, set())
+        if len(seen) < _MAX_PARAMS_TRACKED:
+            seen.add(repr(parameters))
+
+    def repeated(self, threshold: int) -> list[tuple[str, int, int]]:
+        """``(zapytanie, wykonania, różne parametry)`` dla podejrzanych o N+1."""
+        return [
+            (statement, count, len(self._params[statement]))
+            for statement, count in self.statements.most_common()
+            if count >= threshold and len(self._params[statement]) > 1
+        ]
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"{self.count} zapytań, {self.duration * 1000:.1f} ms"]
+        for statement, count in self.statements.most_common(limit):
+            lines.append(f"  {count}× {' '.join(statement.split())[:200]}")
+        return "\n".join(lines)
+
+
+# =========================
+# Zdarzenia silnika
+# =========================
+
+_installed = False
+_install_lock = threading.Lock()
+# bloki ``query_budget`` aktywne w danym wątku
+_local = threading.local()
+
+
+def _active() -> list[QueryStats]:
+    targets = list(getattr(_local, "budgets", ()))
+    if has_request_context():
+        stats = g.get("sql_stats")
+        if stats is not None:
+            targets.append(stats)
+    return targets
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # start trzymamy w kontekście wykonania – zapytanie z błędem go nie zostawi
+    if context is not None:
+        context._sql_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_stats_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for stats in _active():
+        stats.record(statement, parameters, elapsed)
+
+
+def _install() -> None:
+    """Rejestruje nasłuch na wszystkich silnikach (raz na proces)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _installed = True
+
+
+# =========================
+# Żądania (Server-Timing, N+1)
+# =========================
+
+
+def _start_request():
+    g.sql_stats = QueryStats()
+
+
+def _finish_request(response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+    config = current_app.config
+    if config.get("SQL_SERVER_TIMING", True):
+        response.headers.add(
+            "Server-Timing", f'db;dur={stats.duration * 1000:.1f};desc="SQL: {stats.count}"'
+        )
+    for statement, count, distinct in stats.repeated(config.get("SQL_N_PLUS_ONE_THRESHOLD", 5)):
+        log.warning(
+            "Możliwe N+1 w %s %s: %d× (%d różnych parametrów): %s",
+            request.method,
+            request.path,
+            count,
+            distinct,
+            " ".join(statement.split())[:300],
+        )
+    return response
+
+
+def init_app(app) -> None:
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+    _install()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+# =========================
+# Testy: budżet zapytań
+# =========================
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: int | None = None):
+    """
+    Liczy zapytania wykonane w bloku (w tym wątku, np. przez test client)
+    i rzuca ``QueryBudgetExceeded``, gdy jest ich więcej niż ``max_queries``
+    albo któreś powtórzyło się z różnymi parametrami ``max_repeats`` razy::
+
+        with query_budget(6, max_repeats=3):
+            client.get("/admin/comments/moderation")
+    """
+    _install()
+    stats = QueryStats()
+    budgets = getattr(_local, "budgets", None)
+    if budgets is None:
+        budgets = _local.budgets = []
+    budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        budgets.remove(stats)
+
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(f"Przekroczony budżet {max_queries} zapytań: {stats.summary()}")
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats)
+        if repeated:
+            statement, count, distinct = repeated[0]
+            raise QueryBudgetExceeded(
+                f"Możliwe N+1: {count}× ({distinct} różnych parametrów): "
+                f"{' '.join(statement.split())[:300]}"
+            )
+
+
+def assert_query_budget(client, url: str, max_queries: int, max_repeats: int | None = None,
+                        method: str = "GET", **kwargs):
+    """Wykonuje żądanie test clientem w ``query_budget``; zwraca odpowiedź."""
+    with query_budget(max_queries, max_repeats):
+        response = client.open(url, method=method, **kwargs)
+    return response
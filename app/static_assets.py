@@ -0,0 +1,194 @@
+# app/static_assets.py
+"""
+Pliki statyczne z odciskiem treści i długim cache.
+
+- ``url_for('static', filename=...)`` dokleja ``?v=<hash treści>``,
+- plik pobrany z aktualnym ``v`` idzie z ``Cache-Control: public,
+  max-age=31536000, immutable`` – przeglądarka nie pyta o niego ponownie,
+  a po zmianie pliku zmienia się URL,
+- jeśli obok pliku leży aktualna wersja ``.br`` / ``.gz`` (komenda
+  ``flask precompress-static``), wysyłamy ją zgodnie z ``Accept-Encoding``.
+
+Bez ``v`` (albo ze starym ``v``) plik jest serwowany jak dotąd, bez
+długiego cache.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:  # opcjonalnie – bez pakietu Brotli powstają tylko warianty .gz
+    import brotli
+except ImportError:
+    brotli = None
+
+ONE_YEAR = 365 * 24 * 3600
+
+# rozszerzenia, które warto kompresować (obrazy już są skompresowane)
+COMPRESSIBLE = {".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".xml", ".html", ".ico"}
+
+# kodowanie -> rozszerzenie wariantu (w kolejności preferencji)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_lock = threading.Lock()
+# ścieżka względna -> (mtime, hash)
+_fingerprints: dict[str, tuple[float, str]] = {}
+
+
+# =========================
+# Odciski
+# =========================
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:12]
+
+
+def fingerprint(filename: str) -> str | None:
+    """Krótki hash treści pliku statycznego (None, gdy pliku nie ma)."""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None:
+        return None
+    cached = _fingerprints.get(filename)
+    # w produkcji pliki się nie zmieniają – stat tylko w trybie debug
+    if cached is not None and not current_app.debug:
+        return cached[1]
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    digest = _hash_file(path)
+    with _lock:
+        _fingerprints[filename] = (mtime, digest)
+    return digest
+
+
+def _add_fingerprint(endpoint: str, values: dict) -> None:
+    if endpoint != "static" or "v" in values:
+        return
+    filename = values.get("filename")
+    if filename:
+        digest = fingerprint(filename)
+        if digest:
+            values["v"] = digest
+
+
+# =========================
+# Serwowanie
+# =========================
+
+
+def _precompressed(path: str) -> tuple[str, str] | None:
+    """(kodowanie, ścieżka wariantu) – tylko aktualny wariant akceptowany przez klienta."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE:
+        return None
+    accepted = request.accept_encodings
+    try:
+        source_mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    for encoding, suffix in ENCODINGS:
+        if not accepted[encoding]:
+            continue
+        variant = path + suffix
+        try:
+            if os.stat(variant).st_mtime >= source_mtime:
+                return encoding, variant
+        except OSError:
+            continue
+    return None
+
+
+def static_view(filename: str):
+    """Zamiennik domyślnego widoku ``static`` z cache i wariantami .br/.gz."""
+    static_folder = current_app.static_folder
+    path = safe_join(static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    version = request.args.get("v")
+    immutable = bool(version) and version == fingerprint(filename)
+    max_age = current_app.config.get("STATIC_MAX_AGE", ONE_YEAR) if immutable else None
+
+    variant = _precompressed(path)
+    if variant is None:
+        response = send_from_directory(static_folder, filename, max_age=max_age)
+    else:
+        encoding, variant_path = variant
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(
+            static_folder,
+            os.path.relpath(variant_path, static_folder),
+            mimetype=mimetype,
+            max_age=max_age,
+        )
+        response.headers["Content-Encoding"] = encoding
+    if os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+        response.vary.add("Accept-Encoding")
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def init_static_assets(app) -> None:
+    if not app.config.get("STATIC_FINGERPRINT", True) or not app.static_folder:
+        return
+    app.url_defaults(_add_fingerprint)
+    app.view_functions["static"] = static_view
+
+
+# =========================
+# Prekompresja (CLI)
+# =========================
+
+
+def precompress_static(static_folder: str, min_size: int = 256, force: bool = False) -> dict[str, int]:
+    """
+    Zapisuje obok plików tekstowych warianty ``.gz`` (i ``.br``, jeśli jest
+    pakiet Brotli). Pomija pliki mniejsze niż ``min_size`` i warianty,
+    które są aktualne. Zwraca liczniki do raportu.
+    """
+    stats = {"files": 0, "written": 0, "skipped": 0, "saved_bytes": 0}
+    for root, _dirs, files in os.walk(static_folder):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            if st.st_size < min_size:
+                continue
+            stats["files"] += 1
+            with open(path, "rb") as f:
+                data = f.read()
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                target = path + suffix
+                if not force and os.path.exists(target) and os.stat(target).st_mtime >= st.st_mtime:
+                    stats["skipped"] += 1
+                    continue
+                if encoding == "br":
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) >= len(data):
+                    continue  # kompresja nic nie daje
+                with open(target, "wb") as f:
+                    f.write(compressed)
+                stats["written"] += 1
+                stats["saved_bytes"] += len(data) - len(compressed)
+    return stats
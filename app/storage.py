@@ -0,0 +1,228 @@
+# app/storage.py
+"""
+Zapis wgrywanych zdjęć adresowany treścią.
+
+Upload jest strumieniowany na dysk kawałkami (bez wczytywania całego pliku
+do pamięci) i jednocześnie hashowany sha256. Plik trafia do
+``static/images/products/<sha256><rozszerzenie>``:
+
+- pierwsza kopia danej treści – wiersz ``stored_files`` (``refcount = 1``);
+  plik tymczasowy jest przenoszony na miejsce i pochodne (app/images.py)
+  są zlecane dopiero po commicie, a po rollbacku plik jest kasowany,
+- każda kolejna – tylko nowy rekord ``Media`` i ``refcount + 1``;
+  tymczasowy plik jest kasowany, nic nie jest zapisywane drugi raz.
+
+``release_media`` zmniejsza licznik; plik (i jego pochodne) znika z dysku
+dopiero po commicie transakcji, w której licznik spadł do zera.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+from .extensions import db
+from .images import products_dir, remove_derivatives, schedule_derivatives
+from .models import Media, StoredFile
+
+CHUNK_SIZE = 64 * 1024
+
+# format Pillow -> rozszerzenie pliku na dysku
+EXTENSIONS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "WEBP": ".webp",
+    "GIF": ".gif",
+}
+
+
+def _stream_to_temp(stream, directory: str) -> tuple[str, str, int]:
+    """Kopiuje strumień do pliku tymczasowego. Zwraca (ścieżka, sha256, rozmiar)."""
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp, hasher.hexdigest(), size
+
+
+def _identify(path: str) -> tuple[str, int, int] | None:
+    """(format, szerokość, wysokość) albo None, jeśli to nie jest obraz."""
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        with Image.open(path) as image:
+            return image.format, image.width, image.height
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return None
+
+
+def _claim(content_hash: str, stored_filename: str, size: int, tmp: str) -> bool:
+    """
+    Rejestruje kolejne użycie treści. Zwraca True, gdy to pierwsza kopia –
+    plik tymczasowy czeka wtedy w sesji na commit (``storage_place``).
+    """
+    table = StoredFile.__table__
+    bumped = db.session.execute(
+        table.update()
+        .where(table.c.content_hash == content_hash)
+        .values(refcount=table.c.refcount + 1)
+    ).rowcount
+    if bumped:
+        return False
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                table.insert().values(
+                    content_hash=content_hash,
+                    stored_filename=stored_filename,
+                    size_bytes=size,
+                    refcount=1,
+                )
+            )
+    except IntegrityError:
+        # równoległy upload tej samej treści zdążył pierwszy
+        db.session.execute(
+            table.update()
+            .where(table.c.content_hash == content_hash)
+            .values(refcount=table.c.refcount + 1)
+        )
+        return False
+
+    db.session.info.setdefault("storage_place", []).append(
+        (tmp, products_dir(), stored_filename)
+    )
+    return True
+
+
+def store_upload(file_storage) -> Media | None:
+    """
+    Zapisuje obraz z formularza i zwraca nowy (niezacommitowany) rekord
+    ``Media`` albo None, gdy pliku brak lub to nie jest obraz.
+    """
+    if not file_storage:
+        return None
+    original_filename = secure_filename(file_storage.filename or "")
+    if not original_filename:
+        return None
+
+    directory = products_dir()
+    os.makedirs(directory, exist_ok=True)
+    tmp, content_hash, size = _stream_to_temp(file_storage.stream, directory)
+    is_new = False
+    try:
+        info = _identify(tmp)
+        if info is None:
+            current_app.logger.warning(f"Odrzucono upload {original_filename} – to nie jest obraz.")
+            return None
+        fmt, width, height = info
+        ext = EXTENSIONS.get(fmt) or os.path.splitext(original_filename)[1].lower()
+        stored_filename = f"{content_hash}{ext}"
+
+        is_new = _claim(content_hash, stored_filename, size, tmp)
+        media = Media(
+            original_filename=original_filename,
+            stored_filename=stored_filename,
+            content_hash=content_hash,
+            mime_type=Image.MIME.get(fmt) or file_storage.mimetype,
+            size_bytes=size,
+            width=width,
+            height=height,
+        )
+        db.session.add(media)
+    finally:
+        # pierwszą kopię przeniesie commit (albo skasuje rollback)
+        if not is_new and os.path.exists(tmp):
+            os.unlink(tmp)
+    return media
+
+
+def release_media(media: Media | None) -> None:
+    """Usuwa rekord Media; ostatnie użycie pliku usuwa go z dysku po commicie."""
+    if media is None:
+        return
+    content_hash = media.content_hash
+    db.session.delete(media)
+    db.session.flush()
+    if not content_hash:
+        return
+
+    table = StoredFile.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.content_hash == content_hash)
+        .values(refcount=table.c.refcount - 1)
+    )
+    orphan = db.session.execute(
+        table.delete()
+        .where(table.c.content_hash == content_hash, table.c.refcount <= 0)
+        .returning(table.c.stored_filename)
+    ).scalar()
+    if orphan:
+        db.session.info.setdefault("storage_unlink", []).append(
+            (products_dir(), orphan)
+        )
+
+
+# =========================
+# Pliki na dysku po commicie / rollbacku
+# =========================
+
+
+@event.listens_for(Session, "after_commit")
+def _place_after_commit(session):
+    for tmp, directory, filename in session.info.pop("storage_place", []):
+        try:
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, os.path.join(directory, filename))
+        except OSError as exc:
+            current_app.logger.error(f"Nie udało się zapisać pliku {filename}: {exc}")
+            continue
+        # miniatury / WebP powstają w tle (pula procesów)
+        schedule_derivatives(filename)
+
+
+@event.listens_for(Session, "after_commit")
+def _unlink_after_commit(session):
+    for directory, filename in session.info.pop("storage_unlink", []):
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError:
+            pass
+        remove_derivatives(directory, filename)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("storage_unlink", None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_unplaced(session, transaction):
+    # rollback albo zamknięcie sesji bez commitu – wiersza stored_files nie ma,
+    # więc plik tymczasowy nie może zostać na dysku
+    if transaction.parent is not None:
+        return
+    for tmp, _, _ in session.info.pop("storage_place", []):
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,158 @@
+# app/user_cache.py
+"""
+Cache użytkowników dla Flask-Login (``user_loader``).
+
+Zamiast ``User.query.get()`` przy każdym żądaniu zalogowanego użytkownika
+``current_user`` jest lekkim rekordem ``CachedUser`` (id, e-mail, rola,
+motyw) z LRU w pamięci procesu, ważnym ``USER_CACHE_TTL`` sekund.
+
+Unieważnianie:
+- zmiana roli, e-maila albo motywu przez ORM podbija ``users.version``,
+  a po commicie wpis znika z cache tego procesu,
+- wpis wczytany przed zmianą (równoległe żądanie) nie zostanie zapisany,
+  jeśli ma starszą wersję niż ostatnia znana – dlatego licznik wersji,
+  a nie samo kasowanie,
+- pozostałe workery odświeżą wpis najpóźniej po ``USER_CACHE_TTL``.
+
+``current_user`` nie jest obiektem ORM – gdzie potrzebny jest pełny
+``User`` (relacje, zapis), trzeba go pobrać: ``db.session.get(User, current_user.id)``.
+Zmiany z pominięciem ORM (``Query.update()``, surowy SQL) nie podbijają
+wersji – wtedy ``invalidate_user(id)`` ręcznie.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import User
+
+# pola, których zmiana unieważnia wpis
+VERSIONED_FIELDS = ("email", "role", "theme_id")
+
+
+class CachedUser(UserMixin):
+    """Lekki rekord użytkownika dla ``current_user``."""
+
+    __slots__ = ("id", "email", "role", "theme_id", "version")
+
+    def __init__(self, id: int, email: str, role: str | None, theme_id: int | None, version: int):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.theme_id = theme_id
+        self.version = version
+
+    def __repr__(self):
+        return f"<CachedUser {self.email} v{self.version}>"
+
+
+_lock = threading.Lock()
+# id -> (rekord, wygasa o [monotonic])
+_entries: OrderedDict[int, tuple[CachedUser, float]] = OrderedDict()
+# id -> najwyższa znana wersja (po zmianach w tym procesie)
+_min_versions: dict[int, int] = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def _fetch(user_id: int) -> CachedUser | None:
+    row = (
+        db.session.query(User.id, User.email, User.role, User.theme_id, User.version)
+        .filter(User.id == user_id)
+        .first()
+    )
+    return CachedUser(*row) if row else None
+
+
+def load_user(user_id: int):
+    """``user_loader``: rekord z cache albo jedno zapytanie o kolumny."""
+    config = current_app.config
+    ttl = config.get("USER_CACHE_TTL", 60)
+    if ttl <= 0:
+        return db.session.get(User, user_id)
+
+    now = time.monotonic()
+    with _lock:
+        cached = _entries.get(user_id)
+        if cached is not None and cached[1] > now:
+            _entries.move_to_end(user_id)
+            _stats["hits"] += 1
+            return cached[0]
+        _stats["misses"] += 1
+
+    user = _fetch(user_id)
+    if user is None:
+        invalidate_user(user_id)
+        return None
+    with _lock:
+        if user.version >= _min_versions.get(user_id, 0):
+            _entries[user_id] = (user, now + ttl)
+            _entries.move_to_end(user_id)
+            while len(_entries) > config.get("USER_CACHE_SIZE", 1024):
+                _entries.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id: int, version: int | None = None) -> None:
+    """Usuwa wpis; ``version`` blokuje późniejszy zapis starszej wersji."""
+    with _lock:
+        _entries.pop(user_id, None)
+        if version is not None:
+            _min_versions[user_id] = max(version, _min_versions.get(user_id, 0))
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _min_versions.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
+
+
+# =========================
+# Wersje (zdarzenia ORM)
+# =========================
+
+
+@event.listens_for(User, "before_update")
+def _bump_version(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in VERSIONED_FIELDS):
+        target.version = (target.version or 0) + 1
+
+
+def _queue_invalidation(target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("user_cache_invalidate", {})[target.id] = target.version
+
+
+@event.listens_for(User, "after_update")
+def _after_update(mapper, connection, target):
+    if inspect(target).attrs.version.history.has_changes():
+        _queue_invalidation(target)
+
+
+@event.listens_for(User, "after_delete")
+def _after_delete(mapper, connection, target):
+    _queue_invalidation(target)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for user_id, version in session.info.pop("user_cache_invalidate", {}).items():
+        invalidate_user(user_id, version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("user_cache_invalidate", None)
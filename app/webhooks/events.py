@@ -0,0 +1,171 @@
+# app/webhooks/events.py
+"""
+Zdarzenia Stripe: zapis i przetwarzanie.
+
+Webhook tylko weryfikuje podpis i zapisuje zdarzenie (``record_event``) –
+unikalne ``event_id`` sprawia, że powtórne doręczenie tego samego
+zdarzenia jest ignorowane, a odpowiedź 200 wraca od razu.
+
+Zmiany zamówień robi osobny krok (``process_pending`` uruchamiany przez
+``flask stripe-process-events``). Każde zdarzenie jest przetwarzane
+w osobnym SAVEPOINT; błąd zwiększa licznik prób, a po
+``STRIPE_EVENT_MAX_ATTEMPTS`` zdarzenie dostaje status ``błąd``.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from app.extensions import db
+from app.models import Order, StripeEvent
+from app.outbox import enqueue_email
+from app.shop.payments import forget_session
+
+NEW = "nowe"
+PROCESSED = "przetworzone"
+FAILED = "błąd"
+
+# typ zdarzenia -> funkcja(obiekt z event["data"]["object"])
+HANDLERS = {}
+
+
+def handles(event_type: str):
+    def decorator(func):
+        HANDLERS[event_type] = func
+        return func
+
+    return decorator
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# =========================
+# Zapis
+# =========================
+
+
+def record_event(event_id: str, event_type: str, payload: str) -> bool:
+    """
+    Zapisuje zdarzenie i commituje. Zwraca False, gdy zdarzenie o tym
+    ``event_id`` już było (powtórka od Stripe).
+    """
+    db.session.add(StripeEvent(event_id=event_id, type=event_type, payload=payload, status=NEW))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+# =========================
+# Przetwarzanie
+# =========================
+
+
+@handles("checkout.session.completed")
+def _checkout_completed(session: dict) -> None:
+    order_id = (session.get("metadata") or {}).get("order_id")
+    if not order_id:
+        return
+    order = (
+        Order.query.options(joinedload(Order.user))
+        .filter(Order.id == int(order_id))
+        .first()
+    )
+    if order is None or order.status == "opłacone":
+        return
+    order.status = "opłacone"
+    user = order.user
+    if user and user.email:
+        enqueue_email(
+            recipient=user.email,
+            subject=f"Potwierdzenie płatności za zamówienie #{order.id}",
+            sender="sklep@bimberek.local",
+            body=(
+                f"Cześć {user.email},\n\n"
+                f"Twoje zamówienie nr {order.id} zostało opłacone.\n"
+                f"Dziękujemy za zakupy w Bimberek Białostocki.\n"
+            ),
+        )
+
+
+@handles("checkout.session.expired")
+def _checkout_expired(session: dict) -> None:
+    order_id = (session.get("metadata") or {}).get("order_id")
+    if not order_id:
+        return
+    order = db.session.get(Order, int(order_id))
+    if order is not None:
+        # następne wejście na stronę płatności utworzy nową sesję
+        forget_session(order, session.get("id"))
+
+
+def process_event(row: StripeEvent) -> bool:
+    """Przetwarza jedno zdarzenie w SAVEPOINT. Zwraca True przy sukcesie."""
+    try:
+        with db.session.begin_nested():
+            event = json.loads(row.payload)
+            handler = HANDLERS.get(row.type)
+            if handler is not None:
+                handler(event["data"]["object"])
+    except Exception as exc:  # błąd jednego zdarzenia nie blokuje pozostałych
+        row.attempts += 1
+        row.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        if row.attempts >= current_app.config.get("STRIPE_EVENT_MAX_ATTEMPTS", 5):
+            row.status = FAILED
+        current_app.logger.warning(f"Zdarzenie Stripe {row.event_id} nieprzetworzone: {exc}")
+        return False
+    row.status = PROCESSED
+    row.processed_at = _utcnow()
+    row.last_error = None
+    return True
+
+
+def process_pending(batch_size: int = 100) -> dict[str, int]:
+    """Przetwarza paczkę nowych zdarzeń (w kolejności przyjścia) i commituje."""
+    query = (
+        StripeEvent.query.filter(StripeEvent.status == NEW)
+        .order_by(StripeEvent.id)
+        .limit(batch_size)
+    )
+    if db.engine.dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    stats = {"processed": 0, "failed": 0}
+    for row in query.all():
+        stats["processed" if process_event(row) else "failed"] += 1
+    db.session.commit()
+    return stats
+
+
+def replay_lines(lines, force: bool = False) -> dict[str, int]:
+    """
+    Odtwarza zdarzenia z JSONL (jedna linia = obiekt zdarzenia Stripe, bez
+    weryfikacji podpisu – do testów). Nowe zdarzenia są zapisywane;
+    ``force`` przetwarza ponownie także te już przetworzone.
+    """
+    stats = {"lines": 0, "new": 0, "processed": 0, "failed": 0, "skipped": 0}
+    for raw in lines:
+        raw = raw.strip()
+        if not raw:
+            continue
+        stats["lines"] += 1
+        event = json.loads(raw)
+        row = StripeEvent.query.filter_by(event_id=event["id"]).first()
+        if row is None:
+            row = StripeEvent(event_id=event["id"], type=event["type"], payload=raw, status=NEW)
+            db.session.add(row)
+            db.session.flush()
+            stats["new"] += 1
+        elif row.status == PROCESSED and not force:
+            stats["skipped"] += 1
+            continue
+        stats["processed" if process_event(row) else "failed"] += 1
+        db.session.commit()
+    return stats
@@ -1,15 +1,17 @@
 import stripe
-from flask import request, current_app
+from flask import request, current_app, make_response
 
 from . import webhooks_bp
-from app.extensions import db
-from app.models import Order
-from flask_mail import Message
-from app.extensions import mail
+from .events import process_pending, record_event
 
 
 @webhooks_bp.route("/webhook", methods=["POST"])
 def stripe_webhook():
+    """
+    Tylko weryfikacja podpisu i zapis zdarzenia – zamówienia zmienia osobny
+    krok (app/webhooks/events.py): po wysłaniu odpowiedzi w tym procesie
+    (STRIPE_EVENTS_INLINE) albo ``flask stripe-process-events``.
+    """
     payload = request.data
     sig_header = request.headers.get("Stripe-Signature")
     endpoint_secret = current_app.config.get("STRIPE_WEBHOOK_SECRET")
@@ -24,28 +26,18 @@ def stripe_webhook():
         current_app.logger.warning("Stripe webhook signature verification failed")
         return "", 400
 
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        order_id = session.get("metadata", {}).get("order_id")
-        if order_id:
-            order = Order.query.get(int(order_id))
-            if order:
-                order.status = "opłacone"
-                db.session.commit()
-                user = order.user
-                if user.email:
-                    msg = Message(
-                        subject=f"Potwierdzenie płatności za zamówienie #{order.id}",
-                        sender="sklep@bimberek.local",
-                        recipients=[user.email],
-                    )
-                    msg.body = (
-                        f"Cześć {user.email},\n\n"
-                        f"Twoje zamówienie nr {order.id} zostało opłacone.\n"
-                        f"Dziękujemy za zakupy w Bimberek Białostocki.\n"
-                    )
-                    try:
-                        mail.send(msg)
-                    except Exception:
-                        current_app.logger.exception("Nie udało się wysłać maila potwierdzającego.")
-    return "", 200
+    if not record_event(event["id"], event["type"], payload.decode("utf-8")):
+        # powtórne doręczenie – zdarzenie już mamy
+        current_app.logger.info(f"Stripe webhook: powtórka zdarzenia {event['id']}")
+        return "", 200
+
+    response = make_response("", 200)
+    if current_app.config.get("STRIPE_EVENTS_INLINE", True):
+        app = current_app._get_current_object()
+
+        def process_after_response():
+            with app.app_context():
+                process_pending()
+
+        response.call_on_close(process_after_response)
+    return response
@@ -0,0 +1,75 @@
+"""Indeks pełnotekstowy produktów (FTS5 / tsvector)
+
+Revision ID: 3b7e1f0c9a21
+Revises: d2d972164c6c
+Create Date: 2026-10-16 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from markupsafe import Markup
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1f0c9a21'
+down_revision = 'd2d972164c6c'
+branch_labels = None
+depends_on = None
+
+
+def _plain_text(html):
+    # to samo co app.search._plain_text – indeks po migracji = indeks odbudowany
+    return Markup(html).striptags() if html else ''
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.create_table('product_search',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+        )
+        op.create_index('ix_product_search_document', 'product_search', ['document'],
+                        postgresql_using='gin')
+        op.execute(
+            "INSERT INTO product_search (product_id, document) "
+            "SELECT id, "
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', "
+            "regexp_replace(coalesce(description_html, ''), '<[^>]*>', ' ', 'g')), 'D') "
+            "FROM products"
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            " name, description,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        # SQLite nie ma regexp_replace – tagi HTML usuwa Python
+        connection = op.get_bind()
+        rows = [
+            {'id': product_id, 'name': name or '', 'description': _plain_text(description_html)}
+            for product_id, name, description_html in connection.execute(
+                sa.text("SELECT id, name, description_html FROM products")
+            )
+        ]
+        if rows:
+            connection.execute(
+                sa.text(
+                    "INSERT INTO products_fts (rowid, name, description) "
+                    "VALUES (:id, :name, :description)"
+                ),
+                rows,
+            )
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.drop_index('ix_product_search_document', table_name='product_search')
+        op.drop_table('product_search')
+    else:
+        op.execute("DROP TABLE IF EXISTS products_fts")
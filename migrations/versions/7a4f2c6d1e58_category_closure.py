@@ -0,0 +1,46 @@
+"""Tabela domknięcia drzewa kategorii (category_closure)
+
+Revision ID: 7a4f2c6d1e58
+Revises: 5c2d8e4f7b13
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4f2c6d1e58'
+down_revision = '5c2d8e4f7b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_category_closure_descendant', 'category_closure',
+                    ['descendant_id', 'depth'], unique=False)
+
+    # wypełnienie z istniejącej listy sąsiedztwa (parent_id)
+    op.execute(
+        "WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS ("
+        " SELECT id, id, 0 FROM categories"
+        " UNION ALL"
+        " SELECT t.ancestor_id, c.id, t.depth + 1"
+        " FROM tree t JOIN categories c ON c.parent_id = t.descendant_id"
+        ") "
+        "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, descendant_id, depth FROM tree"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_category_closure_descendant', table_name='category_closure')
+    op.drop_table('category_closure')
@@ -0,0 +1,41 @@
+"""Liczniki dashboardu admina (admin_counters)
+
+Revision ID: 9e3b5a7c2d40
+Revises: 7a4f2c6d1e58
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b5a7c2d40'
+down_revision = '7a4f2c6d1e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('admin_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # wartości startowe – te same warunki co w app/counters.py
+    op.execute(
+        "INSERT INTO admin_counters (name, value) "
+        "SELECT 'products', COUNT(*) FROM products "
+        "UNION ALL SELECT 'categories', COUNT(*) FROM categories "
+        "UNION ALL SELECT 'comments', COUNT(*) FROM comments "
+        "UNION ALL SELECT 'comments_pending', COUNT(*) FROM comments WHERE status != 'zaakceptowany' "
+        "UNION ALL SELECT 'posts', COUNT(*) FROM posts "
+        "UNION ALL SELECT 'posts_pending', COUNT(*) FROM posts WHERE status != 'zaakceptowany' "
+        "UNION ALL SELECT 'sliders', COUNT(*) FROM sliders "
+        "UNION ALL SELECT 'reports_open', COUNT(*) FROM reports WHERE status = 'open'"
+    )
+
+
+def downgrade():
+    op.drop_table('admin_counters')
@@ -0,0 +1,26 @@
+"""Licznik wersji użytkownika (cache user_loader)
+
+Revision ID: a1c6e8f2d437
+Revises: f3b8d2e6a571
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c6e8f2d437'
+down_revision = 'f3b8d2e6a571'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('version')
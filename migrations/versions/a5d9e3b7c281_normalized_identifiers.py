@@ -0,0 +1,69 @@
+"""Kolumny users.username_normalized / email_normalized (casefold) zamiast indeksów lower()
+
+Revision ID: a5d9e3b7c281
+Revises: e8a3c5f1d702
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5d9e3b7c281'
+down_revision = 'e8a3c5f1d702'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(value):
+    return (value or "").strip().casefold() or None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('username_normalized', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=255), nullable=True))
+
+    # casefold() liczy Python – lower() w SQLite zmienia tylko litery ASCII
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer),
+        sa.column('username', sa.String),
+        sa.column('username_normalized', sa.String),
+        sa.column('email', sa.String),
+        sa.column('email_normalized', sa.String),
+    )
+    connection = op.get_bind()
+    seen = set()
+    for user_id, username, email in connection.execute(
+        sa.select(users.c.id, users.c.username, users.c.email).order_by(users.c.id)
+    ):
+        values = {'email_normalized': _normalize(email)}
+        normalized = _normalize(username)
+        if normalized is not None and normalized in seen:
+            # „Łukasz” i „łukasz” przeszły przez stary indeks – późniejsze konto
+            # dostaje sufiks z id, żeby unikalność nazwy dało się założyć
+            username = f"{username[:32 - len(str(user_id)) - 1]}-{user_id}"
+            normalized = _normalize(username)
+            values['username'] = username
+        if normalized is not None:
+            seen.add(normalized)
+        values['username_normalized'] = normalized
+        connection.execute(users.update().where(users.c.id == user_id).values(**values))
+
+    op.drop_index('ux_users_username_lower', table_name='users')
+    op.drop_index('ix_users_email_lower', table_name='users')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_unique_constraint(batch_op.f('uq_users_username_normalized'), ['username_normalized'])
+        batch_op.create_index(batch_op.f('ix_users_email_normalized'), ['email_normalized'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_email_normalized'))
+        batch_op.drop_constraint(batch_op.f('uq_users_username_normalized'), type_='unique')
+        batch_op.drop_column('email_normalized')
+        batch_op.drop_column('username_normalized')
+    op.create_index('ux_users_username_lower', 'users', [sa.text('lower(username)')], unique=True)
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
@@ -0,0 +1,52 @@
+"""Zdjęcia adresowane treścią (stored_files, media.content_hash, products.media_id)
+
+Revision ID: b4d81f6a3c92
+Revises: 9e3b5a7c2d40
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d81f6a3c92'
+down_revision = '9e3b5a7c2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_files',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('stored_filename', sa.String(length=255), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash'),
+    sa.UniqueConstraint('stored_filename')
+    )
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_media_content_hash'), ['content_hash'], unique=False)
+        batch_op.create_foreign_key('fk_media_content_hash_stored_files', 'stored_files',
+                                    ['content_hash'], ['content_hash'])
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('media_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_products_media_id_media', 'media',
+                                    ['media_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_products_media_id_media', type_='foreignkey')
+        batch_op.drop_column('media_id')
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_media_content_hash_stored_files', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_media_content_hash'))
+        batch_op.drop_column('content_hash')
+
+    op.drop_table('stored_files')
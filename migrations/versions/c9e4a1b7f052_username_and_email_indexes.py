@@ -0,0 +1,30 @@
+"""Kolumna users.username i indeksy lower(username) / lower(email)
+
+Revision ID: c9e4a1b7f052
+Revises: b7d2f5a9c183
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e4a1b7f052'
+down_revision = 'b7d2f5a9c183'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('username', sa.String(length=32), nullable=True))
+    op.create_index('ux_users_username_lower', 'users', [sa.text('lower(username)')], unique=True)
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_index('ux_users_username_lower', table_name='users')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('username')
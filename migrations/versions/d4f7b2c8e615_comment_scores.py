@@ -0,0 +1,50 @@
+"""Głosy na komentarze: unikalny głos, comments.score / votes_count, indeksy sortowania
+
+Revision ID: d4f7b2c8e615
+Revises: c9e4a1b7f052
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7b2c8e615'
+down_revision = 'c9e4a1b7f052'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # duplikaty (ten sam użytkownik i komentarz) – zostaje najnowszy głos
+    op.execute(
+        "DELETE FROM comment_votes WHERE id NOT IN ("
+        "SELECT max_id FROM (SELECT MAX(id) AS max_id FROM comment_votes "
+        "GROUP BY comment_id, user_id) AS keep)"
+    )
+    with op.batch_alter_table('comment_votes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_comment_votes_comment_user', ['comment_id', 'user_id'])
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('score', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('votes_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_comments_product_status_score', ['product_id', 'status', 'score', 'id'], unique=False)
+        batch_op.create_index('ix_comments_post_status_score', ['post_id', 'status', 'score', 'id'], unique=False)
+
+    op.execute(
+        "UPDATE comments SET "
+        "score = (SELECT COALESCE(SUM(value), 0) FROM comment_votes WHERE comment_votes.comment_id = comments.id), "
+        "votes_count = (SELECT COUNT(*) FROM comment_votes WHERE comment_votes.comment_id = comments.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_post_status_score')
+        batch_op.drop_index('ix_comments_product_status_score')
+        batch_op.drop_column('votes_count')
+        batch_op.drop_column('score')
+
+    with op.batch_alter_table('comment_votes', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_comment_votes_comment_user', type_='unique')
@@ -0,0 +1,38 @@
+"""Zdarzenia webhooka Stripe (stripe_events)
+
+Revision ID: d8f3b1c5e624
+Revises: c6e2a9d4f817
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b1c5e624'
+down_revision = 'c6e2a9d4f817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stripe_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='nowe', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    op.create_index('ix_stripe_events_status', 'stripe_events', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stripe_events_status', table_name='stripe_events')
+    op.drop_table('stripe_events')
@@ -0,0 +1,30 @@
+"""Zapisana sesja Stripe Checkout na zamówieniu
+
+Revision ID: e2a7c4f9b316
+Revises: d8f3b1c5e624
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c4f9b316'
+down_revision = 'd8f3b1c5e624'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stripe_session_id', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('stripe_session_url', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('stripe_session_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('stripe_session_expires_at')
+        batch_op.drop_column('stripe_session_url')
+        batch_op.drop_column('stripe_session_id')
@@ -0,0 +1,42 @@
+"""Indeksy złożone i częściowe dla gorących zapytań sklepu i panelu
+
+Revision ID: e8a3c5f1d702
+Revises: d4f7b2c8e615
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a3c5f1d702'
+down_revision = 'd4f7b2c8e615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_comments_product_status_created', 'comments', ['product_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_comments_post_status_created', 'comments', ['post_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_comments_pending', 'comments', ['created_at', 'id'], unique=False,
+                    sqlite_where=sa.text("status = 'oczekuje'"),
+                    postgresql_where=sa.text("status = 'oczekuje'"))
+    op.create_index('ix_posts_status_created', 'posts', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_posts_unpublished', 'posts', ['created_at', 'id'], unique=False,
+                    sqlite_where=sa.text("status != 'zaakceptowany'"),
+                    postgresql_where=sa.text("status != 'zaakceptowany'"))
+    op.create_index('ix_products_category_id', 'products', ['category_id', 'id'], unique=False)
+    op.create_index('ix_products_stock', 'products', ['stock', 'id'], unique=False)
+    op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_user_created', table_name='orders')
+    op.drop_index('ix_products_stock', table_name='products')
+    op.drop_index('ix_products_category_id', table_name='products')
+    op.drop_index('ix_posts_unpublished', table_name='posts')
+    op.drop_index('ix_posts_status_created', table_name='posts')
+    op.drop_index('ix_comments_pending', table_name='comments')
+    op.drop_index('ix_comments_post_status_created', table_name='comments')
+    op.drop_index('ix_comments_product_status_created', table_name='comments')
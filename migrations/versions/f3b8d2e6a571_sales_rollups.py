@@ -0,0 +1,57 @@
+"""Dzienne agregaty sprzedaży i orders.paid_at
+
+Revision ID: f3b8d2e6a571
+Revises: e2a7c4f9b316
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2e6a571'
+down_revision = 'e2a7c4f9b316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('paid_at', sa.DateTime(), nullable=True))
+
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('units', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('sales_daily_products',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('units', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_index('ix_sales_daily_products_product', 'sales_daily_products', ['product_id', 'day'], unique=False)
+    op.create_table('sales_daily_categories',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('units', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'category_id')
+    )
+    op.create_index('ix_sales_daily_categories_category', 'sales_daily_categories', ['category_id', 'day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sales_daily_categories_category', table_name='sales_daily_categories')
+    op.drop_table('sales_daily_categories')
+    op.drop_index('ix_sales_daily_products_product', table_name='sales_daily_products')
+    op.drop_table('sales_daily_products')
+    op.drop_table('sales_daily')
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('paid_at')